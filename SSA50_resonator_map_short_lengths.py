@@ -16,15 +16,8 @@ L_DUT = np.linspace(1e-3, 0.06, num=201)
 L_CEA = np.linspace(1e-3, 0.125, num=201)
 
 # calculates the S11 and Zin for all the short lengths
-S11dB = np.zeros( (len(L_DUT), len(L_CEA)) )
-Zin = np.zeros_like(S11dB, dtype='complex')
-
-for idx_DUT, _L_DUT in enumerate(L_DUT):
-    for idx_CEA, _L_CEA in enumerate(L_CEA):
-        _cfg = T.Configuration(f, P_in, L_DUT=_L_DUT, L_CEA=_L_CEA, additional_losses=add_loss)
-        S11dB[idx_DUT, idx_CEA] = _cfg.S11dB()
-        _Zin, _ , _ = _cfg.input_impedance()
-        Zin[idx_DUT, idx_CEA] = _Zin
+_cfg = T.Configuration(f, P_in, L_DUT=L_DUT[0], L_CEA=L_CEA[0], additional_losses=add_loss)
+_, S11dB, Zin = _cfg.S11_map(L_DUT, L_CEA)
 
 #%% Plotting S11 vs L_DUT and L_CEA        
 f,ax=plt.subplots(1,1)
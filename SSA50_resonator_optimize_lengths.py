@@ -20,24 +20,15 @@ Lsc_CEA = 0.03 # m
 
 cfg = T.Configuration(f, P_in, Lsc_DUT, Lsc_CEA, additional_losses=add_loss)
 
-# Solve the optimization problem
-L_opt = cfg.optimize_short_lengths()
-while True: # repeat searches until a physical meaningfull solution is found...
-    if L_opt[0] < 20e-3 or L_opt[0] > 60e-3:
-        L_opt = cfg.optimize_short_lengths()
-    else:
-        break
+# Solve the matching problem and keep the physically meaningfull solution
+L_sols, _ = cfg.solve_short_lengths()
+L_opt = L_sols[(L_sols[:,0] >= 20e-3) & (L_sols[:,0] <= 60e-3)][0]
 
 # Calculates the S11 for a range of frequency
 freqs = np.linspace(61e6, 64e6, 301)
-S11, Zin = [], []
-for freq in freqs:
-    cfg_opt = T.Configuration(freq, P_in, L_opt[0], L_opt[1], additional_losses=add_loss)
-    _Zin, _ , _ = cfg_opt.input_impedance()
-    S11.append( cfg_opt.S11dB() )
-    Zin.append( _Zin )
-S11 = np.asarray(S11)
-Zin = np.asarray(Zin)
+cfg_opt = T.Configuration(f, P_in, L_opt[0], L_opt[1], additional_losses=add_loss)
+S11, Zin = cfg_opt.sweep(freqs)
+S11 = 20*np.log10(np.abs(S11))
 
 # Plotting S11
 fig, ax = plt.subplots(2,1, sharex=True)
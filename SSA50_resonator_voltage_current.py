@@ -43,11 +43,8 @@ ax[1].set_ylabel('|I| [A]', fontsize=14)
 
 # Calculates the S11 for a range of frequency
 freqs = np.linspace(61e6, 64e6, 101)
-S11 = []
-for freq in freqs:
-    _cfg = T.Configuration(freq, P_in, Lsc_DUT, Lsc_CEA, additional_losses=1)
-    S11.append( _cfg.S11dB() )
-S11 = np.asarray(S11)
+S11, _ = cfg.sweep(freqs)
+S11 = 20*np.log10(np.abs(S11))
 
 # Plotting S11
 fig, ax = plt.subplots(1,1)
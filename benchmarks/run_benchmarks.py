@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Performance benchmarks of the core computational paths of tresonator.
+
+Each benchmark is timed with timeit (median of several repeats) and its peak
+memory is measured with tracemalloc. Results are saved as JSON and can be
+compared against a stored baseline:
+
+    python benchmarks/run_benchmarks.py --output results.json --compare benchmarks/baseline.json
+
+The script exits with a non-zero status if a benchmark is slower than the
+baseline by more than the tolerance factor.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import tresonator as T
+
+# Fixed inputs of the benchmarks
+F = 62.64e6 # Hz
+P_IN = 80e3 # W
+L_DUT = 0.035 # m
+L_CEA = 0.027 # m
+FREQS = np.linspace(61e6, 64e6, 301)
+L_DUTS = np.linspace(1e-3, 0.06, num=201)
+L_CEAS = np.linspace(1e-3, 0.125, num=201)
+
+
+def _configuration():
+    return T.Configuration(F, P_IN, L_DUT, L_CEA)
+
+
+def _circuit():
+    # skrf deprecation warnings are not part of the benchmark
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return CFG.circuit().s_external
+
+
+CFG = _configuration()
+TABLE = T.TuningTable.generate(np.linspace(61e6, 64e6, 31), [1, 1.5])
+
+# name: (function, number of model evaluations per call)
+BENCHMARKS = {
+    'configuration_init': (_configuration, 1),
+    'input_impedance': (CFG.input_impedance, 1),
+    'S11': (CFG.S11, 1),
+    'sweep_301': (lambda: CFG.sweep(FREQS), len(FREQS)),
+    'map_201x201': (lambda: CFG.S11_map(L_DUTS, L_CEAS), len(L_DUTS)*len(L_CEAS)),
+    'voltage_current': (CFG.voltage_current, 1),
+    'peak_voltage_current': (CFG.peak_voltage_current, 1),
+    'optimize_short_lengths': (lambda: CFG.optimize_short_lengths(seed=0), 1),
+    'solve_short_lengths': (CFG.solve_short_lengths, 1),
+    'loaded_Q': (CFG.loaded_Q, 1),
+    'tuning_lookup': (lambda: TABLE.lookup(F, 1.2), 1),
+    'tuning_setpoints': (lambda: TABLE.lookup(F, 1.2, predict=False), 0),
+    'circuit': (_circuit, 1),
+}
+
+
+def run(name, repeat=5, min_time=0.2):
+    """
+    Time a benchmark and measure its peak memory.
+
+    Returns
+    -------
+    result: dict
+    """
+    func, n_evals = BENCHMARKS[name]
+    timer = timeit.Timer(func)
+    # number of calls per repeat, so that a repeat lasts at least min_time
+    number, _ = timer.autorange()
+    number = max(1, int(np.ceil(number*min_time/0.2)))
+    times = np.array(timer.repeat(repeat=repeat, number=number))/number
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'time_s': float(np.median(times)),
+            'time_min_s': float(np.min(times)),
+            'evals_per_s': float(n_evals/np.median(times)),
+            'peak_memory_bytes': int(peak),
+            'number': number,
+            'repeat': repeat}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare benchmark results to a baseline.
+
+    Returns
+    -------
+    regressions: list of benchmark names slower than tolerance*baseline
+    """
+    regressions = []
+    for name, result in results['results'].items():
+        if name not in baseline['results']:
+            print('{:<25s} no baseline'.format(name))
+            continue
+        ratio = result['time_s']/baseline['results'][name]['time_s']
+        status = 'REGRESSION' if ratio > tolerance else 'ok'
+        print('{:<25s} {:8.2f}x baseline  {}'.format(name, ratio, status))
+        if ratio > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('benchmarks', nargs='*', default=list(BENCHMARKS),
+                        help='benchmarks to run (default: all)')
+    parser.add_argument('--output', '-o', help='JSON file to save the results to')
+    parser.add_argument('--compare', '-c', help='baseline JSON file to compare to')
+    parser.add_argument('--tolerance', '-t', type=float, default=1.5,
+                        help='maximum slowdown factor vs baseline (default: 1.5)')
+    parser.add_argument('--repeat', '-r', type=int, default=5,
+                        help='number of timing repeats (default: 5)')
+    args = parser.parse_args(argv)
+
+    results = {'metadata': {'date': datetime.datetime.now().isoformat(),
+                            'python': platform.python_version(),
+                            'numpy': np.__version__,
+                            'platform': platform.platform(),
+                            'processor': platform.processor()},
+               'results': {}}
+
+    print('{:<25s} {:>12s} {:>14s} {:>12s}'.format('benchmark', 'time [ms]', 'evals/s', 'peak [kB]'))
+    for name in args.benchmarks:
+        result = run(name, repeat=args.repeat)
+        results['results'][name] = result
+        print('{:<25s} {:12.4f} {:14.1f} {:12.1f}'.format(
+            name, 1e3*result['time_s'], result['evals_per_s'], result['peak_memory_bytes']/1e3))
+
+    if args.output:
+        with open(args.output, 'w') as fid:
+            json.dump(results, fid, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fid:
+            baseline = json.load(fid)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the persistent result cache
+"""
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from tresonator import Configuration, Topology, cache, profiling
+
+class TestCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = cache.enable(self.tmpdir.name)
+        self.cfg = Configuration(62.64e6, 20e3, L_DUT=0.035, L_CEA=0.027)
+        
+    def tearDown(self):
+        cache.disable()
+        self.tmpdir.cleanup()
+
+    def test_hits(self):
+        L_DUTs, L_CEAs = np.linspace(10e-3, 60e-3, 5), np.linspace(10e-3, 120e-3, 7)
+        with profiling.profile() as stats:
+            L_sols, S11_sols = self.cfg.solve_short_lengths()
+            S11, _, _ = self.cfg.S11_map(L_DUTs, L_CEAs)
+        self.assertEqual(stats['counts']['cache_misses'], 2)
+        with profiling.profile() as stats:
+            _L_sols, _S11_sols = self.cfg.solve_short_lengths()
+            _S11, _, _ = self.cfg.S11_map(L_DUTs, L_CEAs)
+        self.assertEqual(stats['counts']['cache_hits'], 2)
+        self.assertNotIn('model_evaluations', stats['counts'])
+        np.testing.assert_array_equal(_L_sols, L_sols)
+        np.testing.assert_array_equal(_S11_sols, S11_sols)
+        np.testing.assert_array_equal(_S11, S11)
+        
+    def test_track_events(self):
+        freqs = np.linspace(62e6, 63e6, 5)
+        L, S11, events = self.cfg.track_short_lengths(freqs)
+        _L, _S11, _events = self.cfg.track_short_lengths(freqs)
+        np.testing.assert_array_equal(_L, L)
+        self.assertEqual(_events, events)
+
+    def test_keys(self):
+        L_DUTs, L_CEAs = np.linspace(10e-3, 60e-3, 5), np.linspace(10e-3, 120e-3, 7)
+        self.cfg.S11_map(L_DUTs, L_CEAs)
+        # the short lengths of the configuration are not used by the map
+        cfg = Configuration(62.64e6, 20e3, L_DUT=0.05, L_CEA=0.05)
+        with profiling.profile() as stats:
+            cfg.S11_map(L_DUTs, L_CEAs)
+        self.assertEqual(stats['counts'].get('cache_hits'), 1)
+        # a different geometry is not
+        topology = Topology.load()
+        sections = {branch: [dict(section) for section in topology.branches[branch]] 
+                    for branch in topology.BRANCHES}
+        sections['DUT'][0]['Dout'] *= 1.01
+        cfg = Configuration(62.64e6, 20e3, 0.035, 0.027, topology=Topology(**sections))
+        with profiling.profile() as stats:
+            cfg.S11_map(L_DUTs, L_CEAs)
+        self.assertEqual(stats['counts'].get('cache_misses'), 1)
+        
+    def test_bypass_and_invalidate(self):
+        self.cfg.solve_short_lengths(cache=False)
+        with cache.bypass():
+            self.cfg.solve_short_lengths()
+        self.assertEqual(self.store.size(), 0)
+        self.cfg.solve_short_lengths()
+        self.cfg.S11_map([0.03], [0.02])
+        self.store.invalidate(kind='S11_map')
+        self.assertEqual(len(os.listdir(self.tmpdir.name)), 1)
+        self.store.clear()
+        self.assertEqual(self.store.size(), 0)
+
+    def test_eviction(self):
+        for L in np.linspace(0.01, 0.1, 5):
+            self.cfg.S11_map(np.full(1000, L), np.linspace(0.01, 0.1, 10))
+        size = self.store.size()
+        self.store.evict(size//2)
+        self.assertLessEqual(self.store.size(), size//2)
+        # the most recently used entries are kept
+        with profiling.profile() as stats:
+            self.cfg.S11_map(np.full(1000, 0.1), np.linspace(0.01, 0.1, 10))
+        self.assertEqual(stats['counts'].get('cache_hits'), 1)
+
+    def test_stale_tmp(self):
+        self.cfg.solve_short_lengths()
+        stale, recent = [os.path.join(self.tmpdir.name, name) for name in ('stale.tmp', 'recent.tmp')]
+        for path in (stale, recent):
+            with open(path, 'wb') as fid:
+                fid.write(b'partial entry')
+        age = time.time() - cache.STALE_TMP_AGE - 10
+        os.utime(stale, (age, age))
+        self.store.evict()
+        self.assertFalse(os.path.exists(stale))
+        # a temporary file possibly being written is kept
+        self.assertTrue(os.path.exists(recent))
+        self.assertEqual(len(self.store._entries()), 1)
+
+    def test_read_only(self):
+        self.cfg.solve_short_lengths()
+        with mock.patch('os.utime', side_effect=PermissionError):
+            with profiling.profile() as stats:
+                L_sols, _ = self.cfg.solve_short_lengths()
+        self.assertEqual(stats['counts'].get('cache_hits'), 1)
+        self.assertEqual(L_sols.shape, (2, 2))
+
+    def test_write_error(self):
+        with mock.patch('tempfile.mkstemp', side_effect=PermissionError):
+            with profiling.profile() as stats:
+                L_sols, _ = self.cfg.solve_short_lengths()
+        self.assertEqual(stats['counts'].get('cache_write_errors'), 1)
+        self.assertEqual(L_sols.shape, (2, 2))
+        self.assertEqual(self.store._entries(), [])
+
+    def test_corrupted_entry(self):
+        self.cfg.solve_short_lengths()
+        (entry,) = os.listdir(self.tmpdir.name)
+        with open(os.path.join(self.tmpdir.name, entry), 'wb') as fid:
+            fid.write(b'garbage')
+        L_sols, _ = self.cfg.solve_short_lengths()
+        self.assertEqual(L_sols.shape, (2, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the command-line batch runner
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+from tresonator import Configuration
+from tresonator import cli
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+class TestCLI(unittest.TestCase):
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def _main(self, *argv):
+        return cli.main(list(argv) + ['-o', self.output])
+
+    def test_sweep(self):
+        self.assertEqual(self._main('sweep', '--freqs', '62e6', '63e6', '5'), 0)
+        with np.load(os.path.join(self.output, 'sweep_0000.npz')) as data:
+            S11, Zin = Configuration(62.64e6, 20e3, 0.035, 0.027).sweep(np.linspace(62e6, 63e6, 5))
+            np.testing.assert_allclose(data['S11'], S11)
+            np.testing.assert_allclose(data['Zin'], Zin)
+        with open(os.path.join(self.output, 'sweep_0000.json')) as fid:
+            metadata = json.load(fid)
+        self.assertEqual(metadata['spec']['command'], 'sweep')
+        self.assertGreaterEqual(metadata['elapsed'], 0)
+        self.assertIn('counts', metadata['profile'])
+
+    def test_jobs_expansion(self):
+        self.assertEqual(self._main('optimize', '--f', '62e6', '63e6', '--additional-losses', '1', '1.5'), 0)
+        with open(os.path.join(self.output, cli.SUMMARY_FILENAME)) as fid:
+            jobs = json.load(fid)['jobs']
+        self.assertEqual([job['name'] for job in jobs], ['optimize_{:04d}'.format(idx) for idx in range(4)])
+        with np.load(os.path.join(self.output, 'optimize_0003.npz')) as data:
+            L, _ = Configuration(63e6, 20e3, 0.035, 0.027, additional_losses=1.5).solve_short_lengths()
+            np.testing.assert_allclose(data['L_DUT'], L[:, 0])
+            np.testing.assert_allclose(data['L_CEA'], L[:, 1])
+            self.assertTrue(np.all(data['S11_dB'] < -60))
+
+    def test_csv(self):
+        self.assertEqual(self._main('map', '--L-DUT-range', '0.01', '0.05', '3',
+                                    '--L-CEA-range', '0.01', '0.1', '4', '--format', 'csv'), 0)
+        filename = os.path.join(self.output, 'map_0000.csv')
+        with open(filename) as fid:
+            metadata = json.loads(fid.readline()[2:])
+        self.assertEqual(metadata['spec']['L_CEA_range'], [0.01, 0.1, 4])
+        data = np.genfromtxt(filename, delimiter=',', names=True, skip_header=1)
+        S11, _, _ = Configuration(62.64e6, 20e3, 0.035, 0.027).S11_map(np.linspace(0.01, 0.05, 3),
+                                                                       np.linspace(0.01, 0.1, 4))
+        np.testing.assert_allclose(data['S11_re'] + 1j*data['S11_im'], S11.ravel())
+
+    def test_config_file(self):
+        config = os.path.join(self.output, 'jobs_config.json')
+        with open(config, 'w') as fid:
+            json.dump({'jobs': [{'name': 'low', 'f': 61e6},
+                                {'name': 'high', 'f': [63e6, 64e6]},
+                                {'name': 'bad', 'method': 'unknown'}]}, fid)
+        self.assertEqual(self._main('optimize', '--config', config, '-j', '2'), 1)
+        with open(os.path.join(self.output, cli.SUMMARY_FILENAME)) as fid:
+            jobs = {job['name']: job for job in json.load(fid)['jobs']}
+        self.assertEqual(sorted(jobs), ['bad', 'high_0000', 'high_0001', 'low'])
+        self.assertIn('ValueError', jobs['bad']['error'])
+        for name in ('low', 'high_0000', 'high_0001'):
+            self.assertIsNone(jobs[name]['error'])
+            self.assertTrue(os.path.exists(os.path.join(self.output, name + '.npz')))
+        with open(os.path.join(self.output, 'high_0001.json')) as fid:
+            self.assertEqual(json.load(fid)['spec']['f'], 64e6)
+
+    def test_config_not_overwritten(self):
+        config = os.path.join(self.output, 'jobs.json')
+        with open(config, 'w') as fid:
+            json.dump([{'name': 'jobs'}], fid)
+        with self.assertRaises(SystemExit):
+            self._main('sweep', '--config', config)
+        with open(config) as fid:
+            self.assertEqual(json.load(fid), [{'name': 'jobs'}])
+        for jobs in ([{'name': '_summary'}], [{'name': 'a'}, {'name': 'a'}]):
+            with open(config, 'w') as fid:
+                json.dump(jobs, fid)
+            with self.assertRaises(SystemExit):
+                self._main('sweep', '--config', config)
+
+    def test_optimize_random(self):
+        self.assertEqual(self._main('optimize', '--method', 'random', '--n-solutions', '2', '--seed', '21'), 0)
+        with np.load(os.path.join(self.output, 'optimize_0000.npz')) as data:
+            self.assertEqual(len(data['S11_dB']), 2)
+            self.assertTrue(np.all(data['S11_dB'] < -40))
+            self.assertGreater(np.abs(np.diff(data['L_DUT'])[0]), 1e-3)
+
+    def test_complex_short_impedance(self):
+        self.assertEqual(self._main('sweep', '--freqs', '62e6', '63e6', '3',
+                                    '--Z-short-DUT', '0.01+0.2j', '--Z-short-CEA', '0.02'), 0)
+        cfg = Configuration(62.64e6, 20e3, 0.035, 0.027, Z_short_DUT=0.01+0.2j, Z_short_CEA=0.02)
+        with np.load(os.path.join(self.output, 'sweep_0000.npz')) as data:
+            np.testing.assert_allclose(data['S11'], cfg.sweep(np.linspace(62e6, 63e6, 3))[0])
+
+    def test_write_error(self):
+        # the output of the first job cannot be written: a directory has its name
+        os.mkdir(os.path.join(self.output, 'first.npz'))
+        config = os.path.join(self.output, 'jobs_config.json')
+        with open(config, 'w') as fid:
+            json.dump([{'name': 'first'}, {'name': 'second'}], fid)
+        self.assertEqual(self._main('sweep', '--config', config, '-j', '2'), 1)
+        with open(os.path.join(self.output, cli.SUMMARY_FILENAME)) as fid:
+            jobs = {job['name']: job for job in json.load(fid)['jobs']}
+        self.assertIsNotNone(jobs['first']['error'])
+        self.assertIsNone(jobs['second']['error'])
+
+    def test_track(self):
+        self.assertEqual(self._main('track', '--freqs', '61e6', '63e6', '11'), 0)
+        with np.load(os.path.join(self.output, 'track_0000.npz')) as data:
+            self.assertTrue(np.all(np.abs(data['S11']) < 1e-3))
+            self.assertTrue(set(data['f']) <= set(np.linspace(61e6, 63e6, 11)))
+
+    def test_module_without_matplotlib(self):
+        out = subprocess.check_output([sys.executable, '-c',
+                                       'import sys, runpy\n'
+                                       'sys.argv = ["tresonator", "sweep", "--freqs", "62e6", "63e6", "3", '
+                                       '"-o", {!r}]\n'
+                                       'try:\n'
+                                       '    runpy.run_module("tresonator", run_name="__main__")\n'
+                                       'except SystemExit as exit:\n'
+                                       '    print(exit.code, "matplotlib" in sys.modules)'.format(self.output)],
+                                      cwd=ROOT, universal_newlines=True)
+        self.assertEqual(out.split()[-2:], ['0', 'False'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,8 @@
 Tests of the Coax class
 """
 import unittest
-from tresonator import Coax
+import numpy as np
+from tresonator import Coax, section_cache_info, section_cache_clear
 
 class TestCoax(unittest.TestCase):
     
@@ -37,3 +38,20 @@ class TestCoax(unittest.TestCase):
             co = Coax(L=1, Dint=2, Dout=3) 
             co.gamma(f=0)        
 
+
+    def test_Coax_gamma_cache(self):
+        section_cache_clear()
+        co = Coax(L=1, Dint=0.14, Dout=0.23) 
+        gamma = co.gamma(f=62e6, additional_loss=1.2)
+        self.assertEqual(section_cache_info()['misses'], 1)
+        self.assertEqual(co.gamma(f=62e6, additional_loss=1.2), gamma)
+        self.assertEqual(section_cache_info()['hits'], 1)
+        section_cache_clear()
+        self.assertEqual(section_cache_info()['currsize'], 0)
+        
+    def test_Coax_gamma_array(self):
+        co = Coax(L=1, Dint=0.14, Dout=0.23)
+        freqs = np.array([61e6, 62e6, 63e6])
+        gammas = co.gamma(freqs)
+        for f, gamma in zip(freqs, gammas):
+            self.assertAlmostEqual(co.gamma(f), gamma)
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the Configuration class
+"""
+import unittest
+import numpy as np
+from tresonator import Configuration, Topology
+
+class TestConfiguration(unittest.TestCase):
+    
+    def setUp(self):
+        self.f = 62.64e6
+        self.P_in = 20e3
+        self.cfg = Configuration(self.f, self.P_in, L_DUT=0.035, L_CEA=0.027)
+        
+    def test_sweep_shape(self):
+        freqs = np.linspace(61e6, 64e6, 31)
+        S11, Zin = self.cfg.sweep(freqs)
+        self.assertEqual(S11.shape, freqs.shape)
+        self.assertEqual(Zin.shape, freqs.shape)
+        
+    def test_sweep_vs_scalar(self):
+        freqs = np.linspace(61e6, 64e6, 31)
+        S11, Zin = self.cfg.sweep(freqs)
+        for idx, f in enumerate(freqs):
+            _cfg = Configuration(f, self.P_in, L_DUT=0.035, L_CEA=0.027)
+            np.testing.assert_allclose(S11[idx], _cfg.S11(), rtol=1e-12)
+            np.testing.assert_allclose(Zin[idx], _cfg.input_impedance()[0], rtol=1e-12)
+
+    def test_set_short_lengths(self):
+        # all the model methods use the short lengths set after construction
+        cfg = Configuration(self.f, self.P_in, L_DUT=0.035, L_CEA=0.027)
+        cfg.L_DUT, cfg.L_CEA = 0.05, 0.03
+        ref = Configuration(self.f, self.P_in, L_DUT=0.05, L_CEA=0.03)
+        np.testing.assert_allclose(cfg.input_impedance()[0], ref.input_impedance()[0], rtol=1e-12)
+        for values, ref_values in zip(cfg.voltage_current(), ref.voltage_current()):
+            np.testing.assert_allclose(values, ref_values, rtol=1e-12)
+        S11, grad = cfg.S11_and_grad()
+        S11_ref, grad_ref = ref.S11_and_grad()
+        np.testing.assert_allclose(S11, S11_ref, rtol=1e-12)
+        np.testing.assert_allclose(grad, grad_ref, rtol=1e-12)
+        self.assertEqual(cfg.parameters(), ref.parameters())
+        self.assertEqual(cfg.peak_voltage_current()['V_max'], ref.peak_voltage_current()['V_max'])
+
+    def test_array_frequency(self):
+        freqs = np.linspace(61e6, 64e6, 31)
+        cfg = Configuration(freqs, self.P_in, L_DUT=0.035, L_CEA=0.027)
+        self.assertEqual(cfg.S11dB().shape, freqs.shape)
+        np.testing.assert_allclose(cfg.S11(), self.cfg.sweep(freqs)[0])
+
+    def test_S11_map_vs_scalar(self):
+        L_DUTs = np.linspace(10e-3, 60e-3, 5)
+        L_CEAs = np.linspace(10e-3, 120e-3, 7)
+        S11, S11dB, Zin = self.cfg.S11_map(L_DUTs, L_CEAs)
+        self.assertEqual(S11.shape, (5, 7))
+        for i, L_DUT in enumerate(L_DUTs):
+            for j, L_CEA in enumerate(L_CEAs):
+                _cfg = Configuration(self.f, self.P_in, L_DUT, L_CEA)
+                np.testing.assert_allclose(S11[i,j], _cfg.S11(), rtol=1e-12)
+                np.testing.assert_allclose(S11dB[i,j], _cfg.S11dB(), rtol=1e-12)
+                np.testing.assert_allclose(Zin[i,j], _cfg.input_impedance()[0], rtol=1e-12)
+
+    def test_S11_map_frequency_cube(self):
+        L_DUTs = np.linspace(10e-3, 60e-3, 5)
+        L_CEAs = np.linspace(10e-3, 120e-3, 7)
+        freqs = np.array([61e6, 62e6, 63e6])
+        S11, _, _ = self.cfg.S11_map(L_DUTs, L_CEAs, f=freqs)
+        self.assertEqual(S11.shape, (3, 5, 7))
+        np.testing.assert_allclose(S11[1], self.cfg.S11_map(L_DUTs, L_CEAs, f=62e6)[0])
+
+    def test_voltage_current_arrays(self):
+        L_CEA, L_DUT, V_CEA, V_DUT, I_CEA, I_DUT = self.cfg.voltage_current(dl=5e-3)
+        for arr in (V_CEA, V_DUT, I_CEA, I_DUT):
+            self.assertEqual(arr.dtype, complex)
+            self.assertTrue(arr.flags['C_CONTIGUOUS'])
+        self.assertEqual(L_CEA.shape, V_CEA.shape)
+        self.assertEqual(L_DUT.shape, I_DUT.shape)
+        
+    def test_voltage_current_impedances(self):
+        Zin, Z_CEA, Z_DUT = self.cfg.input_impedance()
+        L_CEA, L_DUT, V_CEA, V_DUT, I_CEA, I_DUT = self.cfg.voltage_current()
+        # at T-junction: branch impedances, with same voltage on both branches
+        np.testing.assert_allclose(V_DUT[0]/I_DUT[0], Z_DUT[-1])
+        np.testing.assert_allclose(V_CEA[0]/I_CEA[0], Z_CEA[-1])
+        np.testing.assert_allclose(V_DUT[0], V_CEA[0])
+        # sampling does not change the profile
+        L_CEA2, _, V_CEA2, _, _, _ = self.cfg.voltage_current(dl=2e-3)
+        np.testing.assert_allclose(L_CEA2, L_CEA[::2])
+        np.testing.assert_allclose(V_CEA2, V_CEA[::2])
+
+    def test_peak_voltage_current(self):
+        peaks = self.cfg.peak_voltage_current()
+        L_CEA, L_DUT, V_CEA, V_DUT, I_CEA, I_DUT = self.cfg.voltage_current(dl=1e-4)
+        for X, L, profile in (('V_DUT', L_DUT, V_DUT), ('V_CEA', L_CEA, V_CEA), 
+                              ('I_DUT', L_DUT, I_DUT), ('I_CEA', L_CEA, I_CEA)):
+            self.assertEqual(peaks[X].shape, (len(getattr(self.cfg, '_'+X[2:]+'_SECTIONS')),))
+            # maxima are above the sampled profile, and close to it
+            self.assertGreaterEqual(peaks[X].max()*(1 + 1e-12), np.abs(profile).max())
+            np.testing.assert_allclose(peaks[X].max(), np.abs(profile).max(), rtol=1e-5)
+            z = peaks['z_'+X].ravel()[np.argmax(peaks[X])]
+            self.assertLess(abs(z - L[np.argmax(np.abs(profile))]), 1e-2)
+        self.assertEqual(peaks['V_max'], max(peaks['V_DUT'].max(), peaks['V_CEA'].max()))
+        self.assertIn(peaks['branch_V_max'], ('DUT', 'CEA'))
+        
+    def test_peak_voltage_current_arrays(self):
+        freqs = np.linspace(61e6, 64e6, 4)
+        L_DUTs = np.linspace(10e-3, 60e-3, 3)[:, np.newaxis]
+        cfg = Configuration(freqs, self.P_in, L_DUT=0.035, L_CEA=0.027)
+        peaks = cfg.peak_voltage_current(L_DUT=L_DUTs)
+        self.assertEqual(peaks['V_max'].shape, (3, 4))
+        self.assertEqual(peaks['I_DUT'].shape, (len(cfg._DUT_SECTIONS), 3, 4))
+        _peaks = Configuration(freqs[1], self.P_in, L_DUTs[2, 0], 0.027).peak_voltage_current()
+        for key in ('V_max', 'z_V_max', 'I_CEA', 'z_I_DUT'):
+            np.testing.assert_allclose(peaks[key][..., 2, 1], _peaks[key], rtol=1e-10)
+
+    def test_solve_short_lengths(self):
+        L, S11 = self.cfg.solve_short_lengths()
+        self.assertEqual(L.shape, (2, 2))
+        # sorted solutions
+        self.assertLess(L[0,0], L[1,0])
+        for (L_DUT, L_CEA), _S11 in zip(L, S11):
+            _cfg = Configuration(self.f, self.P_in, L_DUT, L_CEA)
+            self.assertLess(np.abs(_cfg.S11()), 1e-9)
+            np.testing.assert_allclose(_S11, _cfg.S11(), atol=1e-12)
+            
+    def test_solve_short_lengths_deterministic(self):
+        L1, _ = self.cfg.solve_short_lengths()
+        L2, _ = self.cfg.solve_short_lengths()
+        np.testing.assert_array_equal(L1, L2)
+        
+    def test_solve_short_lengths_no_solution(self):
+        L, S11 = self.cfg.solve_short_lengths(bounds=[(1e-3, 2e-3), (1e-3, 2e-3)])
+        self.assertEqual(L.shape, (0, 2))
+        self.assertEqual(S11.shape, (0,))
+
+    def test_track_short_lengths(self):
+        freqs = np.linspace(62e6, 63e6, 21)
+        L, S11, events = self.cfg.track_short_lengths(freqs, rescan=5)
+        self.assertEqual(L.shape[0], len(freqs))
+        self.assertEqual(L.shape[2], 2)
+        self.assertEqual(S11.shape, L.shape[:2])
+        self.assertEqual(events[0][0], 'appear')
+        # same solutions than the full solve at each frequency
+        for idx_f in (0, 10, 20):
+            _cfg = Configuration(freqs[idx_f], self.P_in, 0.035, 0.027)
+            L_sols, _ = _cfg.solve_short_lengths()
+            L_tracked = L[idx_f][~np.isnan(L[idx_f,:,0])]
+            np.testing.assert_allclose(np.sort(L_tracked, axis=0), 
+                                       np.sort(L_sols, axis=0), atol=1e-9)
+
+    def test_S11_and_grad_vs_finite_differences(self):
+        params = dict(L_DUT=0.035, L_CEA=0.027, Z_short_DUT=5e-3, 
+                      Z_short_CEA=7e-3, additional_losses=1.2)
+        cfg = Configuration(self.f, self.P_in, **params)
+        S11, dS11 = cfg.S11_and_grad()
+        self.assertEqual(dS11.shape, (len(Configuration.GRAD_PARAMS),))
+        np.testing.assert_allclose(S11, cfg.S11())
+        for idx, name in enumerate(Configuration.GRAD_PARAMS):
+            h = 1e-6*params[name]
+            S11_pm = []
+            for sign in (+1, -1):
+                _params = dict(params)
+                _params[name] += sign*h
+                S11_pm.append(Configuration(self.f, self.P_in, **_params).S11())
+            np.testing.assert_allclose(dS11[idx], (S11_pm[0] - S11_pm[1])/(2*h), rtol=1e-5)
+
+    def test_S11_and_grad_frequencies(self):
+        freqs = np.linspace(61e6, 64e6, 11)
+        cfg = Configuration(freqs, self.P_in, L_DUT=0.035, L_CEA=0.027)
+        S11, dS11 = cfg.S11_and_grad(params=('L_DUT', 'additional_losses'))
+        self.assertEqual(dS11.shape, (2, 11))
+        _, dS11_scalar = Configuration(freqs[3], self.P_in, 0.035, 0.027).S11_and_grad()
+        np.testing.assert_allclose(dS11[:, 3], dS11_scalar[[0, 4]])
+
+    def test_sensitivities(self):
+        freqs = np.linspace(62e6, 63.3e6, 5)
+        cfg = Configuration(self.f, self.P_in, 0.035, 0.027, Z_short_DUT=5e-3, additional_losses=1.2)
+        dS11, dZin, names = cfg.sensitivities(freqs)
+        params = cfg.parameters()
+        self.assertEqual(names, list(params))
+        self.assertEqual(dS11.shape, (len(names), 5))
+        # same derivatives than S11_and_grad for the configuration parameters
+        _, dS11_grad = Configuration(freqs, self.P_in, 0.035, 0.027, Z_short_DUT=5e-3, 
+                                     additional_losses=1.2).S11_and_grad()
+        for idx, name in enumerate(Configuration.GRAD_PARAMS):
+            np.testing.assert_allclose(dS11[names.index(name)], dS11_grad[idx])
+        # finite differences of the section parameters
+        for name, rel_step in (('D3.L', 1e-6), ('D1.Dint', 1e-6), ('C2.Dout', 1e-6), 
+                               ('C2.sigma', 1e-4), ('C0.L', 1e-6)):
+            section, attr = name.split('.')
+            branch = 'DUT' if section[0] == 'D' else 'CEA'
+            h = rel_step*params[name]
+            Zin_pm = []
+            for sign in (+1, -1):
+                sections = {key: [dict(_section) for _section in value] 
+                            for key, value in cfg.topology.branches.items()}
+                sections[branch][int(section[1:])][attr] += sign*h
+                cfg_pm = Configuration(freqs, self.P_in, 0.035, 0.027, Z_short_DUT=5e-3, 
+                                       additional_losses=1.2, topology=Topology(**sections))
+                Zin_pm.append(cfg_pm.input_impedance()[0])
+            np.testing.assert_allclose(dZin[names.index(name)], (Zin_pm[0] - Zin_pm[1])/(2*h), rtol=1e-5)
+
+    def test_optimize_short_lengths_seed(self):
+        L1 = self.cfg.optimize_short_lengths(seed=1)
+        L2 = self.cfg.optimize_short_lengths(seed=1)
+        np.testing.assert_array_equal(L1, L2)
+        self.assertLess(np.abs(Configuration(self.f, self.P_in, *L1).S11()), 1e-3)
+        
+    def test_optimize_short_lengths_parallel(self):
+        L1 = self.cfg.optimize_short_lengths(n_solutions=2, seed=2)
+        L2 = self.cfg.optimize_short_lengths(n_solutions=2, seed=2, n_jobs=2)
+        self.assertEqual(L1.shape, (2, 2))
+        np.testing.assert_array_equal(L1, L2)
+        L_sols, _ = self.cfg.solve_short_lengths()
+        np.testing.assert_allclose(np.sort(L1, axis=0), np.sort(L_sols, axis=0), atol=1e-4)
+
+    def test_optimize_short_lengths_distinct(self):
+        # seed which used to return the same match point several times
+        L = self.cfg.optimize_short_lengths(n_solutions=2, seed=21, cache=False)
+        self.assertGreater(np.max(np.abs(L[0] - L[1])), 1e-3)
+        for _L in L:
+            self.assertLess(np.abs(Configuration(self.f, self.P_in, *_L).S11()), 1e-2)
+        L_sols, _ = self.cfg.solve_short_lengths()
+        np.testing.assert_allclose(np.sort(L, axis=0), np.sort(L_sols, axis=0), atol=1e-4)
+
+    def test_reduced_model(self):
+        model = self.cfg.reduced_model()
+        np.testing.assert_allclose(model.S11(0.035, 0.027), self.cfg.S11(), rtol=1e-12)
+        np.testing.assert_allclose(model.input_impedance(0.035, 0.027), 
+                                   self.cfg.input_impedance()[0], rtol=1e-12)
+        # new lengths and shorts without rebuilding the configuration
+        _cfg = Configuration(self.f, self.P_in, 0.05, 0.1, Z_short_DUT=0.1, Z_short_CEA=0.2)
+        np.testing.assert_allclose(model.S11(0.05, 0.1, Z_short_DUT=0.1, Z_short_CEA=0.2), 
+                                   _cfg.S11(), rtol=1e-12)
+        
+    def test_reduced_model_frequencies(self):
+        freqs = np.linspace(61e6, 64e6, 11)
+        model = self.cfg.reduced_model(freqs)
+        np.testing.assert_allclose(model.S11(0.035, 0.027), self.cfg.sweep(freqs)[0], rtol=1e-12)
+
+    def test_circuit_template(self):
+        import skrf as rf
+        freq = rf.Frequency(61, 64, 11, unit='MHz')
+        template = self.cfg.circuit_template(freq)
+        np.testing.assert_allclose(template.s(), self.cfg.circuit(freq).s_external, atol=1e-10)
+        # batch of lengths
+        L_DUTs, L_CEAs = np.array([0.03, 0.05]), np.array([0.02, 0.1])
+        s = template.s(L_DUTs, L_CEAs)
+        self.assertEqual(s.shape, (2, 11, 1, 1))
+        _cfg = Configuration(self.f, self.P_in, L_DUTs[1], L_CEAs[1])
+        np.testing.assert_allclose(s[1], _cfg.circuit(freq).s_external, atol=1e-10)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the measurement fitting
+"""
+import unittest
+import numpy as np
+from tresonator import Configuration, fit_measurement
+
+class TestFitting(unittest.TestCase):
+    
+    def setUp(self):
+        self.freqs = np.linspace(62e6, 63.5e6, 401)
+        self.params = {'L_DUT': 0.035, 'L_CEA': 0.027, 'additional_losses': 1.2}
+        self.s11 = Configuration(self.freqs, 1, **self.params).S11()
+        self.x0 = {'L_DUT': 0.034, 'L_CEA': 0.028, 'additional_losses': 1}
+        
+    def test_fit_complex(self):
+        res = fit_measurement(self.freqs, self.s11, params=self.params.keys(), 
+                              x0=self.x0, residual='complex')
+        for name, value in self.params.items():
+            self.assertAlmostEqual(res.params[name], value, places=6)
+        self.assertEqual(res.covariance.shape, (3, 3))
+        self.assertGreater(res.elapsed, 0)
+
+    def test_fit_dB(self):
+        res = fit_measurement(self.freqs, self.s11, params=self.params.keys(), 
+                              x0=self.x0, residual='dB')
+        for name, value in self.params.items():
+            self.assertAlmostEqual(res.params[name], value, places=6)
+            
+    def test_fit_bad_residual(self):
+        with self.assertRaises(ValueError):
+            fit_measurement(self.freqs, self.s11, residual='abs')
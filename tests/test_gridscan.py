@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the streaming grid evaluation
+"""
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from tresonator import Configuration, gridscan
+
+class TestGridScan(unittest.TestCase):
+    
+    def setUp(self):
+        self.cfg = Configuration(62.64e6, 20e3, L_DUT=0.035, L_CEA=0.027)
+        self.freqs = np.linspace(62e6, 63e6, 5)
+        self.L_DUTs = np.linspace(10e-3, 100e-3, 7)
+        self.L_CEAs = np.linspace(10e-3, 120e-3, 6)
+        self.additional_losses = [1, 1.5]
+        self.expected = np.stack([Configuration(62e6, 1, 0.035, 0.027, additional_losses=loss).S11_map(
+                                      self.L_DUTs, self.L_CEAs, self.freqs)[0]
+                                  for loss in self.additional_losses], axis=-1)
+        
+    def _run(self, **kwargs):
+        return gridscan.run(self.cfg, self.freqs, self.L_DUTs, self.L_CEAs, 
+                            self.additional_losses, chunk_elements=50, **kwargs)
+
+    def test_vs_S11_map(self):
+        S11 = self._run()
+        self.assertEqual(S11.shape, (5, 7, 6, 2))
+        np.testing.assert_allclose(S11, self.expected, rtol=1e-12)
+
+    def test_chunks(self):
+        rows = []
+        for idx_f, idx_DUT, S11 in gridscan.iterate(self.cfg, self.freqs, self.L_DUTs, self.L_CEAs,
+                                                    self.additional_losses, chunk_elements=50):
+            self.assertLessEqual(S11.size, 50)
+            np.testing.assert_allclose(S11, self.expected[idx_f, idx_DUT], rtol=1e-12)
+            rows.extend(zip(idx_f, idx_DUT))
+        self.assertEqual(len(set(rows)), 5*7)
+
+    def test_memmap_and_resume(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'scan.npy')
+            # interrupted after 3 chunks
+            chunks = gridscan.iterate(self.cfg, self.freqs, self.L_DUTs, self.L_CEAs,
+                                      self.additional_losses, filename, chunk_elements=50)
+            for _ in range(3):
+                next(chunks)
+            chunks.close()
+            with open(filename + '.progress.json') as fid:
+                self.assertEqual(len(json.load(fid)['done']), 3)
+            nb_chunks = sum(1 for _ in gridscan.iterate(self.cfg, self.freqs, self.L_DUTs, self.L_CEAs,
+                                                         self.additional_losses, filename, chunk_elements=50))
+            self.assertEqual(nb_chunks, 35//4 + 1 - 3)
+            S11 = self._run(filename=filename)
+            self.assertIsInstance(S11, np.memmap)
+            np.testing.assert_allclose(S11, self.expected, rtol=1e-12)
+            del S11
+            # another scan in the same file
+            with self.assertRaises(ValueError):
+                gridscan.run(self.cfg, self.freqs[:2], self.L_DUTs, self.L_CEAs, filename=filename)
+            S11 = gridscan.run(self.cfg, self.freqs[:2], self.L_DUTs, self.L_CEAs, filename=filename, resume=False)
+            self.assertEqual(S11.shape, (2, 7, 6, 1))
+            del S11
+
+    def test_parallel(self):
+        np.testing.assert_allclose(self._run(n_jobs=2), self.expected, rtol=1e-12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the package import: the core model must import with NumPy only
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# heavy dependencies which must be loaded lazily
+LAZY_MODULES = ('scipy', 'skrf', 'matplotlib', 'pandas')
+
+def _run(code):
+    """
+    Run python code in a fresh interpreter and returns its stdout
+    """
+    return subprocess.check_output([sys.executable, '-c', code], cwd=ROOT,
+                                   universal_newlines=True)
+
+class TestImport(unittest.TestCase):
+
+    def test_lazy_dependencies(self):
+        out = _run('import sys, tresonator\n'
+                   'print(" ".join(sorted(set(m.split(".")[0] for m in sys.modules))))')
+        loaded = out.split()
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, loaded)
+
+    def test_model_without_heavy_dependencies(self):
+        out = _run('import sys, tresonator\n'
+                   'cfg = tresonator.Configuration(62.64e6, 20e3, L_DUT=0.035, L_CEA=0.027)\n'
+                   'cfg.S11(); cfg.sweep([62e6, 63e6]); cfg.voltage_current()\n'
+                   'cfg.solve_short_lengths()\n'
+                   'print("scipy" in sys.modules, "skrf" in sys.modules)')
+        self.assertEqual(out.split(), ['False', 'False'])
+
+    def test_import_time(self):
+        # generous bound, only meant to catch a heavy import coming back
+        out = _run('import time; t0 = time.perf_counter(); import tresonator\n'
+                   'print(time.perf_counter() - t0)')
+        self.assertLess(float(out), 2.0)
+
+    def test_lazy_loading(self):
+        out = _run('import sys, tresonator\n'
+                   'cfg = tresonator.Configuration(62.64e6, 20e3, L_DUT=0.035, L_CEA=0.027)\n'
+                   'cfg.circuit()\n'
+                   'print("skrf" in sys.modules)')
+        self.assertEqual(out.split()[-1], 'True')
+
+if __name__ == '__main__':
+    unittest.main()
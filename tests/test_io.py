@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the measurement files loaders
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from tresonator import io
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+class TestIO(unittest.TestCase):
+    
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+    
+    def test_read_asc(self):
+        filename = os.path.join(DATA_DIR, 'RES2.ASC')
+        f, s, z0, header = io.read_asc(filename)
+        exp_freq, reS11, imS11 = np.loadtxt(filename, skiprows=14, delimiter=';', unpack=True)
+        np.testing.assert_array_equal(f, exp_freq)
+        np.testing.assert_array_equal(s[:,0,0], reS11 + 1j*imS11)
+        self.assertEqual(z0, 50)
+        self.assertEqual(header['parameter-type'], 'S11')
+        
+    def test_read_touchstone(self):
+        f, s, z0 = io.read_touchstone(os.path.join(DATA_DIR, 'SSA84_TaskB_resonator_matched_voltage_probesAC_2022-02-07.s3p'))
+        self.assertEqual(s.shape, (len(f), 3, 3))
+        self.assertEqual(f[0], 61.2e6)
+        # first line of data: dB, angle of S11
+        np.testing.assert_allclose(s[0,0,0], 10**(-1.210494553902458E-1/20)*np.exp(1j*np.deg2rad(1.236637893936494E1)))
+        # row-major ordering: S12 then S13 on the first line
+        np.testing.assert_allclose(s[0,0,1], 10**(-7.402742854157910E1/20)*np.exp(1j*np.deg2rad(7.172156435768675E1)))
+        
+    def test_load_cache(self):
+        filename = os.path.join(DATA_DIR, 'SSA84_TaskB_resonator_matched.s1p')
+        f, s, z0 = io.load(filename, cache_dir=self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        f2, s2, z02 = io.load(filename, cache_dir=self.cache_dir)
+        self.assertIsInstance(s2, np.memmap)
+        np.testing.assert_array_equal(f, f2)
+        np.testing.assert_array_equal(s, s2)
+        self.assertEqual(z0, z02)
+        
+    def test_load_cache_other_files(self):
+        # the entries of a file whose name starts with the loaded one are kept
+        filename = os.path.join(DATA_DIR, 'SSA84_TaskB_resonator_matched.s1p')
+        other_entries = [os.path.basename(filename) + '.bak.0123456789abcdef.' + ext
+                         for ext in ('npy', 'json')]
+        for entry in other_entries:
+            open(os.path.join(self.cache_dir, entry), 'w').close()
+        outdated = os.path.basename(filename) + '.fedcba9876543210.npy'
+        open(os.path.join(self.cache_dir, outdated), 'w').close()
+        io.load(filename, cache_dir=self.cache_dir)
+        entries = os.listdir(self.cache_dir)
+        self.assertEqual(len(entries), 4)
+        self.assertNotIn(outdated, entries)
+        for entry in other_entries:
+            self.assertIn(entry, entries)
+
+    def test_load_cache_not_writable(self):
+        filename = os.path.join(DATA_DIR, 'SSA84_TaskB_resonator_matched.s1p')
+        # the cache directory cannot be created under a file
+        not_a_dir = os.path.join(self.cache_dir, 'file')
+        open(not_a_dir, 'w').close()
+        f, s, z0 = io.load(filename, cache_dir=os.path.join(not_a_dir, 'cache'))
+        f_ref, s_ref, _ = io.load(filename, cache=False)
+        np.testing.assert_array_equal(f, f_ref)
+        np.testing.assert_array_equal(s, s_ref)
+
+    def test_load_unknown(self):
+        with self.assertRaises(ValueError):
+            io.load('measurement.txt')
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the Monte Carlo tolerance analysis
+"""
+import unittest
+import numpy as np
+from tresonator import Configuration, montecarlo, conductivity_SS, conductivity_Cu
+
+class TestMonteCarlo(unittest.TestCase):
+    
+    def setUp(self):
+        self.cfg = Configuration(62.64e6, 20e3, L_DUT=0.035, L_CEA=0.027)
+        self.freqs = np.linspace(62e6, 63.3e6, 131)
+        
+    def test_nominal(self):
+        res = montecarlo.run(self.cfg, self.freqs, {}, n_samples=2)
+        S11, Zin = Configuration(self.freqs, 20e3, L_DUT=0.035, L_CEA=0.027).sweep(self.freqs)
+        idx = np.argmin(np.abs(S11))
+        np.testing.assert_allclose(res['S11_min'], S11[idx])
+        np.testing.assert_allclose(res['Zin_match'], Zin[idx])
+        np.testing.assert_array_less(np.abs(res['f_match'] - self.freqs[idx]), self.freqs[1] - self.freqs[0])
+        
+    def test_sampled_sections(self):
+        # sampled sections give the same impedance than the fixed ones
+        params = self.cfg.parameters()
+        Zin = montecarlo.input_impedance(self.cfg, params, self.freqs)
+        params = {name: np.full((3, 1), value) for name, value in params.items()}
+        Zin_sampled = montecarlo.input_impedance(self.cfg, params, self.freqs)
+        self.assertEqual(Zin_sampled.shape, (3, len(self.freqs)))
+        np.testing.assert_allclose(Zin_sampled, np.broadcast_to(Zin, (3, len(self.freqs))), rtol=1e-9)
+        
+    def test_samples(self):
+        res = montecarlo.run(self.cfg, self.freqs, 
+                             {'L_DUT': montecarlo.Normal(0.5e-3),
+                              'Z_short_CEA': montecarlo.Uniform((5e-3, 2e-2))},
+                             n_samples=5, seed=0)
+        for idx in range(5):
+            cfg = Configuration(self.freqs, 20e3, L_DUT=res['samples']['L_DUT'][idx], L_CEA=0.027, 
+                                Z_short_CEA=res['samples']['Z_short_CEA'][idx])
+            S11 = cfg.S11()
+            np.testing.assert_allclose(res['S11_min'][idx], S11[np.argmin(np.abs(S11))])
+            
+    def test_chunks(self):
+        distributions = {'D3.Dint': montecarlo.Normal(0.01, relative=True),
+                         'C2.sigma': montecarlo.Choice([conductivity_SS, conductivity_Cu]),
+                         'additional_losses': montecarlo.Uniform(0.2)}
+        res = montecarlo.run(self.cfg, self.freqs, distributions, n_samples=50, seed=1)
+        res_chunks = montecarlo.run(self.cfg, self.freqs, distributions, n_samples=50, 
+                                    chunk_size=7, seed=1)
+        for key in ('f_match', 'S11_min', 'Zin_match'):
+            np.testing.assert_allclose(res_chunks[key], res[key])
+        self.assertTrue(set(res['samples']['C2.sigma']) <= {conductivity_SS, conductivity_Cu})
+        
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            montecarlo.run(self.cfg, self.freqs, {'D9.Dint': montecarlo.Normal(1e-3)})
+        with self.assertRaises(ValueError):
+            montecarlo.run(self.cfg, self.freqs, {'D3.Dint': montecarlo.Uniform((0.2, 0.3))})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the input power scaling of the voltages and currents
+"""
+import unittest
+import numpy as np
+from tresonator import Configuration, PowerScaling
+
+class TestPowerScaling(unittest.TestCase):
+    
+    def setUp(self):
+        self.f = 62.64e6
+        self.cfg = Configuration(self.f, 20e3, L_DUT=0.035, L_CEA=0.027)
+        self.P_in = np.linspace(20e3, 80e3, 4)
+
+    def test_cache(self):
+        scaling = self.cfg.power_scaling()
+        self.assertIsInstance(scaling, PowerScaling)
+        self.assertIs(self.cfg.power_scaling(), scaling)
+        self.assertIsNot(self.cfg.power_scaling(dl=2e-3), scaling)
+
+    def test_voltage_current_vs_configuration(self):
+        L_CEA, L_DUT, V_CEA, V_DUT, I_CEA, I_DUT = self.cfg.power_scaling().voltage_current(self.P_in)
+        self.assertEqual(V_CEA.shape, (len(self.P_in), len(L_CEA)))
+        self.assertEqual(I_DUT.shape, (len(self.P_in), len(L_DUT)))
+        for idx, P_in in enumerate(self.P_in):
+            _cfg = Configuration(self.f, P_in, L_DUT=0.035, L_CEA=0.027)
+            expected = _cfg.voltage_current()
+            for value, _expected in zip((V_CEA, V_DUT, I_CEA, I_DUT), expected[2:]):
+                np.testing.assert_allclose(value[idx], _expected, rtol=1e-10)
+
+    def test_zero_input_power(self):
+        # the per-watt profiles do not depend on the configuration input power
+        scaling = Configuration(self.f, 0, L_DUT=0.035, L_CEA=0.027).power_scaling()
+        reference = self.cfg.power_scaling()
+        for value, expected in zip(scaling.voltage_current(self.P_in), reference.voltage_current(self.P_in)):
+            self.assertTrue(np.all(np.isfinite(value)))
+            np.testing.assert_allclose(value, expected, rtol=1e-12)
+        np.testing.assert_allclose(scaling.maxima(self.P_in), reference.maxima(self.P_in), rtol=1e-12)
+        np.testing.assert_allclose(scaling.probe_voltages(self.P_in), reference.probe_voltages(self.P_in), rtol=1e-12)
+
+    def test_envelopes_and_maxima(self):
+        scaling = self.cfg.power_scaling()
+        _, _, V_CEA, V_DUT, I_CEA, I_DUT = scaling.envelopes(self.P_in)
+        V_max, I_max = scaling.maxima(self.P_in)
+        self.assertEqual(V_max.shape, self.P_in.shape)
+        np.testing.assert_allclose(V_max, np.maximum(V_CEA.max(axis=1), V_DUT.max(axis=1)), rtol=1e-4)
+        np.testing.assert_allclose(I_max, np.maximum(I_CEA.max(axis=1), I_DUT.max(axis=1)), rtol=1e-4)
+        np.testing.assert_allclose(V_max[0], self.cfg.peak_voltage_current()['V_max'], rtol=1e-12)
+
+    def test_probe_voltages(self):
+        V_probe_CEA, V_probe_DUT = self.cfg.power_scaling().probe_voltages(self.P_in)
+        self.assertEqual(V_probe_CEA.shape, self.P_in.shape)
+        # close to the nearest sample of the profile
+        L_CEA, L_DUT, V_CEA, V_DUT, _, _ = self.cfg.voltage_current(dl=1e-4)
+        np.testing.assert_allclose(V_probe_CEA[0], V_CEA[np.argmin(np.abs(L_CEA - self.cfg.L_Vprobe_CEA_fromT))], rtol=1e-3)
+        np.testing.assert_allclose(V_probe_DUT[0], V_DUT[np.argmin(np.abs(L_DUT - self.cfg.L_Vprobe_DUT_fromT))], rtol=1e-3)
+
+    def test_limit_powers(self):
+        scaling = self.cfg.power_scaling()
+        V_limits = np.array([30e3, 40e3])
+        P_limits = scaling.limit_powers(V_limit=V_limits, I_limit=2e3)
+        np.testing.assert_allclose(scaling.maxima(P_limits['V'])[0], V_limits)
+        np.testing.assert_allclose(scaling.maxima(P_limits['I'])[1], 2e3)
+        np.testing.assert_allclose(P_limits['P_max'], np.minimum(P_limits['V'], P_limits['I']))
+        self.assertEqual(scaling.limit_powers()['P_max'], np.inf)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the profiling instrumentation
+"""
+import logging
+import unittest
+from tresonator import Configuration, profiling
+
+class TestProfiling(unittest.TestCase):
+    
+    def setUp(self):
+        self.cfg = Configuration(62.64e6, 20e3, L_DUT=0.035, L_CEA=0.027)
+        
+    def test_disabled(self):
+        self.assertFalse(profiling.enabled())
+        self.cfg.S11()
+        profiling.count('model_evaluations')
+        with profiling.stage('stage'):
+            pass
+        
+    def test_profile_counts(self):
+        with profiling.profile() as stats:
+            self.assertTrue(profiling.enabled())
+            self.cfg.S11()
+            self.cfg.optimize_short_lengths(seed=0)
+        self.assertFalse(profiling.enabled())
+        self.assertGreater(stats['counts']['model_evaluations'], 1)
+        self.assertGreaterEqual(stats['counts']['optimizer_starts'], 1)
+        self.assertEqual(stats['counts']['optimize_short_lengths_calls'], 1)
+        self.assertGreater(stats['times']['optimize_short_lengths'], 0)
+        self.assertGreater(stats['elapsed'], 0)
+        
+    def test_profile_nested(self):
+        with profiling.profile() as outer:
+            with profiling.profile() as inner:
+                self.cfg.S11()
+        self.assertEqual(inner['counts']['model_evaluations'], 1)
+        self.assertEqual(outer['counts']['model_evaluations'], 1)
+        
+    def test_profile_log(self):
+        with self.assertLogs('tresonator.profiling', level=logging.INFO):
+            with profiling.profile(log=True):
+                self.cfg.S11()
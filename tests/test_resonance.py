@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the match frequency, bandwidth and loaded Q finders
+"""
+import unittest
+import numpy as np
+from tresonator import Configuration, profiling
+
+class TestResonance(unittest.TestCase):
+    
+    def setUp(self):
+        # matched at 62.64 MHz
+        self.f = 62.64e6
+        self.cfg = Configuration(self.f, 20e3, L_DUT=0.03501032, L_CEA=0.02705502)
+        self.freqs = np.linspace(62.4e6, 62.9e6, 50001) # 10 Hz step
+        self.S11dB = 20*np.log10(np.abs(self.cfg.sweep(self.freqs)[0]))
+
+    def test_match_frequency_vs_sweep(self):
+        with profiling.profile() as stats:
+            f_match, S11_match = self.cfg.match_frequency()
+        self.assertLess(abs(f_match - self.freqs[np.argmin(self.S11dB)]), 10)
+        self.assertLess(abs(S11_match), 1e-4)
+        # tens of evaluations instead of a dense sweep
+        self.assertLess(stats['counts']['model_evaluations'], 100)
+
+    def test_bandwidth_vs_sweep(self):
+        for threshold_dB in (-3, -10):
+            bandwidth, f_low, f_high = self.cfg.bandwidth(threshold_dB)
+            below = self.freqs[self.S11dB < threshold_dB]
+            self.assertLess(abs(f_low - below[0]), 10)
+            self.assertLess(abs(f_high - below[-1]), 10)
+            np.testing.assert_allclose(bandwidth, f_high - f_low)
+        # threshold not reached
+        self.assertTrue(np.isnan(self.cfg.bandwidth(-400)[0]))
+
+    def test_loaded_Q(self):
+        # matched resonator: -3 dB bandwidth
+        bandwidth, _, _ = self.cfg.bandwidth(10*np.log10(0.5))
+        np.testing.assert_allclose(self.cfg.loaded_Q(), self.cfg.match_frequency()[0]/bandwidth, rtol=1e-6)
+
+    def test_arrays_vs_scalar(self):
+        L_DUTs = np.linspace(30e-3, 40e-3, 3)[:, np.newaxis]
+        additional_losses = np.array([1, 1.5])
+        f_match, S11_match = self.cfg.match_frequency(L_DUT=L_DUTs, additional_losses=additional_losses)
+        Q = self.cfg.loaded_Q(L_DUT=L_DUTs, additional_losses=additional_losses)
+        self.assertEqual(f_match.shape, (3, 2))
+        self.assertEqual(Q.shape, (3, 2))
+        for i, L_DUT in enumerate(L_DUTs[:, 0]):
+            for j, additional_loss in enumerate(additional_losses):
+                _cfg = Configuration(self.f, 20e3, L_DUT, self.cfg.L_CEA, additional_losses=additional_loss)
+                np.testing.assert_allclose(f_match[i, j], _cfg.match_frequency()[0], atol=2)
+                np.testing.assert_allclose(Q[i, j], _cfg.loaded_Q(), rtol=1e-6)
+
+    def test_outside_span(self):
+        f_match, _ = self.cfg.match_frequency(f_span=(63e6, 64e6))
+        self.assertTrue(np.isnan(f_match))
+        self.assertTrue(np.isnan(self.cfg.loaded_Q(f_span=(63e6, 64e6))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the resonator topology
+"""
+import os
+import tempfile
+import unittest
+import warnings
+import numpy as np
+from tresonator import Configuration, Topology, ZL_2_Zin, Coax
+from tresonator.constants import conductivity_Cu, conductivity_Ag, conductivity_SS
+
+TOPOLOGY_FILE = """
+# test resonator
+# kind      Dint[mm]  Dout[mm]  length[mm]  sigma   R[Ohm]
+Short       127.9     219.0     NaN         NaN     0.02
+Line        127.9     219.0     30.0        Copper  NaN
+Line        140.0     230.0     500.0       5.8e7   NaN
+Tee         140.0     230.0     NaN         Silver  NaN
+Line        140.0     230.0     728.0       Silver  NaN
+Line        100.0     230.0     100.0       Silver  NaN
+Line        140.0     230.0     1512.0      Steel   NaN
+Variable    140.0     219.0     27.0        Steel   NaN
+Short       140.0     219.0     NaN         NaN     0.01
+"""
+
+class TestTopology(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, 'test.txt')
+        with open(self.filename, 'w') as fid:
+            fid.write(TOPOLOGY_FILE)
+            
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_default(self):
+        topology = Topology.load()
+        self.assertEqual(topology.name, 'SSA50')
+        self.assertEqual(topology.names, ('D4', 'D3', 'D2', 'D1', 'D0', 'C0', 'C1', 'C2', 'C3'))
+        np.testing.assert_array_equal(topology.Dint, [0.1279, 0.1683, 0.140, 0.100, 0.140, 
+                                                      0.140, 0.100, 0.140, 0.140])
+        np.testing.assert_array_equal(topology.sigma[[0, 4, 7, 8]], 
+                                      [conductivity_Cu, conductivity_Ag, conductivity_SS, conductivity_SS])
+        self.assertEqual(topology.sections, {'DUT': (0, 1, 2, 3, 4), 'CEA': (8, 7, 6, 5)})
+        self.assertIs(Configuration(62e6, 20e3, 0.035, 0.027).topology, topology)
+        
+    def test_variants(self):
+        cfg = Configuration(62.64e6, 20e3, 0.035, 0.027, topology='SSA84')
+        self.assertEqual((cfg.Z_short_DUT, cfg.Z_short_CEA), (0.00345, 0.0068))
+        cfg = Configuration(62.64e6, 20e3, 0.035, 0.027, Z_short_DUT=1e-2, Z_short_CEA=1e-2, 
+                            topology='SSA84')
+        np.testing.assert_allclose(cfg.S11(), Configuration(62.64e6, 20e3, 0.035, 0.027).S11())
+        
+    def test_load_file(self):
+        topology = Topology.load(self.filename)
+        self.assertEqual(topology.name, 'test')
+        self.assertEqual(topology.names, ('D1', 'D0', 'C0', 'C1', 'C2', 'C3'))
+        self.assertEqual((topology.Z_short_DUT, topology.Z_short_CEA), (0.02, 0.01))
+        np.testing.assert_array_equal(topology.L[1:], [0.5, 0.728, 0.1, 1.512, 0.027])
+        self.assertEqual(topology.sigma[1], 5.8e7)
+        
+    def test_input_impedance(self):
+        # branches of different numbers of sections
+        freqs = np.linspace(61e6, 64e6, 7)
+        cfg = Configuration(freqs, 20e3, 0.035, 0.027, topology=self.filename)
+        Zin, Z_CEA, Z_DUT = cfg.input_impedance()
+        self.assertEqual(Z_DUT.shape, (2, 7))
+        self.assertEqual(Z_CEA.shape, (4, 7))
+        
+        Z = 0.02
+        for L, Dint, Dout, sigma in ((0.035, 0.1279, 0.219, conductivity_Cu), 
+                                     (0.5, 0.140, 0.230, conductivity_Cu)):
+            TL = Coax(L, Dint, Dout, sigma=sigma)
+            Z = ZL_2_Zin(L, TL.Zc, TL.gamma(freqs), Z)
+        np.testing.assert_allclose(Z_DUT[-1], Z)
+        Z_CEA_ref = Configuration(freqs, 20e3, 0.035, 0.027).input_impedance()[1]
+        np.testing.assert_allclose(Z_CEA, Z_CEA_ref)
+        
+        np.testing.assert_allclose(cfg.reduced_model().S11(0.035, 0.027), cfg.S11())
+
+    def test_single_section_branch(self):
+        # sections built from plain dicts, without the 'variable' key,
+        # and a DUT branch made of its variable section only
+        section = {'Dint': 0.140, 'Dout': 0.230, 'sigma': conductivity_Ag}
+        topology = Topology(DUT=[dict(section, L=0.5)],
+                            CEA=[dict(section, L=0.728), dict(section, L=1.512), dict(section, L=0.027)])
+        self.assertEqual([section['variable'] for section in topology.branches['CEA']], [False, False, True])
+        cfg = Configuration(62.64e6, 20e3, 0.5, 0.027, topology=topology)
+        model = cfg.reduced_model()
+        np.testing.assert_allclose(model.S11(0.5, 0.027), cfg.S11(), rtol=1e-12)
+        S11, _, _ = cfg.S11_map([0.4, 0.5], [0.027, 0.03])
+        np.testing.assert_allclose(S11[1, 0], cfg.S11(), rtol=1e-12)
+        L, S11 = cfg.solve_short_lengths(bounds=[(1e-3, 1.5), (1e-3, 0.2)])
+        self.assertTrue(np.all(np.abs(S11) < 1e-6))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            np.testing.assert_allclose(cfg.circuit_template().s(), cfg.circuit().s_external, atol=1e-10)
+
+    def test_circuit(self):
+        cfg = Configuration(62.64e6, 20e3, 0.035, 0.027, topology=self.filename)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            np.testing.assert_allclose(cfg.circuit_template().s(), cfg.circuit().s_external, atol=1e-10)
+        
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Topology(DUT=[], CEA=[{'L': 1, 'Dint': 0.1, 'Dout': 0.2, 'sigma': 1e7}])
+        with self.assertRaises(ValueError):
+            # variable section not at the short
+            Topology(DUT=[{'L': 1, 'Dint': 0.1, 'Dout': 0.2, 'sigma': 1e7, 'variable': True},
+                          {'L': 1, 'Dint': 0.1, 'Dout': 0.2, 'sigma': 1e7}],
+                     CEA=[{'L': 1, 'Dint': 0.1, 'Dout': 0.2, 'sigma': 1e7}])
+        with self.assertRaises(ValueError):
+            Topology(DUT=[{'L': 1, 'Dint': 0.3, 'Dout': 0.2, 'sigma': 1e7}],
+                     CEA=[{'L': 1, 'Dint': 0.1, 'Dout': 0.2, 'sigma': 1e7}])
+        with open(self.filename, 'w') as fid:
+            fid.write(TOPOLOGY_FILE.replace('Tee ', 'Line'))
+        with self.assertRaises(ValueError):
+            Topology.load(self.filename)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the tuning table
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+from tresonator import Configuration, Topology, TuningTable
+
+class TestTuningTable(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.freqs = np.linspace(62e6, 63e6, 11)
+        cls.additional_losses = [0.8, 1, 1.5]
+        cls.table = TuningTable.generate(cls.freqs, cls.additional_losses)
+    
+    def test_shape(self):
+        self.assertEqual(self.table.L.shape, (11, 3, 2, 2))
+        self.assertEqual(self.table.S11.shape, (11, 3, 2))
+        
+    def test_nodes(self):
+        # on the grid nodes, the table gives the solver solutions
+        cfg = Configuration(self.freqs[4], 1, 0.035, 0.027, additional_losses=1)
+        L_sols, _ = cfg.solve_short_lengths()
+        L, S11 = self.table.lookup(self.freqs[4], 1)
+        np.testing.assert_allclose(np.sort(L, axis=0), np.sort(L_sols, axis=0), atol=1e-9)
+        np.testing.assert_array_less(np.abs(S11), 1e-9)
+        
+    def test_continuous_branches(self):
+        # solutions of a branch are close between neighbouring frequencies
+        dL = np.abs(np.diff(self.table.L, axis=0))
+        self.assertLess(np.nanmax(dL), 5e-3)
+        
+    def test_refine(self):
+        f, add_loss = 62.64e6, 1.2
+        L, S11 = self.table.lookup(f, add_loss)
+        L_ref, S11_ref = self.table.lookup(f, add_loss, refine=True)
+        valid = ~np.isnan(S11)
+        self.assertTrue(np.any(valid))
+        np.testing.assert_array_less(np.abs(S11_ref[valid]), np.abs(S11[valid]))
+        cfg = Configuration(f, 1, *L_ref[valid][0], additional_losses=add_loss)
+        np.testing.assert_allclose(cfg.S11(), S11_ref[valid][0])
+        
+    def test_lookup_setpoints(self):
+        f, add_loss = 62.64e6, 1.2
+        L, S11 = self.table.lookup(f, add_loss, predict=False)
+        self.assertIsNone(S11)
+        np.testing.assert_allclose(L, self.table.interpolate(f, add_loss), rtol=1e-12)
+        np.testing.assert_array_equal(L, self.table.lookup(f, add_loss)[0])
+        # on a grid node, the table solutions
+        L, _ = self.table.lookup(self.freqs[3], 1.5, predict=False)
+        np.testing.assert_array_equal(L, self.table.L[3, 2])
+
+    def test_interpolate(self):
+        f = np.linspace(62.1e6, 62.9e6, 5)
+        L = self.table.interpolate(f, 1.2)
+        self.assertEqual(L.shape, (5, 2, 2))
+        self.assertTrue(np.all(np.isnan(self.table.interpolate(70e6, 1))))
+        
+    def test_outside(self):
+        with self.assertRaises(ValueError):
+            self.table.lookup(70e6, 1)
+        with self.assertRaises(ValueError):
+            self.table.lookup(62.5e6, 3)
+            
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'table.npz')
+            self.table.save(filename)
+            table = TuningTable.load(filename)
+        np.testing.assert_array_equal(table.L, self.table.L)
+        np.testing.assert_array_equal(table.S11, self.table.S11)
+        np.testing.assert_array_equal(table.freqs, self.table.freqs)
+        self.assertEqual(table.metadata, self.table.metadata)
+
+    def test_save_load_topology(self):
+        # topology built from dicts, without name nor file
+        default = Topology.load()
+        DUT = [dict(section, Dout=1.05*section['Dout']) for section in default.branches['DUT']]
+        topology = Topology(DUT, default.branches['CEA'])
+        table = TuningTable.generate([62e6, 63e6], [1, 1.5], topology=topology)
+        L, S11 = table.lookup(62.5e6, 1.2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'table.npz')
+            table.save(filename)
+            loaded = TuningTable.load(filename)
+        L_loaded, S11_loaded = loaded.lookup(62.5e6, 1.2)
+        np.testing.assert_array_equal(L_loaded, L)
+        np.testing.assert_allclose(S11_loaded, S11, rtol=1e-12)
+        self.assertEqual(loaded._configuration().topology.branches, topology.branches)
+
+if __name__ == '__main__':
+    unittest.main()
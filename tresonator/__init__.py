@@ -2,8 +2,18 @@
 """
 import 
 """
-from . coaxial import Coax
+from . version import __version__
+from . coaxial import Coax, section_properties, section_cache_info, section_cache_clear
 from . configuration import Configuration
+from . topology import Topology
+from . reduced_model import ReducedModel
+from . power_scaling import PowerScaling
+from . fitting import fit_measurement
+from . tuning import TuningTable
+from . import profiling
+from . import cache
+from . import montecarlo
+from . import gridscan
 from . transmission_line_utils import *
 from . constants import *
 
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line batch runner: python -m tresonator --help
+"""
+import sys
+from . cli import main
+
+sys.exit(main())
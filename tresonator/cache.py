@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent on-disk cache of the optimizations, maps and fits results
+
+Usage:
+
+    tresonator.cache.enable()            # or enable(directory, max_size)
+    cfg.optimize_short_lengths(seed=0)   # computed and stored
+    cfg.optimize_short_lengths(seed=0)   # loaded, also from another process
+
+Results are stored as compressed .npz files in the cache directory, keyed by
+a hash of all their inputs: geometry of the resonator sections, short
+impedances, losses, frequencies, method parameters and package version.
+When the cache size exceeds max_size, the least recently used entries are
+removed.
+
+The methods accepting a cache argument use the enabled default cache when it
+is None, bypass the cache when it is False, or use the given ResultCache.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+import numpy as np
+from . version import __version__
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
+# Default cache directory
+CACHE_DIR = os.environ.get('TRESONATOR_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'tresonator'))
+
+# Default maximum size of the cache [bytes]
+MAX_SIZE = 2**30
+
+# Age after which a temporary file is left by an interrupted writer [s]
+STALE_TMP_AGE = 3600
+
+# Default cache used by the methods, None when disabled
+_default = None
+
+
+def _update(sha, value):
+    """
+    Update the hash sha with a value (arrays, numbers, strings, None,
+    and lists, tuples and dicts of them).
+    """
+    if isinstance(value, dict):
+        sha.update(b'{')
+        for name in sorted(value):
+            _update(sha, name)
+            _update(sha, value[name])
+        sha.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        sha.update(b'[')
+        for item in value:
+            _update(sha, item)
+        sha.update(b']')
+    elif isinstance(value, (np.ndarray, np.generic)):
+        value = np.ascontiguousarray(value)
+        sha.update('{}{}'.format(value.dtype.str, value.shape).encode())
+        sha.update(value.tobytes())
+    elif isinstance(value, (bool, int, float, complex)):
+        # same hash for equal numbers of different types
+        _update(sha, np.asarray(value, dtype=complex))
+    else:
+        sha.update(repr(value).encode())
+
+
+def hash_inputs(*inputs):
+    """
+    Returns the hexadecimal SHA-256 hash of the inputs.
+    """
+    sha = hashlib.sha256()
+    _update(sha, inputs)
+    return sha.hexdigest()
+
+
+def topology_inputs(topology):
+    """
+    Inputs of the model describing a topology: geometry of all the sections
+    and short impedances.
+    """
+    return {'sections': topology.sections, 'L': topology.L, 'Dint': topology.Dint,
+            'Dout': topology.Dout, 'sigma': topology.sigma, 'eps_r': topology.eps_r,
+            'Z_short_DUT': topology.Z_short_DUT, 'Z_short_CEA': topology.Z_short_CEA}
+
+
+def configuration_inputs(cfg, exclude=()):
+    """
+    Inputs of the model of a configuration, except the names in exclude
+    (eg. the parameters overridden by a method arguments).
+    """
+    inputs = {'topology': topology_inputs(cfg.topology), 'f': cfg.f,
+              'L_DUT': cfg.L_DUT, 'L_CEA': cfg.L_CEA,
+              'Z_short_DUT': cfg.Z_short_DUT, 'Z_short_CEA': cfg.Z_short_CEA,
+              'additional_losses': cfg.additional_losses, 'R': cfg.R}
+    for name in exclude:
+        inputs.pop(name)
+    return inputs
+
+
+class ResultCache(object):
+    """
+    Content-addressed store of results (dict of arrays) in a directory.
+
+    Args:
+    -----
+    directory: str, optional
+        cache directory. Default is CACHE_DIR, which can be set by the
+        TRESONATOR_CACHE_DIR environment variable.
+    max_size: int, optional
+        maximum size of the cache [bytes]. Default is MAX_SIZE.
+    """
+    def __init__(self, directory=None, max_size=MAX_SIZE):
+        self.directory = CACHE_DIR if directory is None else directory
+        self.max_size = max_size
+
+    def __repr__(self):
+        return 'T-resonator result cache: {} ({} entries, {:.1f} MB)'.format( \
+                     self.directory, len(self._entries()), self.size()/1e6)
+
+    def key(self, kind, *inputs):
+        """
+        Key of the results of a computation kind (eg. the method name)
+        for the given inputs.
+        """
+        return '{}-{}'.format(kind, hash_inputs(__version__, kind, inputs))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def _entries(self):
+        """
+        Paths of the entries, from the least to the most recently used.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.endswith('.npz')]
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError: # removed by another process
+                pass
+        return sorted(mtimes, key=mtimes.get)
+
+    def get(self, key):
+        """
+        Returns the results stored for key (dict of arrays), or None.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                results = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            profiling.count('cache_misses')
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # incomplete or corrupted entry
+            profiling.count('cache_misses')
+            self.invalidate(key)
+            return None
+        # most recently used. The entry may have been evicted meanwhile by
+        # another process, or the cache may be read-only.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        profiling.count('cache_hits')
+        return results
+
+    def put(self, key, results):
+        """
+        Store the results (dict of arrays) for key, then evict the least
+        recently used entries if the cache is too large.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        # written to a temporary file first, so that readers never see a partial entry
+        fid, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fid, 'wb') as fid:
+                np.savez_compressed(fid, **results)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self.evict()
+
+    def size(self):
+        """
+        Total size of the entries [bytes].
+        """
+        size = 0
+        for path in self._entries():
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return size
+
+    def evict(self, max_size=None):
+        """
+        Remove the least recently used entries until the cache size is below
+        max_size. Default is the cache max_size. The temporary files left by
+        interrupted writers are also removed.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        self._remove_stale_tmp(STALE_TMP_AGE)
+        entries = self._entries()
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in entries]
+        size = sum(sizes)
+        for path, entry_size in zip(entries, sizes):
+            if size <= max_size:
+                break
+            try:
+                os.remove(path)
+                profiling.count('cache_evictions')
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def invalidate(self, key=None, kind=None):
+        """
+        Remove the entry key, or all the entries of a computation kind,
+        or all the entries if none is given.
+        """
+        if key is not None:
+            paths = [self._path(key)]
+        else:
+            paths = [path for path in self._entries()
+                     if kind is None or os.path.basename(path).startswith(kind + '-')]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _remove_stale_tmp(self, max_age):
+        """
+        Remove the temporary files older than max_age [s], which are not
+        being written anymore.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.stat(path).st_mtime > max_age:
+                    os.remove(path)
+                    profiling.count('cache_evictions')
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """
+        Remove all the entries, and the stale temporary files.
+        """
+        self.invalidate()
+        self._remove_stale_tmp(STALE_TMP_AGE)
+
+
+def enable(directory=None, max_size=MAX_SIZE):
+    """
+    Enable the default cache, used by the methods when their cache argument
+    is None. Returns it.
+    """
+    global _default
+    _default = ResultCache(directory, max_size)
+    return _default
+
+
+def disable():
+    """
+    Disable the default cache.
+    """
+    global _default
+    _default = None
+
+
+def get_cache(cache=None):
+    """
+    Returns the ResultCache to use for a cache argument: the default cache
+    (None if disabled) for None, None for False, the default cache directory
+    for True, or the given ResultCache.
+    """
+    if cache is None:
+        return _default
+    elif cache is False:
+        return None
+    elif cache is True:
+        return _default or ResultCache()
+    return cache
+
+
+@contextmanager
+def bypass():
+    """
+    Context in which the default cache is disabled.
+    """
+    global _default
+    default, _default = _default, None
+    try:
+        yield
+    finally:
+        _default = default
+
+
+def cached(cache, kind, inputs, compute):
+    """
+    Returns the results of compute() (dict of arrays) for the inputs,
+    loaded from the cache if they are stored, otherwise computed and stored.
+    The computed results are returned even if they cannot be stored
+    (eg. read-only cache).
+    """
+    cache = get_cache(cache)
+    if cache is None:
+        return compute()
+    key = cache.key(kind, inputs)
+    results = cache.get(key)
+    if results is None:
+        results = compute()
+        try:
+            cache.put(key, results)
+        except OSError as error:
+            profiling.count('cache_write_errors')
+            logger.warning('Results not stored in the cache: %s', error)
+    return results
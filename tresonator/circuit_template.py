@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Reusable skrf circuit template of the T-resonator
+"""
+import numpy as np
+import skrf as rf
+
+
+class CircuitTemplate(object):
+    """
+    Circuit template of a T-resonator configuration, for a given frequency grid.
+
+    The skrf media of all the sections and the cascade of the fixed sections
+    of each branch are built once. Evaluating the resonator for new short
+    lengths or short resistances then only involves the two variable line
+    sections and the short resistors, and is vectorized over batches of
+    length pairs.
+
+    The results are the same than the external port of
+    Configuration.circuit(), ie. circuit().s_external.
+
+    Args:
+    -----
+    cfg: Configuration
+        T-resonator configuration
+    freq: skrf.Frequency, optional
+        Default is the configuration frequency.
+    """
+    def __init__(self, cfg, freq=None):
+        if not freq:
+            freq = rf.Frequency(cfg.f, unit='Hz', npoints=1)
+        self.frequency = freq
+        self.R = cfg.R
+        self.L_DUT = cfg.L_DUT
+        self.L_CEA = cfg.L_CEA
+        self.Z_short_DUT = cfg.Z_short_DUT
+        self.Z_short_CEA = cfg.Z_short_CEA
+
+        DUT, CEA = cfg._circuit_media(freq)
+        self._branches = {'DUT': self._reduce_branch(DUT),
+                          'CEA': self._reduce_branch(CEA)}
+
+    def __repr__(self):
+        return 'T-resonator circuit template: {}'.format(self.frequency)
+
+    def _reduce_branch(self, sections):
+        """
+        Characteristic impedance and wavenumber of the variable section and
+        ABCD matrix of the cascaded fixed sections.
+        """
+        media_var = sections[-1][1]
+        if len(sections) == 1:
+            # no fixed section: identity matrix
+            ABCD = np.broadcast_to(np.eye(2)[..., np.newaxis], (2, 2, len(self.frequency)))
+            return media_var.z0, media_var.gamma, ABCD
+        fixed = sections[0][1].line(sections[0][2], unit='m', name=sections[0][0])
+        for name, media, L in sections[1:-1]:
+            fixed = fixed ** media.line(L, unit='m', name=name)
+        ABCD = fixed.a.transpose(1, 2, 0) # (2, 2, nfreq)
+        return media_var.z0, media_var.gamma, ABCD
+
+    def branch_impedance(self, branch, L, Z_short):
+        """
+        Input impedance at T of a branch, for short lengths L and
+        short resistances Z_short (arrays of shape (nbatch, 1) or scalars).
+        """
+        z0, gamma, ((A, B), (C, D)) = self._branches[branch]
+        # variable line section terminated by the short resistor
+        t = np.tanh(gamma*L)
+        Z = z0*(Z_short + z0*t)/(z0 + Z_short*t)
+        return (A*Z + B)/(C*Z + D)
+
+    def s(self, L_DUT=None, L_CEA=None, Z_short_DUT=None, Z_short_CEA=None):
+        """
+        S-parameter of the T-resonator at its input port.
+
+        Args
+        ----
+        L_DUT, L_CEA: float or array of shape (nbatch,), optional
+            short lengths [m]. Default are the configuration ones.
+        Z_short_DUT, Z_short_CEA: float or array of shape (nbatch,), optional
+            short resistances [Ohm]. Default are the configuration ones.
+
+        Returns
+        -------
+        s: complex array of shape (nfreq, 1, 1), or (nbatch, nfreq, 1, 1)
+           for a batch of short lengths or resistances
+        """
+        args = [self.L_DUT if L_DUT is None else L_DUT,
+                self.L_CEA if L_CEA is None else L_CEA,
+                self.Z_short_DUT if Z_short_DUT is None else Z_short_DUT,
+                self.Z_short_CEA if Z_short_CEA is None else Z_short_CEA]
+        batch = any(np.ndim(arg) for arg in args)
+        # batch along the first axis, frequency along the last one
+        _L_DUT, _L_CEA, _Z_short_DUT, _Z_short_CEA = [np.reshape(arg, (-1, 1)) for arg in args]
+
+        Z_DUT = self.branch_impedance('DUT', _L_DUT, _Z_short_DUT)
+        Z_CEA = self.branch_impedance('CEA', _L_CEA, _Z_short_CEA)
+        # At T-junction. Impedance are associated in parallel.
+        Zin = (Z_DUT*Z_CEA)/(Z_DUT + Z_CEA)
+        s = ((Zin - self.R)/(Zin + self.R))[..., np.newaxis, np.newaxis]
+        return s if batch else s[0]
+
+    def network(self, L_DUT=None, L_CEA=None, Z_short_DUT=None, Z_short_CEA=None):
+        """
+        1-port skrf Network of the T-resonator, for a single set of short
+        lengths and resistances. See s() for the arguments.
+        """
+        s = self.s(L_DUT, L_CEA, Z_short_DUT, Z_short_CEA)
+        return rf.Network(frequency=self.frequency, s=s, z0=self.R, name='T-resonator')
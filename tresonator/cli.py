@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line batch runner of the T-resonator computations
+
+Usage:
+
+    python -m tresonator sweep --freqs 61e6 64e6 301 --L-DUT 0.035 --L-CEA 0.027
+    python -m tresonator optimize --f 61e6 62e6 63e6 --additional-losses 1 1.2 -j 4
+    python -m tresonator map --f 62.64e6 --L-DUT-range 1e-3 0.06 201 --format csv
+    python -m tresonator track --freqs 61e6 63e6 201 --additional-losses 1.2
+    python -m tresonator fit --measurement data/measurement.s1p
+    python -m tresonator optimize --config jobs.json -j 8
+
+Configuration parameters given with several values are expanded into one
+job per combination. A JSON config file gives the parameters of a job (a
+dict), or of several jobs (a list of dicts or {"jobs": [...]}), which
+override the command line ones. Jobs are run in a pool of worker processes.
+
+Each job writes its results, a table of columns, into the output directory
+as a NumPy .npz or a .csv file, with its parameters and timings in a .json
+file. The summary of the jobs is written to _summary.json. Job names must
+be unique and cannot start with an underscore, and no output file may
+overwrite the config file.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from . configuration import Configuration
+from . version import __version__
+from . import profiling
+
+COMMANDS = ('sweep', 'map', 'optimize', 'track', 'fit')
+
+# Summary of the jobs, written into the output directory
+SUMMARY_FILENAME = '_summary.json'
+
+# Configuration parameters, which can be given several values
+CONFIGURATION_PARAMETERS = ('f', 'P_in', 'L_DUT', 'L_CEA', 'Z_short_DUT', 'Z_short_CEA',
+                            'additional_losses', 'topology')
+
+# Default parameters of the jobs
+DEFAULTS = {'f': 62.64e6, 'P_in': 20e3, 'L_DUT': 0.035, 'L_CEA': 0.027,
+            'Z_short_DUT': None, 'Z_short_CEA': None, 'additional_losses': 1,
+            'topology': None,
+            'freqs': [61e6, 64e6, 301],
+            'L_DUT_range': [1e-3, 0.06, 201], 'L_CEA_range': [1e-3, 0.125, 201],
+            'bounds': [[1e-3, 200e-3], [1e-3, 200e-3]], 'npoints': 201,
+            'method': 'solve', 'n_solutions': 1, 'seed': 0,
+            'rescan': 10, 'measurement': None, 'params': None, 'residual': 'dB'}
+
+
+def _linspace(values):
+    """
+    Array of values from a [start, stop, num] list
+    """
+    start, stop, num = values
+    return np.linspace(start, stop, int(num))
+
+
+def _impedance(value):
+    """
+    Short impedance from a number or a string, such as '0.01' or '0.01+0.2j'.
+    Complex only if its imaginary part is not zero.
+    """
+    if value is None:
+        return None
+    value = complex(value)
+    return value.real if value.imag == 0 else value
+
+
+def _configuration(spec):
+    return Configuration(spec['f'], spec['P_in'], spec['L_DUT'], spec['L_CEA'],
+                         _impedance(spec['Z_short_DUT']), _impedance(spec['Z_short_CEA']),
+                         spec['additional_losses'], spec['topology'])
+
+
+def _S11_columns(S11, Zin):
+    return {'S11': S11, 'S11_dB': 20*np.log10(np.abs(S11)), 'Zin': Zin}
+
+
+def sweep(spec):
+    """
+    S11 and input impedance vs frequency
+    """
+    freqs = _linspace(spec['freqs'])
+    S11, Zin = _configuration(spec).sweep(freqs)
+    return dict(f=freqs, **_S11_columns(S11, Zin)), {}
+
+
+def map_(spec):
+    """
+    S11 and input impedance for all the (L_DUT, L_CEA) of the ranges
+    """
+    L_DUT, L_CEA = _linspace(spec['L_DUT_range']), _linspace(spec['L_CEA_range'])
+    S11, _, Zin = _configuration(spec).S11_map(L_DUT, L_CEA)
+    L_DUT, L_CEA = np.meshgrid(L_DUT, L_CEA, indexing='ij')
+    return dict(L_DUT=L_DUT.ravel(), L_CEA=L_CEA.ravel(),
+                **_S11_columns(S11.ravel(), Zin.ravel())), {}
+
+
+def optimize(spec):
+    """
+    Matching short lengths, by the deterministic solver or random starts
+    ('solve' or 'random' method)
+
+    Both methods only return matched solutions: the random starts keep the
+    minima below Configuration.MATCH_THRESHOLD_DB.
+    """
+    cfg = _configuration(spec)
+    if spec['method'] == 'solve':
+        L, S11 = cfg.solve_short_lengths(spec['bounds'], spec['npoints'])
+    elif spec['method'] == 'random':
+        L = np.reshape(cfg.optimize_short_lengths(spec['bounds'], spec['n_solutions'],
+                                                  seed=spec['seed']), (-1, 2))
+        S11 = np.array([cfg._matching_S11(_L, cfg.reduced_model()) for _L in L], dtype=complex)
+    else:
+        raise ValueError('Unknown optimization method: {}'.format(spec['method']))
+    return {'L_DUT': L[:, 0], 'L_CEA': L[:, 1], 'S11': S11, 'S11_dB': 20*np.log10(np.abs(S11))}, {}
+
+
+def track(spec):
+    """
+    Matching short lengths of each solution branch vs frequency
+    """
+    freqs = _linspace(spec['freqs'])
+    L, S11, events = _configuration(spec).track_short_lengths(freqs, spec['bounds'], spec['npoints'],
+                                                              spec['rescan'])
+    idx_f, branch = np.nonzero(~np.isnan(L[..., 0]))
+    return {'f': freqs[idx_f], 'branch': branch,
+            'L_DUT': L[idx_f, branch, 0], 'L_CEA': L[idx_f, branch, 1],
+            'S11': S11[idx_f, branch]}, {'events': events}
+
+
+def fit(spec):
+    """
+    Fit of the model to a measured S11 file (ASC or Touchstone)
+    """
+    from . fitting import fit_measurement
+    from . io import load
+    if spec['measurement'] is None:
+        raise ValueError('The measurement file is required')
+    freqs, s, _ = load(spec['measurement'])
+    x0 = {name: spec[name] for name in ('L_DUT', 'L_CEA', 'additional_losses')}
+    x0.update({name: _impedance(spec[name]) for name in ('Z_short_DUT', 'Z_short_CEA')
+               if spec[name] is not None})
+    kwargs = {} if spec['params'] is None else {'params': spec['params']}
+    res = fit_measurement(freqs, s[:, 0, 0], x0=x0, residual=spec['residual'],
+                          topology=spec['topology'], **kwargs)
+    params = list(res.params)
+    return {'param': np.array(params),
+            'value': np.array([res.params[param] for param in params]),
+            'stderr': np.array([res.stderr[param] for param in params])}, \
+           {'cost': float(res.cost), 'success': bool(res.success), 'nfev': int(res.nfev)}
+
+
+JOBS = {'sweep': sweep, 'map': map_, 'optimize': optimize, 'track': track, 'fit': fit}
+
+
+def _write_csv(filename, columns, metadata):
+    """
+    Write the columns into a CSV file, complex columns being split into real
+    and imaginary parts. The metadata are written as a commented JSON first line.
+    """
+    names, values = [], []
+    for name, column in columns.items():
+        column = np.asarray(column)
+        if np.iscomplexobj(column):
+            names += [name + '_re', name + '_im']
+            values += [column.real, column.imag]
+        else:
+            names.append(name)
+            values.append(column)
+    with open(filename, 'w') as fid:
+        fid.write('# ' + json.dumps(metadata, default=str) + '\n')
+        fid.write(','.join(names) + '\n')
+        for row in zip(*values):
+            fid.write(','.join(str(value) for value in row) + '\n')
+
+
+def run_job(spec, output, fmt='npz'):
+    """
+    Run a job and write its results into the output directory.
+
+    Args
+    ----
+    spec: dict
+        job parameters, with the keys 'command', 'name' and those of DEFAULTS
+    output: str
+        output directory
+    fmt: 'npz' or 'csv', optional
+        results file format. Default is 'npz'.
+
+    Returns
+    -------
+    summary: dict
+        name, command, results file, elapsed time [s] and error message if any
+    """
+    summary = {'name': spec['name'], 'command': spec['command'], 'file': None, 'error': None}
+    started = datetime.datetime.now()
+    t0 = time.perf_counter()
+    # errors of the computation and of the outputs writing are both recorded
+    try:
+        with profiling.profile() as stats:
+            columns, info = JOBS[spec['command']](spec)
+        summary['elapsed'] = time.perf_counter() - t0
+
+        metadata = {'spec': spec, 'info': info,
+                    'started': started.isoformat(), 'elapsed': summary['elapsed'],
+                    'profile': stats, 'host': platform.node(), 'pid': os.getpid(),
+                    'tresonator': __version__, 'numpy': np.__version__}
+        filename = os.path.join(output, '{}.{}'.format(spec['name'], fmt))
+        if fmt == 'csv':
+            _write_csv(filename, columns, metadata)
+        else:
+            np.savez(filename, **columns)
+        with open(os.path.join(output, spec['name'] + '.json'), 'w') as fid:
+            json.dump(metadata, fid, indent=1, default=str)
+        summary['file'] = filename
+    except Exception as error:
+        summary['error'] = '{}: {}'.format(type(error).__name__, error)
+        summary['traceback'] = traceback.format_exc()
+        summary.setdefault('elapsed', time.perf_counter() - t0)
+    return summary
+
+
+def _load_config(filename):
+    """
+    Job parameters of a JSON config file: list of dicts
+    """
+    with open(filename) as fid:
+        config = json.load(fid)
+    if isinstance(config, dict):
+        config = config.get('jobs', [config])
+    return config
+
+
+def job_specs(command, args):
+    """
+    Parameters of the jobs of a command, from the parsed arguments
+    """
+    base = dict(DEFAULTS, command=command)
+    for name, value in vars(args).items():
+        if name in DEFAULTS and value is not None:
+            base[name] = value
+    specs = []
+    for job in (_load_config(args.config) if args.config else [{}]):
+        job = dict(base, **job)
+        # expand the configuration parameters given with several values
+        names = [name for name in CONFIGURATION_PARAMETERS if isinstance(job[name], list)]
+        expanded = [dict(job, **dict(zip(names, values)))
+                    for values in itertools.product(*[job[name] for name in names])]
+        # named jobs expanded into several ones are numbered
+        if 'name' in job and len(expanded) > 1:
+            for idx, spec in enumerate(expanded):
+                spec['name'] = '{}_{:04d}'.format(job['name'], idx)
+        specs += expanded
+    for idx, spec in enumerate(specs):
+        spec.setdefault('name', '{}_{:04d}'.format(command, idx))
+    return specs
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='python -m tresonator',
+                                     description=__doc__.split('\n\n')[0].strip())
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command in COMMANDS:
+        sub = subparsers.add_parser(command, help=JOBS[command].__doc__.strip().splitlines()[0])
+        group = sub.add_argument_group('configuration (several values give one job per combination)')
+        for name in CONFIGURATION_PARAMETERS:
+            group.add_argument('--' + name.replace('_', '-'), dest=name, nargs='+',
+                               type={'topology': str, 'Z_short_DUT': _impedance,
+                                     'Z_short_CEA': _impedance}.get(name, float),
+                               help='default: {}'.format(DEFAULTS[name]))
+        if command in ('sweep', 'track'):
+            sub.add_argument('--freqs', nargs=3, type=float, metavar=('START', 'STOP', 'NUM'),
+                             help='frequencies [Hz], default: {}'.format(DEFAULTS['freqs']))
+        if command == 'map':
+            for name in ('L_DUT_range', 'L_CEA_range'):
+                sub.add_argument('--' + name.replace('_', '-'), dest=name, nargs=3, type=float,
+                                 metavar=('START', 'STOP', 'NUM'),
+                                 help='short lengths [m], default: {}'.format(DEFAULTS[name]))
+        if command in ('optimize', 'track'):
+            sub.add_argument('--npoints', type=int, help='points of the bracketing grid')
+        if command == 'optimize':
+            sub.add_argument('--method', choices=('solve', 'random'),
+                             help='deterministic solver or random starts, default: solve')
+            sub.add_argument('--n-solutions', dest='n_solutions', type=int)
+            sub.add_argument('--seed', type=int)
+        if command == 'fit':
+            sub.add_argument('--measurement', help='measurement file (ASC or Touchstone)')
+            sub.add_argument('--params', nargs='+', help='fitted parameters, default: all')
+            sub.add_argument('--residual', choices=('dB', 'complex'))
+        sub.add_argument('--config', help='JSON file of the job(s) parameters')
+        sub.add_argument('--output', '-o', default='tresonator_results',
+                         help='output directory, default: tresonator_results')
+        sub.add_argument('--format', choices=('npz', 'csv'), default='npz')
+        sub.add_argument('--jobs', '-j', type=int, default=1,
+                         help='number of worker processes, -1 for all the CPUs')
+    return parser
+
+
+def _check_outputs(specs, args):
+    """
+    Error message if the job names are invalid or if an output file
+    would overwrite the config file, otherwise None.
+    """
+    names = [str(spec['name']) for spec in specs]
+    for name in names:
+        if not name or name.startswith(('_', '.')) or os.sep in name or '/' in name:
+            return 'invalid job name: {!r}'.format(name)
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        return 'duplicate job names: {}'.format(', '.join(duplicates))
+    if args.config:
+        outputs = [SUMMARY_FILENAME] + [name + ext for name in names for ext in ('.json', '.' + args.format)]
+        config = os.path.abspath(args.config)
+        for output in outputs:
+            if os.path.abspath(os.path.join(args.output, output)) == config:
+                return '{} would overwrite the config file'.format(output)
+    return None
+
+
+def main(argv=None):
+    parser = _parser()
+    args = parser.parse_args(argv)
+    specs = job_specs(args.command, args)
+    error = _check_outputs(specs, args)
+    if error:
+        parser.error(error)
+    os.makedirs(args.output, exist_ok=True)
+    n_jobs = os.cpu_count() if args.jobs == -1 else args.jobs
+
+    t0 = time.perf_counter()
+    summaries = []
+    if n_jobs > 1 and len(specs) > 1:
+        with ProcessPoolExecutor(min(n_jobs, len(specs))) as executor:
+            results = executor.map(run_job, specs, [args.output]*len(specs), [args.format]*len(specs))
+            for summary in results:
+                summaries.append(summary)
+                _report(summary)
+    else:
+        for spec in specs:
+            summaries.append(run_job(spec, args.output, args.format))
+            _report(summaries[-1])
+
+    with open(os.path.join(args.output, SUMMARY_FILENAME), 'w') as fid:
+        json.dump({'command': args.command, 'argv': sys.argv if argv is None else list(argv),
+                   'elapsed': time.perf_counter() - t0, 'n_jobs': n_jobs,
+                   'tresonator': __version__, 'jobs': summaries}, fid, indent=1)
+    return 1 if any(summary['error'] for summary in summaries) else 0
+
+
+def _report(summary):
+    if summary['error']:
+        print('{name}: FAILED after {elapsed:.3f} s, {error}'.format(**summary), file=sys.stderr)
+    else:
+        print('{name}: {elapsed:.3f} s -> {file}'.format(**summary))
@@ -3,7 +3,131 @@
 Coaxial Class
 """
 import numpy as np
+from functools import lru_cache
 from . constants import *
+from . import profiling
+
+# Maximum number of (geometry, frequency, losses) entries kept in the 
+# section properties cache
+SECTION_CACHE_SIZE = 4096
+
+
+def characteristic_impedance(Dint, Dout, eps_r=1):
+    """
+    Characteristic impedance of a coaxial transmission line [Ohm]
+    """
+    return 1/(2*pi)*np.sqrt(mu_0/epsilon_0/eps_r) * np.log(Dout/Dint)
+
+
+def propagation_constant(f, Dint, Dout, eps_r=1, sigma=conductivity_Cu, additional_loss=1):
+    """
+    Propagation constant gamma = alpha + j*beta of a coaxial transmission line.
+    
+    f and additional_loss can be arrays.
+    """
+    Zc = characteristic_impedance(Dint, Dout, eps_r)
+    # RF sheet resistance of conductors
+    omega = 2*pi*f
+    Rs = np.sqrt(omega*mu_0/(2*sigma))
+    # Transmission Line Losses
+    alpha = Rs/pi*(1/Dint + 1/Dout) / (2*Zc)
+    beta = 2*pi*f/c # TEM mode in coaxial -> vacuum wavenumber
+    return additional_loss*alpha + 1j*beta
+
+
+def characteristic_impedance_derivatives(Dint, Dout, eps_r=1):
+    """
+    Derivatives of the characteristic impedance of a coaxial transmission 
+    line with respect to its inner and outer diameters.
+    
+    Returns
+    -------
+    dZc_dDint, dZc_dDout
+    """
+    K = 1/(2*pi)*np.sqrt(mu_0/epsilon_0/eps_r)
+    return -K/Dint, K/Dout
+
+
+def propagation_constant_derivatives(f, Dint, Dout, eps_r=1, sigma=conductivity_Cu, additional_loss=1):
+    """
+    Derivatives of the propagation constant of a coaxial transmission line
+    (see propagation_constant) with respect to its inner and outer diameters,
+    to the conductivity and to the additional loss factor. 
+    
+    Only the losses alpha depend on these parameters, so the derivatives are real.
+    
+    Returns
+    -------
+    dgamma_dDint, dgamma_dDout, dgamma_dsigma, dgamma_dloss
+    """
+    Zc = characteristic_impedance(Dint, Dout, eps_r)
+    dZc_dDint, dZc_dDout = characteristic_impedance_derivatives(Dint, Dout, eps_r)
+    # alpha = Rs/pi*(1/Dint + 1/Dout)/(2*Zc), for a unit loss factor 
+    alpha = propagation_constant(f, Dint, Dout, eps_r, sigma).real
+    s = 1/Dint + 1/Dout
+    dalpha_dDint = alpha*(-1/(Dint**2*s) - dZc_dDint/Zc)
+    dalpha_dDout = alpha*(-1/(Dout**2*s) - dZc_dDout/Zc)
+    # Rs is proportional to 1/sqrt(sigma)
+    dalpha_dsigma = -alpha/(2*sigma)
+    return additional_loss*dalpha_dDint, additional_loss*dalpha_dDout, \
+           additional_loss*dalpha_dsigma, alpha
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def _section_properties(Dint, Dout, sigma, eps_r, f, additional_losses):
+    profiling.count('section_properties')
+    Zc = characteristic_impedance(Dint, Dout, eps_r)
+    gamma = propagation_constant(f, Dint, Dout, eps_r, sigma, additional_losses)
+    return Zc, gamma
+
+
+def section_properties(Dint, Dout, sigma, eps_r, f, additional_losses=1):
+    """
+    Characteristic impedance and propagation constant of a coaxial section.
+    
+    For scalar frequency and losses, results are memoized in a LRU cache 
+    shared by all the Coax and Configuration instances. 
+    
+    Args
+    ----
+    Dint:   inner diameter [m]
+    Dout:   outer conductor diameter [m]
+    sigma:  conductor conductivity [S/m]
+    eps_r:  relative permittivity 
+    f : frequency [Hz], float or array
+    additional_losses: multiplying coefficient to alpha (real part)
+    
+    Returns
+    -------
+    Zc: characteristic impedance [Ohm]
+    gamma: complex propagation constant [1/m]
+    """
+    if np.ndim(f) == 0 and np.ndim(additional_losses) == 0:
+        return _section_properties(float(Dint), float(Dout), float(sigma), 
+                                   float(eps_r), float(f), float(additional_losses))
+    else:
+        profiling.count('section_properties')
+        return (characteristic_impedance(Dint, Dout, eps_r), 
+                propagation_constant(f, Dint, Dout, eps_r, sigma, additional_losses))
+
+
+def section_cache_info():
+    """
+    Statistics of the section properties cache. 
+    
+    Returns
+    -------
+    info: dict with the hits, misses, maxsize and currsize of the cache
+    """
+    return _section_properties.cache_info()._asdict()
+
+
+def section_cache_clear():
+    """
+    Clear the section properties cache and its statistics.
+    """
+    _section_properties.cache_clear()
+
 
 class Coax(object):
     """
@@ -32,8 +156,7 @@ class Coax(object):
         self.sigma = sigma
         
         # Characteristic impedance of the coaxial transmission line
-        self.Zc = 1/(2*pi)*np.sqrt(mu_0/epsilon_0/self.eps_r) * \
-                    np.log(self.Dout/self.Dint)
+        self.Zc = characteristic_impedance(self.Dint, self.Dout, self.eps_r)
        
     def alpha(self, f):
         """
@@ -41,15 +164,11 @@ class Coax(object):
         
         Args:
         ----
-        f : float
+        f : float or array
             frequency in Hz
         """
-        if f <= 0: raise ValueError
-        # RF sheet resistance of conductors
-        omega = 2*pi*f
-        Rs = np.sqrt(omega*mu_0/(2*self.sigma))
-        # Transmission Line Losses
-        alpha = Rs/pi*(1/self.Dint + 1/self.Dout) / (2*self.Zc)
+        if np.any(np.asarray(f) <= 0): raise ValueError
+        alpha = propagation_constant(f, self.Dint, self.Dout, self.eps_r, self.sigma).real
         
         return alpha
     
@@ -67,18 +186,17 @@ class Coax(object):
         
         Args
         ----
-        f : frequency [Hz]
+        f : frequency [Hz], float or array
         additional_loss: multiplying coefficient to alpha (real part)
         
         Returns
         -------
-        gamma: complex
+        gamma: complex or complex array (same shape than f)
                Wavenumber (complex) of the transmission line
         """
-        if f <= 0: raise ValueError
-        alpha = self.alpha(f)
-        beta = self.beta(f) 
-        gamma = additional_loss*alpha + 1j*beta
+        if np.any(np.asarray(f) <= 0): raise ValueError
+        _, gamma = section_properties(self.Dint, self.Dout, self.sigma, self.eps_r, 
+                                      f, additional_loss)
         return gamma
         
     def __repr__(self):
@@ -3,12 +3,24 @@
 Configuration of the T-resonator
 """
 from . constants import *
-from . coaxial import Coax
-from . transmission_line_utils import ZL_2_Zin, transfer_matrix
-from scipy.optimize import minimize
+from . coaxial import Coax, characteristic_impedance_derivatives, propagation_constant_derivatives
+from . reduced_model import ReducedModel
+from . power_scaling import PowerScaling
+from . import resonance
+from . cache import cached, configuration_inputs
+from . topology import Topology
+from . import profiling
+from . transmission_line_utils import ZL_2_Zin, ZL_2_Zin_derivatives, transfer_matrix, \
+                                     standing_wave_maximum
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import os
 import numpy as np
-import skrf as rf
-from skrf.media import Coaxial
+# scipy.optimize and skrf are only imported when the optimizers or the 
+# circuits are first used: the transmission line model only requires NumPy.
+
+logger = logging.getLogger(__name__)
 
 
 class Configuration(object):
@@ -17,32 +29,56 @@ class Configuration(object):
     
     Args:
     -----
-    f:  float>0
-        frequency [Hz]
+    f:  float>0 or array of floats>0
+        frequency [Hz]. When an array is given, gammas, input_impedance(),
+        S11() and S11dB() are evaluated for all the frequencies at once.
     P_in: float>0
         input power [W]
     L_DUT: float>0
         short length at DUT side branch
     L_CEA: float>0
         short length at CEA side branch
+    Z_short_DUT, Z_short_CEA: float, optional
+        short impedances [Ohm]. Default are the topology ones.
     additional_losses: float
         Multiplicative factor to propagation losses
+    topology: Topology or str, optional
+        sections of the resonator branches, or name or file of a topology 
+        (see Topology.load). Default is the SSA50 resonator.
     """            
+    # Parameters with respect to which S11 can be derived
+    GRAD_PARAMS = ('L_DUT', 'L_CEA', 'Z_short_DUT', 'Z_short_CEA', 'additional_losses')
+    
     def __init__(self, f, P_in, L_DUT, L_CEA, 
-                 Z_short_DUT=1e-2, Z_short_CEA=1e-2, additional_losses=1):
+                 Z_short_DUT=None, Z_short_CEA=None, additional_losses=1, 
+                 topology=None):
+        # Resonator topology: sections of the DUT and CEA branches
+        if topology is None or isinstance(topology, str):
+            topology = Topology.load(*([topology] if topology else []))
+        self.topology = topology
+        
+        # Transmission Line Section indexes of each branch, from short to T.
+        # The first section is the variable length one. 
+        self._DUT_SECTIONS = topology.sections['DUT']
+        self._CEA_SECTIONS = topology.sections['CEA']
+        
+        # Names of the Transmission Line Sections (same as in circuit()), 
+        # numbered from T to short in each branch
+        self.SECTION_NAMES = topology.names
+        
         # Source frequency [Hz]
-        self.f = f 
+        self.f = np.asarray(f) if np.ndim(f) else f
         
         # Input power [W]
         self.P_in = P_in
         
-        # Branches end lengths
-        self.L_DUT = L_DUT
-        self.L_CEA = L_CEA
+        # Branches end lengths, see the L_DUT and L_CEA properties
+        self._L_DUT = L_DUT
+        self._L_CEA = L_CEA
         
         # Short Impedance [Ohm] 
-        self.Z_short_DUT = Z_short_DUT
-        self.Z_short_CEA = Z_short_CEA
+        self.Z_short_DUT = topology.Z_short_DUT if Z_short_DUT is None else Z_short_DUT
+        self.Z_short_CEA = topology.Z_short_CEA if Z_short_CEA is None else Z_short_CEA
         
         # feeder impedance 
         self.R = 29.8 # Ohm
@@ -52,69 +88,90 @@ class Configuration(object):
         
         # Maximum number of iterations during a short lengths optimization
         self.NB_ITER_MAX = 5000
+        # Maximum |S11| of an optimized solution [dB]
+        self.MATCH_THRESHOLD_DB = -40
+        # Minimum distance between two distinct optimized solutions [m]
+        self.SOLUTION_ATOL = 1e-4
         
         # relative additional loss coefficient to multiply with the loss in the
         # coaxial transmission line, in order to match measurements 
         # example : +20# losses --> 1.2
         self.additional_losses = additional_losses 
         
-        self.TLs, self.gammas = self._resonator_config()
+        with profiling.stage('configuration_init'):
+            self.TLs, self.gammas = self._resonator_config()
+        
+        # per-watt voltage and current profiles, see power_scaling()
+        self._power_scalings = {}
 
     def __repr__(self):
         return 'T-resonator config: f={} MHz, P_in={} kW, L_DUT={} m, L_CEA={} m'.format( \
                      self.f/1e6, self.P_in/1e3, self.L_DUT, self.L_CEA)
 
+    @property
+    def L_DUT(self):
+        """
+        Short length of the DUT branch [m]
+        """
+        return self._L_DUT
+
+    @L_DUT.setter
+    def L_DUT(self, L):
+        # the variable section is updated too, so that all the model
+        # methods use the same length
+        self._L_DUT = L
+        self.TLs[self._DUT_SECTIONS[0]].L = L
+
+    @property
+    def L_CEA(self):
+        """
+        Short length of the CEA branch [m]
+        """
+        return self._L_CEA
+
+    @L_CEA.setter
+    def L_CEA(self, L):
+        self._L_CEA = L
+        self.TLs[self._CEA_SECTIONS[0]].L = L
+
     def _resonator_config(self):
         """
-        Default resonator configuration
-        """
-       
-        # Resonator TL section description
-        #
-        # Item      Length(mm)	Zc(Ohm) Inner/Outer Diam(m)	Inner   Outer
-        # ---------------------------------------------------------------------
-        # L1(DUT)	Variable	    26.83   0.140,0.219         SS      SS  CEA extension
-        # or
-        # SSA13:
-        # L1(DUT)	Variable	    33.14   0.126,0.219         Au      SS  DUT extension  
-        # SSA50:
-        # L1(DUT)	Variable	    32.20   0.12792,0.219       Cu      SS  DUT extension  
-        # L2     	  1100       18.72   0.1683,0.23         Cu      Cu
-        # L3        1021.5     29.8    0.14,0.23           Cu      Cu
-        # L4        100        49.5    0.1,0.23            Ag      Ag
-        # L5        114        29.8    0.14,0.23           Ag      Ag
-        # L6        661.2      29.8    0.14,0.23           Ag      Ag
-        # L7        100        49.94   idem  L4            Ag      Ag
-        # L8        1497.5     29.8    0.14,0.23           SS      SS
-        # L9(CEA)   Variable	26.82   0.140,0.219         SS      SS
-        #
-        
-        TLs = []
-        # DUT Branch
-        # Characteristic Impedance of the last DUT section (L1)
-        # NB : CEA: Dout/Dint=219/140 -> 26.82 Ohm 
-        #      SSA13, CCFE Home-made: 219/126 -> 33.14 Ohm
-        #      SSA50: 219/127.92 -> 32.2 Ohm
-        TLs.append(Coax(self.L_DUT, 0.1279, 0.219, sigma=conductivity_Cu))
-        TLs.append(Coax(   1100e-3, 0.1683, 0.230, sigma=conductivity_Cu)) # was ZCinter=18.62 and Linter=1.1
-        TLs.append(Coax(   1021e-3, 0.140,  0.230, sigma=conductivity_Cu)) # 1021.5e-3 = 2.1215-Linter
-        TLs.append(Coax(    100e-3, 0.100,  0.230, sigma=conductivity_Ag)) # was ZC4=49.94 ### ZC for small reduction copper plating
-        TLs.append(Coax(    114e-3, 0.140,  0.230, sigma=conductivity_Ag))
-        
-        # CEA Branch
-        TLs.append(Coax(    728e-3, 0.140,  0.230, sigma=conductivity_Ag)) # coude
-        TLs.append(Coax(    100e-3, 0.100,  0.230, sigma=conductivity_Ag))
-        TLs.append(Coax(   1512e-3, 0.140,  0.230, sigma=conductivity_SS))
-        TLs.append(Coax(self.L_CEA, 0.140,  0.219, sigma=conductivity_SS))
-        
-        # Calculate the losses for each section
-        gammas = []        
-        for TL in TLs:
-            gamma = TL.gamma(self.f, self.additional_losses)
-            gammas.append(gamma)
-            
+        Transmission line sections of the resonator topology and their
+        propagation constants.
+        """
+        TLs = self.topology.coaxes(self.L_DUT, self.L_CEA)
+        # Calculate the losses for all the sections at once
+        gammas = self.topology.propagation_constants(self.f, self.additional_losses)
         return TLs, gammas
 
+    def parameters(self):
+        """
+        Parameters of the model: lengths, diameters and conductivities of the 
+        sections, short impedances and additional losses.
+        
+        The parameters of a section are named '<section>.L', '<section>.Dint', 
+        '<section>.Dout' and '<section>.sigma' (see SECTION_NAMES). The lengths 
+        of the variable sections are named 'L_DUT' and 'L_CEA'. 
+        
+        Returns
+        -------
+        params: dict of name: value
+        """
+        params = {}
+        for TL_index, (name, TL) in enumerate(zip(self.SECTION_NAMES, self.TLs)):
+            if TL_index == self._DUT_SECTIONS[0]:
+                params['L_DUT'] = TL.L
+            elif TL_index == self._CEA_SECTIONS[0]:
+                params['L_CEA'] = TL.L
+            else:
+                params[name+'.L'] = TL.L
+            params[name+'.Dint'] = TL.Dint
+            params[name+'.Dout'] = TL.Dout
+            params[name+'.sigma'] = TL.sigma
+        params['Z_short_DUT'] = self.Z_short_DUT
+        params['Z_short_CEA'] = self.Z_short_CEA
+        params['additional_losses'] = self.additional_losses
+        return params
 
     def input_impedance(self):
         """
@@ -128,29 +185,249 @@ class Configuration(object):
         -------
         Zin:    input impedance of the T-resonator
         Z_CEA:  input impedances at each sections of the CEA branch, from short to T
+                (array of shape (nsections,) + f.shape)
         Z_DUT:  input impedances at each sections of the DUT branch, from short to T   
         """        
         
-        # DUT BRANCH
-        Z_DUT = []
-        Z_DUT.append(ZL_2_Zin(self.TLs[0].L, self.TLs[0].Zc, self.gammas[0], self.Z_short_DUT))
-        Z_DUT.append(ZL_2_Zin(self.TLs[1].L, self.TLs[1].Zc, self.gammas[1], Z_DUT[0]))
-        Z_DUT.append(ZL_2_Zin(self.TLs[2].L, self.TLs[2].Zc, self.gammas[2], Z_DUT[1]))
-        Z_DUT.append(ZL_2_Zin(self.TLs[3].L, self.TLs[3].Zc, self.gammas[3], Z_DUT[2]))
-        Z_DUT.append(ZL_2_Zin(self.TLs[4].L, self.TLs[4].Zc, self.gammas[4], Z_DUT[3]))
-        
-        # CEA BRANCH
-        Z_CEA = []
-        Z_CEA.append(ZL_2_Zin(self.TLs[8].L, self.TLs[8].Zc, self.gammas[8], self.Z_short_CEA))# 9
-        Z_CEA.append(ZL_2_Zin(self.TLs[7].L, self.TLs[7].Zc, self.gammas[7], Z_CEA[0])) # 8
-        Z_CEA.append(ZL_2_Zin(self.TLs[6].L, self.TLs[6].Zc, self.gammas[6], Z_CEA[1])) # 7
-        Z_CEA.append(ZL_2_Zin(self.TLs[5].L, self.TLs[5].Zc, self.gammas[5], Z_CEA[2])) # 6
+        # Both branches, from short to T
+        Z_DUT, Z_CEA = self.topology.input_impedances(self.gammas, self.L_DUT, self.L_CEA, 
+                                                      self.Z_short_DUT, self.Z_short_CEA)
         
         # At T-junction. Impedance are associated in parallel.
         Zin = (Z_DUT[-1]*Z_CEA[-1])/(Z_DUT[-1] + Z_CEA[-1])
+        profiling.count('model_evaluations', np.size(Zin))
         
         return Zin, Z_CEA, Z_DUT
     
+    def _branch_impedance_and_grad(self, L, Z_short, TL_indexes, gammas, alphas=None):
+        """
+        Input impedance at T of a branch and its derivatives with respect to 
+        the variable length L, to the short impedance and to the additional 
+        losses (only if the sections' alphas are given). 
+        
+        The derivatives are propagated along the cascade of sections (forward mode).
+        """
+        Z = Z_short
+        dZ_dL, dZ_dZshort, dZ_dloss = 0, 1, 0
+        for idx, TL_index in enumerate(TL_indexes):
+            _L = L if idx == 0 else self.TLs[TL_index].L
+            dZin_dL, _, dZin_dgamma, dZin_dZL = ZL_2_Zin_derivatives(
+                _L, self.TLs[TL_index].Zc, gammas[TL_index], Z)
+            dZ_dL = dZin_dZL*dZ_dL + (dZin_dL if idx == 0 else 0)
+            dZ_dZshort = dZin_dZL*dZ_dZshort
+            if alphas is not None:
+                # gamma = additional_losses*alpha + j*beta
+                dZ_dloss = dZin_dZL*dZ_dloss + dZin_dgamma*alphas[TL_index]
+            Z = ZL_2_Zin(_L, self.TLs[TL_index].Zc, gammas[TL_index], Z)
+        return Z, dZ_dL, dZ_dZshort, dZ_dloss
+
+    def S11_and_grad(self, params=GRAD_PARAMS):
+        """
+        Returns the S11 of the T-resonator and its derivatives with respect to 
+        the configuration parameters, calculated analytically.
+        
+        Args
+        ----
+        params: tuple of str, optional
+            parameters to derive S11 with respect to, among 'L_DUT', 'L_CEA',
+            'Z_short_DUT', 'Z_short_CEA' and 'additional_losses'. 
+            Default is all of them.
+        
+        Returns
+        -------
+        S11: complex (or complex array if f is an array)
+        dS11: complex array of shape (len(params),) + f.shape
+            Jacobian dS11/dparam. The gradient of |S11| is given by 
+            real(conj(S11)*dS11)/|S11|
+        """
+        alphas = None
+        if 'additional_losses' in params:
+            alphas = [TL.alpha(self.f) for TL in self.TLs]
+        
+        Z_DUT, dZ_DUT_dL, dZ_DUT_dZshort, dZ_DUT_dloss = self._branch_impedance_and_grad(
+            self.L_DUT, self.Z_short_DUT, self._DUT_SECTIONS, self.gammas, alphas)
+        Z_CEA, dZ_CEA_dL, dZ_CEA_dZshort, dZ_CEA_dloss = self._branch_impedance_and_grad(
+            self.L_CEA, self.Z_short_CEA, self._CEA_SECTIONS, self.gammas, alphas)
+        
+        # At T-junction. Impedance are associated in parallel.
+        Zin = (Z_DUT*Z_CEA)/(Z_DUT + Z_CEA)
+        dZin_dZ_DUT = Z_CEA**2/(Z_DUT + Z_CEA)**2
+        dZin_dZ_CEA = Z_DUT**2/(Z_DUT + Z_CEA)**2
+        
+        S11 = (Zin - self.R)/(Zin + self.R)
+        dS11_dZin = 2*self.R/(Zin + self.R)**2
+        profiling.count('model_evaluations', np.size(S11))
+        profiling.count('gradient_evaluations', np.size(S11))
+        
+        dZin = {'L_DUT': dZin_dZ_DUT*dZ_DUT_dL,
+                'L_CEA': dZin_dZ_CEA*dZ_CEA_dL,
+                'Z_short_DUT': dZin_dZ_DUT*dZ_DUT_dZshort,
+                'Z_short_CEA': dZin_dZ_CEA*dZ_CEA_dZshort,
+                'additional_losses': dZin_dZ_DUT*dZ_DUT_dloss + dZin_dZ_CEA*dZ_CEA_dloss}
+        dS11 = np.array([dS11_dZin*dZin[param] for param in params], dtype=complex)
+        
+        return S11, dS11
+
+    def sensitivities(self, freqs=None):
+        """
+        Returns the derivatives of S11 and of the input impedance with respect 
+        to all the parameters of the model (see parameters()): lengths, 
+        diameters and conductivities of every section, short impedances and 
+        additional losses.
+        
+        The derivatives are calculated analytically, propagated along the 
+        cascade of sections and through the T-junction, for all the 
+        frequencies at once.
+        
+        Args
+        ----
+        freqs: array, optional
+            frequencies [Hz]. Default is the configuration frequency.
+        
+        Returns
+        -------
+        dS11: complex array of shape (nparams,) + freqs.shape
+            dS11/dparam
+        dZin: complex array of shape (nparams,) + freqs.shape
+            dZin/dparam
+        names: list of str
+            names of the parameters (same order than parameters())
+        """
+        if freqs is None:
+            _cfg = self
+        else:
+            _cfg = Configuration(np.asarray(freqs), self.P_in, self.L_DUT, self.L_CEA,
+                                 Z_short_DUT=self.Z_short_DUT, Z_short_CEA=self.Z_short_CEA,
+                                 additional_losses=self.additional_losses, topology=self.topology)
+        
+        Z_DUT, dZ_DUT = _cfg._branch_sensitivities(_cfg.L_DUT, _cfg.Z_short_DUT, 
+                                                   _cfg._DUT_SECTIONS, 'L_DUT', 'Z_short_DUT')
+        Z_CEA, dZ_CEA = _cfg._branch_sensitivities(_cfg.L_CEA, _cfg.Z_short_CEA, 
+                                                   _cfg._CEA_SECTIONS, 'L_CEA', 'Z_short_CEA')
+        
+        # At T-junction. Impedance are associated in parallel.
+        Zin = (Z_DUT*Z_CEA)/(Z_DUT + Z_CEA)
+        dZin_dZ_DUT = Z_CEA**2/(Z_DUT + Z_CEA)**2
+        dZin_dZ_CEA = Z_DUT**2/(Z_DUT + Z_CEA)**2
+        dS11_dZin = 2*_cfg.R/(Zin + _cfg.R)**2
+        profiling.count('model_evaluations', np.size(Zin))
+        profiling.count('gradient_evaluations', np.size(Zin))
+        
+        names = list(_cfg.parameters())
+        dZin = np.array([dZin_dZ_DUT*dZ_DUT.get(name, 0) + dZin_dZ_CEA*dZ_CEA.get(name, 0) 
+                         for name in names], dtype=complex).reshape((len(names),) + np.shape(Zin))
+        return dS11_dZin*dZin, dZin, names
+
+    def _branch_sensitivities(self, L, Z_short, TL_indexes, var_name, short_name):
+        """
+        Input impedance at T of a branch and its derivatives with respect to 
+        the parameters of the branch sections, short impedance and additional 
+        losses (dict of name: dZ/dparam). 
+        
+        The derivative of each section impedance is transferred to the T by 
+        the product of the dZin/dZL of the next sections.
+        """
+        Z = Z_short
+        local = [] # derivatives of each section impedance wrt its parameters
+        dZ_dZL = [] # derivative of each section impedance wrt its load
+        dZ_dloss = []
+        for idx, TL_index in enumerate(TL_indexes):
+            TL = self.TLs[TL_index]
+            name = self.SECTION_NAMES[TL_index]
+            _L = L if idx == 0 else TL.L
+            gamma = self.gammas[TL_index]
+            dZin_dL, dZin_dZ0, dZin_dgamma, dZin_dZL = ZL_2_Zin_derivatives(_L, TL.Zc, gamma, Z)
+            dZc_dDint, dZc_dDout = characteristic_impedance_derivatives(TL.Dint, TL.Dout, TL.eps_r)
+            dgamma_dDint, dgamma_dDout, dgamma_dsigma, dgamma_dloss = propagation_constant_derivatives(
+                self.f, TL.Dint, TL.Dout, TL.eps_r, TL.sigma, self.additional_losses)
+            local.append({var_name if idx == 0 else name+'.L': dZin_dL,
+                          name+'.Dint': dZin_dZ0*dZc_dDint + dZin_dgamma*dgamma_dDint,
+                          name+'.Dout': dZin_dZ0*dZc_dDout + dZin_dgamma*dgamma_dDout,
+                          name+'.sigma': dZin_dgamma*dgamma_dsigma})
+            dZ_dZL.append(dZin_dZL)
+            dZ_dloss.append(dZin_dgamma*dgamma_dloss)
+            Z = ZL_2_Zin(_L, TL.Zc, gamma, Z)
+        
+        dZ = {}
+        transfer = 1 # dZ_T/dZ of the current section
+        loss = 0
+        for idx in reversed(range(len(TL_indexes))):
+            for name, value in local[idx].items():
+                dZ[name] = transfer*value
+            loss = loss + transfer*dZ_dloss[idx]
+            transfer = transfer*dZ_dZL[idx]
+        dZ[short_name] = transfer
+        dZ['additional_losses'] = loss
+        return Z, dZ
+
+    def S11_map(self, L_DUT, L_CEA, f=None, cache=None):
+        """
+        Returns the S11 and input impedance of the T-resonator for all the 
+        combinations of short lengths L_DUT and L_CEA.
+        
+        The full grid is evaluated at once by broadcasting on the reduced model:
+        each branch is only evaluated once per short length.
+        
+        Args
+        ----
+        L_DUT: array of shape (nDUT,)
+            short lengths at DUT side branch [m]
+        L_CEA: array of shape (nCEA,)
+            short lengths at CEA side branch [m]
+        f: float or array of shape (nfreq,), optional
+            frequency [Hz]. Default is the configuration frequency.
+        cache: bool or ResultCache, optional
+            result cache (see tresonator.cache). Default is the default cache
+            if enabled. False bypasses the cache.
+            
+        Returns
+        -------
+        S11: complex array of shape (nDUT, nCEA), or (nfreq, nDUT, nCEA) 
+            if f is an array
+        S11dB: array, same shape than S11
+        Zin: complex array, same shape than S11
+        """
+        L_DUT = np.asarray(L_DUT)
+        L_CEA = np.asarray(L_CEA)
+        f = np.asarray(self.f if f is None else f)
+        inputs = (configuration_inputs(self, exclude=('f', 'L_DUT', 'L_CEA')), f, L_DUT, L_CEA)
+        results = cached(cache, 'S11_map', inputs, 
+                         lambda: dict(zip(('S11', 'Zin'), self._S11_map(L_DUT, L_CEA, f))))
+        S11, Zin = results['S11'], results['Zin']
+        S11dB = 20*np.log10(np.abs(S11))
+        
+        return S11, S11dB, Zin
+    
+    def _S11_map(self, L_DUT, L_CEA, f):
+        if f.ndim:
+            f = f[:, np.newaxis, np.newaxis]
+            
+        model = self.reduced_model(f)
+        Z_DUT = model.branch_impedance('DUT', L_DUT[:, np.newaxis])
+        Z_CEA = model.branch_impedance('CEA', L_CEA[np.newaxis, :])
+        
+        Zin = (Z_DUT*Z_CEA)/(Z_DUT + Z_CEA)
+        S11 = (Zin - self.R)/(Zin + self.R)
+        profiling.count('model_evaluations', np.size(S11))
+        
+        return S11, Zin
+
+    def reduced_model(self, f=None):
+        """
+        Returns the reduced-order model of the T-resonator, in which the fixed 
+        sections of each branch are collapsed into a single chain matrix.
+        
+        Args
+        ----
+        f: float or array, optional
+            frequency [Hz]. Default is the configuration frequency.
+            
+        Returns
+        -------
+        model: ReducedModel
+        """
+        return ReducedModel(self, f)
+
     def S11(self):
         """
         Returns the S11 of the T-resonator at a given frequency
@@ -167,12 +444,41 @@ class Configuration(object):
         
     def S11dB(self):
         return 20*np.log10(np.abs(self.S11()))
+
+    def sweep(self, freqs):
+        """
+        Returns the S11 and the input impedance of the T-resonator for a
+        range of frequencies, with the same lengths, shorts and losses.
         
+        All the frequencies are evaluated at once (no loop on frequency).
         
-    def voltage_current(self):
+        Args
+        ----
+        freqs: array
+            frequencies [Hz]
+        
+        Returns
+        -------
+        S11: complex array of shape (nfreq,)
+        Zin: complex array of shape (nfreq,)
+        """
+        _cfg = Configuration(np.asarray(freqs), self.P_in, self.L_DUT, self.L_CEA,
+                             Z_short_DUT=self.Z_short_DUT, Z_short_CEA=self.Z_short_CEA,
+                             additional_losses=self.additional_losses, topology=self.topology)
+        Zin, _, _ = _cfg.input_impedance()
+        S11 = (Zin - _cfg.R)/(Zin + _cfg.R)
+        return S11, Zin
+        
+        
+    def voltage_current(self, dl=1e-3):
         """ 
         Returns the voltage and current along the resonator. 
         
+        Args
+        ----
+        dl: float, optional
+            spatial sampling step [m]. Default is 1 mm.
+        
         Returns
         -------
         L_CEA: length 
@@ -182,195 +488,702 @@ class Configuration(object):
         I_CEA:
         I_DUT:
         """
-        Zin, Z_CEA, Z_DUT = self.input_impedance()
-        
-        # Corresponding Transmission Line Section indexes
-        TL_indexes_DUT = [4,3,2,1,0]
-        TL_indexes_CEA = [5,6,7,8]
-
-        # calculate the voltage and current along the T-resonator branches
-        L_DUT, V_DUT, I_DUT, Z_DUT = self._voltage_current_branch(Zin, Z_DUT[-1], TL_indexes_DUT)
-        L_CEA, V_CEA, I_CEA, Z_CEA = self._voltage_current_branch(Zin, Z_CEA[-1], TL_indexes_CEA)
+        with profiling.stage('voltage_current'):
+            Zin, Z_CEA, Z_DUT = self.input_impedance()
+            
+            # Corresponding Transmission Line Section indexes, from T to short
+            TL_indexes_DUT = self._DUT_SECTIONS[::-1]
+            TL_indexes_CEA = self._CEA_SECTIONS[::-1]
+    
+            # calculate the voltage and current along the T-resonator branches
+            L_DUT, V_DUT, I_DUT, Z_DUT = self._voltage_current_branch(Zin, Z_DUT[-1], TL_indexes_DUT, dl)
+            L_CEA, V_CEA, I_CEA, Z_CEA = self._voltage_current_branch(Zin, Z_CEA[-1], TL_indexes_CEA, dl)
 
         
         return L_CEA, L_DUT, V_CEA, V_DUT, I_CEA, I_DUT
         
-    def _voltage_current_branch(self, Zin, Zbranch, TL_indexes):
-        # spatial sampling 
-        dl = 1e-3   
+    def _voltage_current_branch(self, Zin, Zbranch, TL_indexes, dl=1e-3):
         # Input voltage from input power and feeder impedance
         Vin = np.sqrt(self.P_in*2*self.R) # forward voltage
         rho_in = (Zin - self.R)/(Zin + self.R) # reflection coefficient
         
-        # arrays of initial voltage and current for each line section
-        V0, I0 = [], []
-        # arrays along L
-        V, I, Z, L_full = [], [], [], []
+        # arrays along L, for each line section
+        V, I, L = [], [], []
 
         # Going from T to short 
-        V0.append( Vin*(1 + rho_in) ) # total voltage
-        I0.append( V0[0]/Zbranch)
+        V0 = Vin*(1 + rho_in) # total voltage
+        I0 = V0/Zbranch
+        L0 = 0
         
         # For each transmission line section,
-        # propagates the V,I,Z from the last section values to the length of current section
+        # propagates the V,I from the section input values along the section
         for TL_index in TL_indexes:
-            _L = np.arange(start=0, stop=self.TLs[TL_index].L, step=dl)
-            for l in _L:
-                _V, _I = transfer_matrix(-l, V0[-1], I0[-1], self.TLs[TL_index].Zc, self.gammas[TL_index])
-                V.append(_V)
-                I.append(_I)
-                Z.append(_V/_I)
-            # cumulate the length array    
-            if L_full:
-                L_full.append(_L + L_full[-1][-1])
-            else:
-                L_full.append(_L) # 1st step
+            TL = self.TLs[TL_index]
+            _L = np.arange(start=0, stop=TL.L, step=dl)
+            _V, _I = transfer_matrix(-_L, V0, I0, TL.Zc, self.gammas[TL_index])
+            V.append(_V)
+            I.append(_I)
+            L.append(L0 + _L)
             # section intersection values
-            V0.append( V[-1] )
-            I0.append( I[-1] )
+            V0, I0 = transfer_matrix(-TL.L, V0, I0, TL.Zc, self.gammas[TL_index])
+            L0 += TL.L
         
-        # convert list into arrays
-        V = np.array(V)
-        I = np.array(I)
-        Z = np.array(Z)
-        L = np.concatenate(np.array([np.array(_L) for _L in L_full], dtype=object))
+        V = np.concatenate(V)
+        I = np.concatenate(I)
+        L = np.concatenate(L)
+        Z = V/I
         
         return L, V, I, Z
     
-    def optimize_short_lengths(self, bounds=[(1e-3,200e-3),(1e-3,200e-3)]):
+    def peak_voltage_current(self, L_DUT=None, L_CEA=None):
+        """
+        Returns the maximum voltage and current along each section of the 
+        resonator branches, and their positions, without spatial sampling.
+        
+        On each line section, |V|**2 and |I|**2 are the sum of two exponentials
+        and of a cosine of the position: their maxima are found analytically 
+        and refined by a few Newton iterations (see standing_wave_maximum).
+        All the frequencies and short lengths are evaluated at once.
+        
+        Args
+        ----
+        L_DUT, L_CEA: float or array, optional
+            short lengths [m], broadcastable with the configuration frequency.
+            Default are the configuration ones.
+        
+        Returns
+        -------
+        peaks: dict with
+            'V_DUT', 'V_CEA': maximum |V| [V] of each section of the branch, 
+                from T to short, array of shape (nsections,) + shape
+            'z_V_DUT', 'z_V_CEA': positions of the maxima from T [m]
+            'I_DUT', 'I_CEA', 'z_I_DUT', 'z_I_CEA': same for |I| [A]
+            'V_max', 'I_max': maximum |V| and |I| over the resonator
+            'z_V_max', 'z_I_max': positions of the maxima from T [m]
+            'branch_V_max', 'branch_I_max': branch of the maxima, 'DUT' or 'CEA'
+        """
+        L_var = {'DUT': self.L_DUT if L_DUT is None else np.asarray(L_DUT),
+                 'CEA': self.L_CEA if L_CEA is None else np.asarray(L_CEA)}
+        
+        with profiling.stage('peak_voltage_current'):
+            Z = dict(zip(('DUT', 'CEA'), self.topology.input_impedances(
+                self.gammas, L_var['DUT'], L_var['CEA'], self.Z_short_DUT, self.Z_short_CEA)))
+            Zin = (Z['DUT'][-1]*Z['CEA'][-1])/(Z['DUT'][-1] + Z['CEA'][-1])
+            profiling.count('model_evaluations', np.size(Zin))
+            
+            # Input voltage from input power and feeder impedance
+            Vin = np.sqrt(self.P_in*2*self.R) # forward voltage
+            rho_in = (Zin - self.R)/(Zin + self.R) # reflection coefficient
+            
+            peaks = {}
+            for branch, TL_indexes in (('DUT', self._DUT_SECTIONS), ('CEA', self._CEA_SECTIONS)):
+                V_max, z_V, I_max, z_I = [], [], [], []
+                # Going from T to short 
+                V0 = Vin*(1 + rho_in) # total voltage
+                L0 = 0
+                for idx in reversed(range(len(TL_indexes))):
+                    TL_index = TL_indexes[idx]
+                    Zc, gamma = self.topology.Zc[TL_index], self.gammas[TL_index]
+                    L = L_var[branch] if idx == 0 else self.topology.L[TL_index]
+                    I0 = V0/Z[branch][idx]
+                    # V(z) = A*exp(gamma*z) + B*exp(-gamma*z), I(z) = (-A*exp(gamma*z) + B*exp(-gamma*z))/Zc
+                    A, B = (V0 - Zc*I0)/2, (V0 + Zc*I0)/2
+                    _V_max, _z_V = standing_wave_maximum(A, B, gamma, L)
+                    _I_max, _z_I = standing_wave_maximum(-A/Zc, B/Zc, gamma, L)
+                    V_max.append(_V_max)
+                    I_max.append(_I_max)
+                    z_V.append(L0 + _z_V)
+                    z_I.append(L0 + _z_I)
+                    # section intersection values
+                    V0, _ = transfer_matrix(-L, V0, I0, Zc, gamma)
+                    L0 = L0 + L
+                peaks['V_'+branch], peaks['z_V_'+branch] = np.array(V_max), np.array(z_V)
+                peaks['I_'+branch], peaks['z_I_'+branch] = np.array(I_max), np.array(z_I)
+        
+            for X in ('V', 'I'):
+                maxima, positions = [], []
+                for branch in ('DUT', 'CEA'):
+                    idx = np.argmax(peaks[X+'_'+branch], axis=0)[np.newaxis]
+                    maxima.append(np.take_along_axis(peaks[X+'_'+branch], idx, axis=0)[0])
+                    positions.append(np.take_along_axis(peaks['z_'+X+'_'+branch], idx, axis=0)[0])
+                is_CEA = maxima[1] > maxima[0]
+                peaks[X+'_max'] = np.where(is_CEA, maxima[1], maxima[0])
+                peaks['z_'+X+'_max'] = np.where(is_CEA, positions[1], positions[0])
+                peaks['branch_'+X+'_max'] = np.where(is_CEA, 'CEA', 'DUT')
+        
+        return peaks
+    
+    def power_scaling(self, dl=1e-3):
+        """
+        Returns the voltages and currents along the resonator for 1 W, which 
+        are scaled to arrays of input powers (envelopes, probe voltages and
+        limits input powers). 
+        
+        The per-watt profile is calculated once and cached for the current 
+        short lengths, short impedances and losses.
+        
+        Args
+        ----
+        dl: float, optional
+            spatial sampling step [m]. Default is 1 mm.
+            
+        Returns
+        -------
+        scaling: PowerScaling
+        """
+        key = (dl, self.L_DUT, self.L_CEA, self.Z_short_DUT, self.Z_short_CEA, 
+               self.additional_losses, self.R)
+        if key not in self._power_scalings:
+            self._power_scalings[key] = PowerScaling(self, dl)
+        return self._power_scalings[key]
+    
+    def match_frequency(self, f_span=None, L_DUT=None, L_CEA=None, additional_losses=None,
+                        npoints=31, xtol=1.0, maxiter=100):
+        """
+        Returns the frequency of the minimum of |S11|, for the configuration 
+        or for arrays of short lengths and additional losses.
+        
+        The minimum is bracketed on a coarse frequency grid, then refined by 
+        parabolic interpolation with golden section safeguard (Brent-like), 
+        ie. a few tens of model evaluations per configuration.
+        
+        Args
+        ----
+        f_span: (f_min, f_max) tuple, optional
+            frequency band of the search [Hz]. Default is +/-3% around the 
+            configuration frequency.
+        L_DUT, L_CEA: float or array, optional
+            short lengths [m]. Default are the configuration ones.
+        additional_losses: float or array, optional
+            additional losses factors. Default is the configuration one.
+            L_DUT, L_CEA and additional_losses are broadcasted together.
+        npoints: int, optional
+            number of points of the bracketing frequency grid. Default is 31.
+        xtol: float, optional
+            frequency tolerance [Hz]. Default is 1 Hz.
+        maxiter: int, optional
+            maximum number of refinement iterations. Default is 100.
+            
+        Returns
+        -------
+        f_match: float or array [Hz], NaN if the minimum is at the edge of f_span
+        S11_match: complex or complex array, S11 at f_match
+        """
+        return resonance.match_frequency(self, f_span, L_DUT, L_CEA, additional_losses,
+                                         npoints, xtol, maxiter)
+    
+    def bandwidth(self, threshold_dB=-10, f_span=None, L_DUT=None, L_CEA=None, 
+                  additional_losses=None, npoints=31, xtol=1.0, maxiter=100):
+        """
+        Returns the frequency band around the match frequency in which 
+        |S11| is below a threshold, for the configuration or for arrays of 
+        short lengths and additional losses.
+        
+        The band edges are bracketed on the grid used for the match frequency
+        (see match_frequency) and refined by Illinois regula falsi.
+        
+        Args
+        ----
+        threshold_dB: float, optional
+            S11 threshold [dB]. Default is -10 dB.
+        f_span: (f_min, f_max) tuple, optional
+            frequency band of the search [Hz]. Default is +/-3% around the 
+            configuration frequency.
+        L_DUT, L_CEA: float or array, optional
+            short lengths [m]. Default are the configuration ones.
+        additional_losses: float or array, optional
+            additional losses factors. Default is the configuration one.
+            L_DUT, L_CEA and additional_losses are broadcasted together.
+        npoints: int, optional
+            number of points of the bracketing frequency grid. Default is 31.
+        xtol: float, optional
+            frequency tolerance [Hz]. Default is 1 Hz.
+        maxiter: int, optional
+            maximum number of refinement iterations. Default is 100.
+            
+        Returns
+        -------
+        bandwidth: float or array [Hz]
+        f_low, f_high: float or array, band edges [Hz]
+            NaN if the threshold is not reached or not crossed inside f_span
+        """
+        return resonance.bandwidth(self, threshold_dB, f_span, L_DUT, L_CEA, additional_losses,
+                                   npoints, xtol, maxiter)
+    
+    def loaded_Q(self, f_span=None, L_DUT=None, L_CEA=None, additional_losses=None,
+                 npoints=31, xtol=1.0, maxiter=100):
+        """
+        Returns the loaded quality factor of the T-resonator, for the 
+        configuration or for arrays of short lengths and additional losses.
+        
+        Q_L = f_match/df, where df is the band in which the power absorbed by
+        the resonator is above half of its value at the match frequency.
+        For a matched resonator, it is the -3 dB bandwidth of S11.
+        
+        Args
+        ----
+        f_span: (f_min, f_max) tuple, optional
+            frequency band of the search [Hz]. Default is +/-3% around the 
+            configuration frequency.
+        L_DUT, L_CEA: float or array, optional
+            short lengths [m]. Default are the configuration ones.
+        additional_losses: float or array, optional
+            additional losses factors. Default is the configuration one.
+            L_DUT, L_CEA and additional_losses are broadcasted together.
+        npoints: int, optional
+            number of points of the bracketing frequency grid. Default is 31.
+        xtol: float, optional
+            frequency tolerance [Hz]. Default is 1 Hz.
+        maxiter: int, optional
+            maximum number of refinement iterations. Default is 100.
+            
+        Returns
+        -------
+        Q_L: float or array, NaN if the band is not inside f_span
+        """
+        return resonance.loaded_Q(self, f_span, L_DUT, L_CEA, additional_losses,
+                                  npoints, xtol, maxiter)
+    
+    def optimize_short_lengths(self, bounds=[(1e-3,200e-3),(1e-3,200e-3)],
+                               n_solutions=1, n_jobs=1, seed=None, cache=None):
         """
         Solve the matching problem in order to find the length of the variable
         section of the CEA and DUT branches.
         
+        Local minimizations of |S11| are started from random lengths inside 
+        the bounds, until n_solutions distinct physical solutions are found.
+        The minima are polished by Newton iterations, and are only kept if 
+        they are matched (|S11| below MATCH_THRESHOLD_DB) and distant from 
+        the solutions already found by more than SOLUTION_ATOL.
+        
         Arguments
         ---------
         bounds : list of 2-tuples
             Search bounds for L_DUT and L_CEA
             [(L_DUT min, L_DUT max), (L_CEA min, L_CEA max)]
-            default : [(1e-3,1),(1e-3,1)]
+            default : [(1e-3,200e-3),(1e-3,200e-3)]
+        n_solutions : int, optional
+            number of distinct solutions to search for. Default is 1.
+        n_jobs : int, optional
+            number of worker processes running the local minimizations. 
+            -1 means all the CPUs. Default is 1 (no worker process).
+        seed : int or numpy.random.Generator, optional
+            seed of the random starting lengths. For a given seed, the 
+            solutions do not depend on n_jobs.
+        cache : bool or ResultCache, optional
+            result cache (see tresonator.cache). Default is the default cache
+            if enabled. False bypasses the cache. Only the optimizations with
+            an integer seed are cached, the other ones being not reproducible.
             
         Returns
         -------
-        L: tuple
-           optimized short lengths (L_DUT, L_CEA)
+        L: array
+           optimized short lengths (L_DUT, L_CEA) if n_solutions is 1, 
+           otherwise array of shape (n_solutions, 2) of the distinct solutions
         """
         
-        L_opt = self._search_short_lengths(bounds)
-        if L_opt is not None:
-            return L_opt
-        else:
+        def compute():
+            with profiling.stage('optimize_short_lengths'):
+                return {'L': np.array(self._search_short_lengths(bounds, n_solutions, n_jobs, seed))}
+        
+        if not isinstance(seed, (int, np.integer)):
+            cache = False
+        inputs = (configuration_inputs(self, exclude=('L_DUT', 'L_CEA')), bounds, n_solutions, seed)
+        L_opt = list(cached(cache, 'optimize_short_lengths', inputs, compute)['L'])
+        if len(L_opt) == 0:
             raise ValueError('No solution found !')
+        elif len(L_opt) < n_solutions:
+            logger.warning('Only %d solution(s) found', len(L_opt))
+        
+        return L_opt[0] if n_solutions == 1 else np.array(L_opt)
 
-    def _search_short_lengths(self, bounds):
+    def _search_short_lengths(self, bounds, n_solutions=1, n_jobs=1, seed=None):
         """
         Optimization routine on T-resonator variable length (CEA and DUT branches)
         """
-    
+        rng = np.random.default_rng(seed)
+        lower = np.array([bounds[0][0], bounds[1][0]])
+        upper = np.array([bounds[0][1], bounds[1][1]])
+        
         # In order to get a correct solution, repeats the minimize call
         # until a physical solution is found        
-        random_lengths = 0 + (0.5 - 0)*np.random.rand(2, self.NB_ITER_MAX)
-               
-        for nb_iter in range(self.NB_ITER_MAX):
-            L0 = random_lengths[:,nb_iter]   
-            res = minimize(self._optim_fun_impedance_matching, L0,
-                           bounds=bounds,
-                           options={'maxiter':self.NB_ITER_MAX})
-            if res.success:
-                if np.isclose(res.x[0], 1e-3) or np.isclose(res.x[1], 1e-3):
-                    pass # length too low ->  Repeat
-                elif np.isclose(res.x[0], 1) or np.isclose(res.x[1], 1):
-                    pass # length too high ->  Repeat
+        random_lengths = lower + (upper - lower)*rng.random((self.NB_ITER_MAX, 2))
+        
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+        executor = ProcessPoolExecutor(n_jobs) if n_jobs > 1 else None
+        
+        model = self.reduced_model()
+        L_opt = []
+        try:
+            # starts are run by batches, so that the search stops early, 
+            # and results are processed in the starts order
+            for start in range(0, self.NB_ITER_MAX, max(n_jobs, 1)):
+                L0s = random_lengths[start:start + max(n_jobs, 1)]
+                if executor:
+                    results = executor.map(self._local_search, L0s, [bounds]*len(L0s))
                 else:
-                    L_opt = res.x
-                    print('Solution found: L={}'.format(L_opt))
-                    break # True good solution found
-        else:
-            print('No solution found !')
-            L_opt = None
+                    results = map(self._local_search, L0s, [bounds]*len(L0s))
+                
+                for nb_iter, res in enumerate(results, start=start):
+                    profiling.count('optimizer_starts')
+                    profiling.count('optimizer_iterations', res.nit)
+                    profiling.count('model_evaluations', res.nfev)
+                    if not res.success:
+                        profiling.count('optimizer_rejections')
+                        logger.debug('Start %d: minimization failed', nb_iter)
+                        continue
+                    # the minimum is polished by Newton iterations, if they converge
+                    L = self._newton_short_lengths(res.x, model, bounds)
+                    L = res.x if L is None else L
+                    if np.any(np.isclose(L, lower)) or np.any(np.isclose(L, upper)):
+                        profiling.count('optimizer_rejections')
+                        logger.debug('Start %d: solution on bounds L=%s', nb_iter, L)
+                    elif 20*np.log10(np.abs(self._matching_S11(L, model))) > self.MATCH_THRESHOLD_DB:
+                        profiling.count('optimizer_rejections')
+                        logger.debug('Start %d: local minimum not matched L=%s', nb_iter, L)
+                    elif any(np.allclose(L, _L, rtol=0, atol=self.SOLUTION_ATOL) for _L in L_opt):
+                        profiling.count('optimizer_rejections')
+                        logger.debug('Start %d: solution already found L=%s', nb_iter, L)
+                    elif len(L_opt) < n_solutions:
+                        L_opt.append(L)
+                        logger.info('Solution found: L=%s', L)
+                        
+                if len(L_opt) >= n_solutions:
+                    break
+            else:
+                logger.info('No solution found !')
+        finally:
+            if executor:
+                executor.shutdown()
+                
         return L_opt
 
+    def _local_search(self, L0, bounds):
+        """
+        Local minimization of |S11| starting from the short lengths L0
+        """
+        from scipy.optimize import minimize
+        return minimize(self._optim_fun_impedance_matching, L0,
+                        args=(self.reduced_model(),), jac=True, bounds=bounds,
+                        options={'maxiter':self.NB_ITER_MAX})
 
-    def _optim_fun_impedance_matching(self, L):
-        _cfg = Configuration(self.f, self.P_in, L_DUT=L[0], L_CEA=L[1], 
-                            additional_losses=self.additional_losses)
-        # Minimize the return loss
-        S11 = np.abs(_cfg.S11())
-        return S11 
+    def _optim_fun_impedance_matching(self, L, model):
+        # Minimize the return loss, evaluated on the reduced model
+        Z_DUT, dZ_DUT_dL, _ = model.branch_impedance_and_grad('DUT', L[0])
+        Z_CEA, dZ_CEA_dL, _ = model.branch_impedance_and_grad('CEA', L[1])
+        Zin = (Z_DUT*Z_CEA)/(Z_DUT + Z_CEA)
+        S11 = (Zin - self.R)/(Zin + self.R)
+        dS11_dZin = 2*self.R/(Zin + self.R)**2
+        dS11 = dS11_dZin*np.array([Z_CEA**2*dZ_DUT_dL, Z_DUT**2*dZ_CEA_dL])/(Z_DUT + Z_CEA)**2
+        
+        S11_abs = np.abs(S11)
+        grad = np.real(np.conj(S11)*dS11)/max(S11_abs, np.finfo(float).tiny)
+        return S11_abs, grad
         
 
+    def solve_short_lengths(self, bounds=[(1e-3,200e-3),(1e-3,200e-3)], 
+                            npoints=201, tol=1e-12, maxiter=50, cache=None):
+        """
+        Find all the short lengths (L_DUT, L_CEA) which match the T-resonator,
+        deterministically.
+        
+        At the T-junction, the two branches are in parallel, so the matching
+        condition Zin = R reads Y_DUT(L_DUT) + Y_CEA(L_CEA) = 1/R, where each 
+        branch admittance only depends on its own short length. The real and
+        imaginary parts of this residual are evaluated on a (npoints x npoints)
+        grid of lengths, the grid cells in which both change sign bracket the 
+        solutions, which are then refined by Newton iterations.
+        
+        Arguments
+        ---------
+        bounds : list of 2-tuples
+            Search bounds for L_DUT and L_CEA
+            [(L_DUT min, L_DUT max), (L_CEA min, L_CEA max)]
+        npoints : int, optional
+            number of lengths per dimension of the bracketing grid. 
+            Default is 201.
+        tol : float, optional
+            tolerance on the normalized residual |R*(Y_DUT + Y_CEA) - 1|
+        maxiter : int, optional
+            maximum number of Newton iterations per solution
+        cache : bool or ResultCache, optional
+            result cache (see tresonator.cache). Default is the default cache
+            if enabled. False bypasses the cache.
+            
+        Returns
+        -------
+        L: array of shape (nb_solutions, 2)
+            short lengths (L_DUT, L_CEA) of each solution, sorted by L_DUT
+        S11: complex array of shape (nb_solutions,)
+            residual S11 of each solution
+        """
+        def compute():
+            with profiling.stage('solve_short_lengths'):
+                L, S11 = self._solve_short_lengths(self.reduced_model(), bounds, npoints, tol, maxiter)
+            return {'L': L, 'S11': S11}
+        
+        inputs = (configuration_inputs(self, exclude=('L_DUT', 'L_CEA')), bounds, npoints, tol, maxiter)
+        results = cached(cache, 'solve_short_lengths', inputs, compute)
+        return results['L'], results['S11']
+    
+    def _solve_short_lengths(self, model, bounds, npoints=201, tol=1e-12, maxiter=50):
+        """
+        Find all the matching short lengths for the reduced model of a frequency.
+        See solve_short_lengths.
+        """
+        (L_DUT_min, L_DUT_max), (L_CEA_min, L_CEA_max) = bounds
+        L_DUTs = np.linspace(L_DUT_min, L_DUT_max, npoints)
+        L_CEAs = np.linspace(L_CEA_min, L_CEA_max, npoints)
+        
+        # residual is separable: R*(Y_DUT + Y_CEA) - 1 = a(L_DUT) + b(L_CEA)
+        a = self.R/model.branch_impedance('DUT', L_DUTs) - 1
+        b = self.R/model.branch_impedance('CEA', L_CEAs)
+        profiling.count('model_evaluations', npoints**2)
+        
+        # cells for which both real and imaginary parts change sign 
+        candidates = np.ones((npoints-1, npoints-1), dtype=bool)
+        for part in (np.real, np.imag):
+            F = part(a)[:, np.newaxis] + part(b)[np.newaxis, :]
+            F_min = np.minimum.reduce([F[:-1,:-1], F[1:,:-1], F[:-1,1:], F[1:,1:]])
+            F_max = np.maximum.reduce([F[:-1,:-1], F[1:,:-1], F[:-1,1:], F[1:,1:]])
+            candidates &= (F_min <= 0) & (F_max >= 0)
+        
+        L = []
+        profiling.count('solver_candidates', int(np.count_nonzero(candidates)))
+        for idx_DUT, idx_CEA in zip(*np.nonzero(candidates)):
+            L0 = ((L_DUTs[idx_DUT] + L_DUTs[idx_DUT+1])/2, 
+                  (L_CEAs[idx_CEA] + L_CEAs[idx_CEA+1])/2)
+            L_sol = self._newton_short_lengths(L0, model, bounds, tol, maxiter)
+            if L_sol is None:
+                continue
+            # remove duplicates found from neighbouring cells
+            if not any(np.allclose(L_sol, _L, rtol=0, atol=1e-9) for _L in L):
+                L.append(L_sol)
+        
+        L = np.array(sorted(L, key=lambda _L: tuple(_L))).reshape(-1, 2)
+        S11 = np.array([self._matching_S11(_L, model) for _L in L], dtype=complex)
+        return L, S11
+
+    def track_short_lengths(self, freqs, bounds=[(1e-3,200e-3),(1e-3,200e-3)],
+                            npoints=201, rescan=10, tol=1e-12, maxiter=50, cache=None):
+        """
+        Follow the matching short lengths (L_DUT, L_CEA) versus frequency.
+        
+        The solutions are found at the first frequency with solve_short_lengths.
+        Each solution branch is then continued from one frequency to the next
+        by Newton iterations, starting from the linear extrapolation of the 
+        previous solutions. Every `rescan` frequencies, a full solve is made 
+        in order to detect new branches.
+        
+        Arguments
+        ---------
+        freqs : array of shape (nfreq,)
+            frequencies [Hz], ordered
+        bounds : list of 2-tuples
+            Search bounds for L_DUT and L_CEA
+            [(L_DUT min, L_DUT max), (L_CEA min, L_CEA max)]
+        npoints : int, optional
+            number of lengths per dimension of the bracketing grid of the 
+            full solves. Default is 201.
+        rescan : int, optional
+            number of frequencies between two full solves. Default is 10.
+        tol : float, optional
+            tolerance on the normalized matching residual
+        maxiter : int, optional
+            maximum number of Newton iterations per solution
+        cache : bool or ResultCache, optional
+            result cache (see tresonator.cache). Default is the default cache
+            if enabled. False bypasses the cache.
+        
+        Returns
+        -------
+        L: array of shape (nfreq, nb_branches, 2)
+            short lengths (L_DUT, L_CEA) of each branch vs frequency. 
+            NaN when the branch does not exist at this frequency.
+        S11: complex array of shape (nfreq, nb_branches)
+            residual S11 of each branch vs frequency (NaN if no solution)
+        events: list of (event, f, branch) tuples
+            'appear': the branch is found (by a full solve) at frequency f
+            'merge': the branch merges with another one at frequency f 
+                     or vanishes (fold) inside the bounds
+            'leave': the branch leaves the bounds at frequency f
+        """
+        def compute():
+            with profiling.stage('track_short_lengths'):
+                L, S11, events = self._track_short_lengths(freqs, bounds, npoints, rescan, tol, maxiter)
+            return {'L': L, 'S11': S11, 'events': np.array(json.dumps(events))}
+        
+        inputs = (configuration_inputs(self, exclude=('f', 'L_DUT', 'L_CEA')), 
+                  np.asarray(freqs), bounds, npoints, rescan, tol, maxiter)
+        results = cached(cache, 'track_short_lengths', inputs, compute)
+        events = [tuple(event) for event in json.loads(str(results['events']))]
+        return results['L'], results['S11'], events
+    
+    def _track_short_lengths(self, freqs, bounds, npoints, rescan, tol, maxiter):
+        freqs = np.asarray(freqs)
+        models = [self.reduced_model(f) for f in freqs]
+        
+        branches = [] # list of the solutions of each branch, (index, L)
+        active = []   # indexes of the branches still followed
+        events = []
+        
+        for idx_f, f in enumerate(freqs):
+            model = models[idx_f]
+            
+            # continuation of the active branches
+            for branch in list(active):
+                history = branches[branch]
+                L_prev = history[-1][1]
+                if len(history) > 1 and history[-2][0] == idx_f - 2:
+                    L_pred = 2*L_prev - history[-2][1] # linear extrapolation
+                else:
+                    L_pred = L_prev
+                L_sol = self._newton_short_lengths(L_pred, model, bounds, tol, maxiter)
+                if L_sol is None and len(history) > 1:
+                    L_sol = self._newton_short_lengths(L_prev, model, bounds, tol, maxiter)
+                
+                if L_sol is None:
+                    active.remove(branch)
+                    outside = np.any(L_pred < [bounds[0][0], bounds[1][0]]) or \
+                              np.any(L_pred > [bounds[0][1], bounds[1][1]])
+                    events.append(('leave' if outside else 'merge', f, branch))
+                elif any(np.allclose(L_sol, branches[other][-1][1], rtol=0, atol=1e-6)
+                         for other in active if other != branch and branches[other][-1][0] == idx_f):
+                    active.remove(branch)
+                    events.append(('merge', f, branch))
+                else:
+                    history.append((idx_f, L_sol))
+            
+            # look for new branches
+            if idx_f % rescan == 0:
+                L_sols, _ = self._solve_short_lengths(model, bounds, npoints, tol, maxiter)
+                for L_sol in L_sols:
+                    if not any(np.allclose(L_sol, branches[branch][-1][1], rtol=0, atol=1e-6)
+                               for branch in active):
+                        branches.append([(idx_f, L_sol)])
+                        active.append(len(branches) - 1)
+                        events.append(('appear', f, len(branches) - 1))
+        
+        L = np.full((len(freqs), len(branches), 2), np.nan)
+        S11 = np.full((len(freqs), len(branches)), np.nan, dtype=complex)
+        for branch, history in enumerate(branches):
+            for idx_f, L_sol in history:
+                L[idx_f, branch] = L_sol
+                S11[idx_f, branch] = self._matching_S11(L_sol, models[idx_f])
+        
+        return L, S11, events
+    
+    def _matching_residual(self, L, model):
+        """
+        Normalized matching residual R*(Y_DUT + Y_CEA) - 1 and its derivatives
+        with respect to L_DUT and L_CEA, from the reduced model of a frequency.
+        """
+        Z_DUT, dZ_DUT_dL, _ = model.branch_impedance_and_grad('DUT', L[0])
+        Z_CEA, dZ_CEA_dL, _ = model.branch_impedance_and_grad('CEA', L[1])
+        F = self.R/Z_DUT + self.R/Z_CEA - 1
+        profiling.count('model_evaluations')
+        dF_dL_DUT = -self.R/Z_DUT**2*dZ_DUT_dL
+        dF_dL_CEA = -self.R/Z_CEA**2*dZ_CEA_dL
+        return F, dF_dL_DUT, dF_dL_CEA
+    
+    def _matching_S11(self, L, model):
+        """
+        S11 of the T-resonator for the short lengths L=(L_DUT, L_CEA).
+        """
+        F, _, _ = self._matching_residual(L, model)
+        # Zin = R/(F+1) --> S11 = (Zin - R)/(Zin + R)
+        return -F/(F + 2)
+        
+    def _newton_short_lengths(self, L0, model, bounds, tol=1e-12, maxiter=50):
+        """
+        Newton iterations on the short lengths, starting from L0, in order 
+        to cancel the matching residual. Returns None if the iterations do not 
+        converge inside the bounds.
+        """
+        L = np.array(L0, dtype=float)
+        for nb_iter in range(maxiter):
+            if np.any(L < [bounds[0][0], bounds[1][0]]) or \
+                np.any(L > [bounds[0][1], bounds[1][1]]):
+                return None
+            profiling.count('newton_iterations')
+            F, dF_dL_DUT, dF_dL_CEA = self._matching_residual(L, model)
+            if np.abs(F) < tol:
+                return L
+            J = np.array([[dF_dL_DUT.real, dF_dL_CEA.real],
+                          [dF_dL_DUT.imag, dF_dL_CEA.imag]])
+            try:
+                L = L - np.linalg.solve(J, [F.real, F.imag])
+            except np.linalg.LinAlgError:
+                return None
+        return None
+
+    def _circuit_media(self, freq):
+        """
+        skrf Coaxial media and lengths of the sections of each branch, from 
+        T to short. The last section of each branch is the variable one. 
+        
+        Returns
+        -------
+        DUT: list of (name, media, length) 
+        CEA: list of (name, media, length)
+        """
+        return self.topology.circuit_media(freq, self.L_DUT, self.L_CEA, self.additional_losses)
+
     def circuit(self, freq=None):
         """
         Returns the circuit object of the corresponding configuration
+        
+        Args
+        ----
+        freq: skrf.Frequency, optional
+            Default is the configuration frequency.
     
         Returns
         -------
-        None.
+        circuit: skrf.circuit.Circuit
     
         """
-        
-        Z_short_DUT = 1e-2 
-        Z_short_CEA = 1e-2
+        import skrf as rf
+        from skrf.circuit import Circuit
         
         if not freq:
             freq = rf.Frequency(self.f, unit='Hz', npoints=1)
         
-        # DUT Branch
-        # NB : CEA: Dout/Dint=219/140 -> 26.82 Ohm 
-        #      SSA13, CCFE Home-made: 219/126 -> 33.14 Ohm
-        #      SSA50: 219/127.92 -> 32.2 Ohm
-        
-        # SSA84
-        # kind Dint[mm] Dout[mm] length[mm] sigma R[Ohm]
-        # Short 127.9 219.0 NaN NaN 0.00345
-        # Line 127.9 219.0 33.1 Copper NaN
-        # Line 168.3 230.0 1100.0 Copper NaN
-        # Line 140.0 230.0 1021.0 Copper NaN
-        # Line 100.0 230.0 100.0 Silver NaN
-        # Line 140.0 230.0 114.0 Silver NaN
-        # Tee 140.0 230.0 NaN Silver NaN
-        # Line 140.0 230.0 728.0 Silver NaN
-        # Line 100.0 230.0 100.0 Silver NaN
-        # Line 140.0 230.0 1512.0 Steel NaN
-        # Line 140.0 219.0 32.4 Steel NaN
-        # Short 140.0 219.0 NaN NaN 0.0068
-        
-        D4_ = Coaxial(frequency=freq, Dint=0.1279, Dout=0.219, epsilon_r=1, sigma=self.additional_losses*conductivity_Cu)
-        D4 = D4_.line(self.L_DUT, unit='m', name='D4')        
-        D3 = Coaxial(frequency=freq, Dint=0.1683, Dout=0.230, epsilon_r=1, sigma=self.additional_losses*conductivity_Cu).line(1100e-3, unit='m', name='D3')
-        D2 = Coaxial(frequency=freq, Dint=0.140,  Dout=0.230, epsilon_r=1, sigma=self.additional_losses*conductivity_Cu).line(1021e-3, unit='m', name='D2')
-        D1 = Coaxial(frequency=freq, Dint=0.100,  Dout=0.230, epsilon_r=1, sigma=self.additional_losses*conductivity_Ag).line(100e-3, unit='m', name='D1')
-        D0 = Coaxial(frequency=freq, Dint=0.140,  Dout=0.230, epsilon_r=1, sigma=self.additional_losses*conductivity_Ag).line(114e-3, unit='m', name='D0')
-        
-        # CEA Branch
-        C0 = Coaxial(frequency=freq, Dint=0.140,  Dout=0.230, epsilon_r=1, sigma=self.additional_losses*conductivity_Ag).line(728e-3, unit='m', name='C0') # coude
-        C1 = Coaxial(frequency=freq, Dint=0.100, Dout=0.230, epsilon_r=1, sigma=self.additional_losses*conductivity_Ag).line(100e-3, unit='m', name='C1')
-        C2 = Coaxial(frequency=freq, Dint=0.140, Dout=0.230, epsilon_r=1, sigma=self.additional_losses*conductivity_SS).line(1512e-3, unit='m', name='C2')
-        C3_ = Coaxial(frequency=freq, Dint=0.140, Dout=0.219, epsilon_r=1, sigma=self.additional_losses*conductivity_Cu)
-        C3 = C3_.line(self.L_CEA, unit='m', name='C3')
-        
-        port1 = rf.Circuit.Port(frequency=freq, z0=self.R, name='port1')
-        resistor_dut = D4_.resistor(self.Z_short_DUT, name='short_dut')
-        resistor_cea = C3_.resistor(self.Z_short_CEA, name='short_cea')
-        gnd_dut = rf.Circuit.Ground(frequency=freq, z0=D4_.z0[0], name='gnd_dut')
-        gnd_cea = rf.Circuit.Ground(frequency=freq, z0=C3_.z0[0], name='gnd_cea')
-        
-        cnx = [
-            # T-junction
-            [(port1, 0), (D0, 0), (C0, 0)],
-            # DUT Branch
-            [(D0, 1), (D1, 0)],
-            [(D1, 1), (D2, 0)],
-            [(D2, 1), (D3, 0)],
-            [(D3, 1), (D4, 0)],
-            [(D4, 1), (resistor_dut, 0)],
-            [(resistor_dut, 1), (gnd_dut, 0)],
-            # CEA branch
-            [(C0, 1), (C1, 0)],
-            [(C1, 1), (C2, 0)],
-            [(C2, 1), (C3, 0)],
-            [(C3, 1), (resistor_cea, 0)],
-            [(resistor_cea, 1), (gnd_cea, 0)],
-        ]
-        circuit = rf.Circuit(cnx)
-        
-        return circuit
\ No newline at end of file
+        port1 = Circuit.Port(frequency=freq, z0=self.R, name='port1')
+        # T-junction
+        cnx = [[(port1, 0)]]
+        for branch, sections in zip(('DUT', 'CEA'), self._circuit_media(freq)):
+            lines = [media.line(L, unit='m', name=name) for name, media, L in sections]
+            media_short = sections[-1][1]
+            resistor = media_short.resistor(getattr(self, 'Z_short_'+branch), 
+                                            name='short_'+branch.lower())
+            gnd = Circuit.Ground(frequency=freq, z0=media_short.z0[0], name='gnd_'+branch.lower())
+            cnx[0].append((lines[0], 0))
+            # branch from T to short
+            for line, next_line in zip(lines[:-1], lines[1:]):
+                cnx.append([(line, 1), (next_line, 0)])
+            cnx.append([(lines[-1], 1), (resistor, 0)])
+            cnx.append([(resistor, 1), (gnd, 0)])
+        with profiling.stage('circuit'):
+            circuit = Circuit(cnx)
+        
+        return circuit
+
+    def circuit_template(self, freq=None):
+        """
+        Returns a reusable circuit template of the configuration, in which 
+        the skrf media and the fixed sections are built once for the 
+        frequency grid. See CircuitTemplate.
+        
+        Args
+        ----
+        freq: skrf.Frequency, optional
+            Default is the configuration frequency.
+        
+        Returns
+        -------
+        template: CircuitTemplate
+        """
+        from . circuit_template import CircuitTemplate
+        return CircuitTemplate(self, freq)
@@ -2,9 +2,15 @@
 """
 Usefull constants
 """
-from scipy.constants import c, mu_0, epsilon_0, pi
 import numpy as np
 
+# Physical constants (CODATA 2022, as in scipy.constants).
+# Defined here in order not to import scipy with the package.
+pi = np.pi
+c = 299792458.0 # speed of light in vacuum [m/s]
+mu_0 = 1.25663706127e-06 # vacuum permeability [N/A^2]
+epsilon_0 = 8.8541878188e-12 # vacuum permittivity [F/m]
+
 # Vacuum impedance
 Z0 = np.sqrt(mu_0/epsilon_0)
 
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Fit of the T-resonator transmission line model to measurements
+"""
+import time
+import numpy as np
+from . configuration import Configuration
+from . cache import cached, configuration_inputs
+from . import profiling
+
+# Default search bounds of the fitted parameters
+DEFAULT_BOUNDS = {'L_DUT': (1e-3, 200e-3),
+                  'L_CEA': (1e-3, 200e-3),
+                  'Z_short_DUT': (1e-4, 1),
+                  'Z_short_CEA': (1e-4, 1),
+                  'additional_losses': (0.1, 5)}
+
+# Attributes of the least_squares result which are cached
+_CACHED_ATTRIBUTES = ('x', 'cost', 'fun', 'jac', 'grad', 'optimality', 'active_mask',
+                      'nfev', 'njev', 'status', 'message', 'success', 'covariance', 'elapsed')
+
+# Default initial values of the configuration parameters
+DEFAULT_X0 = {'L_DUT': 0.035,
+              'L_CEA': 0.035,
+              'Z_short_DUT': 1e-2,
+              'Z_short_CEA': 1e-2,
+              'additional_losses': 1.0}
+
+
+def fit_measurement(freqs, s11, params=Configuration.GRAD_PARAMS, x0=None,
+                    bounds=None, residual='dB', topology=None, cache=None, **kwargs):
+    """
+    Fit the T-resonator model to a measured S11 trace.
+
+    The model is evaluated for all the frequencies at once and the Jacobian
+    of the residuals is calculated analytically (see Configuration.S11_and_grad).
+    The least-squares problem is solved with scipy.optimize.least_squares.
+
+    Args
+    ----
+    freqs: array of shape (nfreq,)
+        measurement frequencies [Hz]
+    s11: complex array of shape (nfreq,)
+        measured S11
+    params: tuple of str, optional
+        fitted parameters, among 'L_DUT', 'L_CEA', 'Z_short_DUT',
+        'Z_short_CEA' and 'additional_losses'. Default is all of them.
+    x0: dict, optional
+        initial values of the configuration parameters. The parameters which
+        are not fitted are kept to these values. Default values are DEFAULT_X0.
+    bounds: dict, optional
+        (min, max) bounds of the fitted parameters.
+        Default values are DEFAULT_BOUNDS.
+    residual: 'complex' or 'dB', optional
+        'complex' fits the real and imaginary parts of S11,
+        'dB' fits the magnitude of S11 in dB. Default is 'dB'.
+    topology: Topology or str, optional
+        resonator topology (see Configuration). Default is the SSA50 one.
+    cache: bool or ResultCache, optional
+        result cache (see tresonator.cache). Default is the default cache
+        if enabled. False bypasses the cache.
+    **kwargs:
+        passed to scipy.optimize.least_squares
+
+    Returns
+    -------
+    res: scipy.optimize.OptimizeResult
+        least_squares result, with the additional attributes:
+        params: dict of the fitted parameters values
+        covariance: array of shape (len(params), len(params)),
+                    estimated covariance of the fitted parameters
+        stderr: dict of the standard errors of the fitted parameters
+        elapsed: fit duration [s]
+    """
+    from scipy.optimize import OptimizeResult
+    
+    if residual not in ('complex', 'dB'):
+        raise ValueError('residual must be "complex" or "dB"')
+    freqs = np.asarray(freqs)
+    s11 = np.asarray(s11)
+    values = dict(DEFAULT_X0, **(x0 or {}))
+    _bounds = dict(DEFAULT_BOUNDS, **(bounds or {}))
+    params = tuple(params)
+    
+    # initial configuration, which also loads the topology once
+    cfg = Configuration(freqs, 1, topology=topology, **values)
+    inputs = (configuration_inputs(cfg), s11, params, 
+              [_bounds[param] for param in params], residual, kwargs)
+    
+    def compute():
+        res = _fit_measurement(freqs, s11, params, values, _bounds, residual, cfg.topology, **kwargs)
+        return {name: getattr(res, name) for name in _CACHED_ATTRIBUTES if getattr(res, name, None) is not None}
+    
+    results = cached(cache, 'fit_measurement', inputs, compute)
+    res = OptimizeResult({name: np.asarray(value)[()] if np.ndim(value) == 0 else value 
+                          for name, value in results.items()})
+    res.message = str(res.message)
+    res.params = dict(zip(params, res.x))
+    res.stderr = dict(zip(params, np.sqrt(np.diag(res.covariance))))
+    return res
+
+
+def _fit_measurement(freqs, s11, params, values, _bounds, residual, topology, **kwargs):
+    """
+    Least-squares fit of the model, see fit_measurement
+    """
+    from scipy.optimize import least_squares
+    
+    values = dict(values)
+    last = {}
+    def model(x):
+        # S11 and its Jacobian are computed together and reused by jac
+        if last.get('x') is None or np.any(last['x'] != x):
+            values.update(zip(params, x))
+            cfg = Configuration(freqs, 1, topology=topology, **values)
+            last['x'] = np.copy(x)
+            last['S11'], last['dS11'] = cfg.S11_and_grad(params)
+        return last['S11'], last['dS11']
+
+    def fun(x):
+        S11, dS11 = model(x)
+        if residual == 'complex':
+            return np.concatenate([np.real(S11 - s11), np.imag(S11 - s11)])
+        else:
+            return 20*np.log10(np.abs(S11)) - 20*np.log10(np.abs(s11))
+
+    def jac(x):
+        S11, dS11 = model(x)
+        if residual == 'complex':
+            return np.concatenate([np.real(dS11), np.imag(dS11)], axis=1).T
+        else:
+            return (20/np.log(10)*np.real(np.conj(S11)*dS11)/np.abs(S11)**2).T
+
+    x_start = np.array([values[param] for param in params], dtype=float)
+    lower = [_bounds[param][0] for param in params]
+    upper = [_bounds[param][1] for param in params]
+    kwargs.setdefault('x_scale', 'jac')
+
+    t0 = time.perf_counter()
+    with profiling.stage('fit_measurement'):
+        res = least_squares(fun, x_start, jac=jac, bounds=(lower, upper), **kwargs)
+    res.elapsed = time.perf_counter() - t0
+    profiling.count('fit_iterations', res.nfev)
+
+    # parameters covariance from the Jacobian at the solution
+    # (as in scipy.optimize.curve_fit)
+    _, s, VT = np.linalg.svd(res.jac, full_matrices=False)
+    threshold = np.finfo(float).eps*max(res.jac.shape)*s[0]
+    s = s[s > threshold]
+    VT = VT[:s.size]
+    dof = max(res.fun.size - res.x.size, 1)
+    res.covariance = np.dot(VT.T/s**2, VT)*2*res.cost/dof
+    return res
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming evaluation of large (frequency x L_DUT x L_CEA x additional losses) grids
+
+Usage:
+
+    cfg = tresonator.Configuration(62.64e6, 20e3, L_DUT=0.035, L_CEA=0.027)
+    S11 = tresonator.gridscan.run(cfg, freqs, L_DUTs, L_CEAs, [0.8, 1, 1.5],
+                                  filename='scan.npy', n_jobs=4)
+
+The S11 grid, of shape (nfreq, nDUT, nCEA, nloss), is split into chunks of
+consecutive (frequency, L_DUT) rows of at most chunk_elements values. Each
+chunk is evaluated at once on reduced models, possibly in worker processes,
+and written to a memory-mapped .npy file, so that the memory used does not
+depend on the grid size. The completed chunks are recorded in a progress
+file next to the output file: an interrupted scan is resumed by running it
+again with the same arguments.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from . reduced_model import ReducedModel
+from . cache import hash_inputs, configuration_inputs
+from . import profiling
+
+# Default maximum number of grid values evaluated at once
+CHUNK_ELEMENTS = 2**20
+
+
+def _evaluate_rows(cfg, freqs, L_DUT, L_CEA, additional_losses, idx_f, idx_DUT, dtype=complex):
+    """
+    S11 of the grid rows (freqs[idx_f], L_DUT[idx_DUT]), for all the L_CEA
+    and additional losses.
+
+    Returns
+    -------
+    S11: array of shape (nrows, nCEA, nloss)
+    """
+    # the CEA branch only depends on the frequency
+    idx_f_unique, inverse = np.unique(idx_f, return_inverse=True)
+    S11 = np.empty((len(idx_f), len(L_CEA), len(additional_losses)), dtype=dtype)
+    for idx_loss, additional_loss in enumerate(additional_losses):
+        model = ReducedModel(cfg, freqs[idx_f][:, np.newaxis], additional_loss)
+        Z_DUT = model.branch_impedance('DUT', L_DUT[idx_DUT][:, np.newaxis])
+        model = ReducedModel(cfg, freqs[idx_f_unique][:, np.newaxis], additional_loss)
+        Z_CEA = model.branch_impedance('CEA', L_CEA[np.newaxis, :])[inverse]
+        # At T-junction. Impedance are associated in parallel.
+        Zin = (Z_DUT*Z_CEA)/(Z_DUT + Z_CEA)
+        S11[..., idx_loss] = (Zin - cfg.R)/(Zin + cfg.R)
+    return S11
+
+
+def _scan_key(cfg, freqs, L_DUT, L_CEA, additional_losses, rows_per_chunk, dtype):
+    """
+    Key of a scan, from the configuration parameters, the grid and the chunks.
+    """
+    inputs = configuration_inputs(cfg, exclude=('f', 'L_DUT', 'L_CEA', 'additional_losses'))
+    return hash_inputs(inputs, freqs, L_DUT, L_CEA, additional_losses,
+                       rows_per_chunk, np.dtype(dtype).str)
+
+
+class _Progress(object):
+    """
+    Completed chunks of a scan, recorded in a JSON file.
+    """
+    def __init__(self, filename, key, nchunks, resume=True):
+        self.filename = filename
+        self.key = key
+        self.nchunks = nchunks
+        self.done = set()
+        if resume and os.path.exists(filename):
+            with open(filename) as fid:
+                progress = json.load(fid)
+            if progress['key'] != key:
+                raise ValueError('{} is the progress of a different scan, use resume=False to restart it'.format(filename))
+            self.done = set(progress['done'])
+
+    def mark(self, chunk):
+        self.done.add(chunk)
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as fid:
+            json.dump({'key': self.key, 'nchunks': self.nchunks, 'done': sorted(self.done)}, fid)
+        os.replace(tmp_filename, self.filename)
+
+
+def iterate(cfg, freqs, L_DUT, L_CEA, additional_losses=None, filename=None,
+            chunk_elements=None, n_jobs=1, resume=True, dtype=complex):
+    """
+    Evaluate the S11 of the T-resonator on a (frequency x L_DUT x L_CEA x
+    additional losses) grid, by chunks, and yield the chunks as they finish.
+
+    Args
+    ----
+    cfg: Configuration
+        configuration (geometry, short impedances and feeder impedance)
+    freqs: array of shape (nfreq,)
+        frequencies [Hz]
+    L_DUT: array of shape (nDUT,)
+        short lengths at DUT side branch [m]
+    L_CEA: array of shape (nCEA,)
+        short lengths at CEA side branch [m]
+    additional_losses: array of shape (nloss,), optional
+        additional losses factors. Default is the configuration one.
+    filename: str, optional
+        output .npy file, memory-mapped, of shape (nfreq, nDUT, nCEA, nloss).
+        Default is None: chunks are only yielded.
+    chunk_elements: int, optional
+        maximum number of grid values of a chunk. Default is CHUNK_ELEMENTS.
+        A chunk contains at least one (frequency, L_DUT) row.
+    n_jobs: int, optional
+        number of worker processes. -1 uses all the processors. Default is 1.
+    resume: bool, optional
+        skip the chunks already written to filename by a previous run of
+        the same scan. Default is True.
+    dtype: complex dtype, optional
+        dtype of S11, complex64 halves the output size. Default is complex.
+
+    Yields
+    ------
+    idx_f, idx_DUT: int arrays of shape (nrows,)
+        frequency and L_DUT indexes of the rows of the chunk
+    S11: complex array of shape (nrows, nCEA, nloss)
+    """
+    freqs = np.atleast_1d(np.asarray(freqs, dtype=float))
+    L_DUT = np.atleast_1d(np.asarray(L_DUT, dtype=float))
+    L_CEA = np.atleast_1d(np.asarray(L_CEA, dtype=float))
+    additional_losses = np.atleast_1d(np.asarray(cfg.additional_losses if additional_losses is None
+                                                 else additional_losses, dtype=float))
+    shape = (len(freqs), len(L_DUT), len(L_CEA), len(additional_losses))
+    row_elements = shape[2]*shape[3]
+    rows_per_chunk = max(1, (chunk_elements or CHUNK_ELEMENTS)//row_elements)
+    nrows = shape[0]*shape[1]
+    chunks = list(range(0, nrows, rows_per_chunk))
+
+    output, progress = None, None
+    if filename is not None:
+        key = _scan_key(cfg, freqs, L_DUT, L_CEA, additional_losses, rows_per_chunk, dtype)
+        progress = _Progress(filename + '.progress.json', key, len(chunks), resume)
+        mode = 'r+' if progress.done and os.path.exists(filename) else 'w+'
+        if mode == 'w+':
+            progress.done = set()
+        output = np.lib.format.open_memmap(filename, mode=mode, dtype=dtype, shape=shape)
+        chunks = [chunk for chunk in chunks if chunk not in progress.done]
+
+    def rows(start):
+        idx = np.arange(start, min(start + rows_per_chunk, nrows))
+        return idx//shape[1], idx % shape[1]
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    executor = ProcessPoolExecutor(n_jobs) if n_jobs > 1 else None
+    try:
+        with profiling.stage('gridscan'):
+            if executor is None:
+                results = ((start, _evaluate_rows(cfg, freqs, L_DUT, L_CEA, additional_losses,
+                                                  *rows(start), dtype=dtype)) for start in chunks)
+            else:
+                results = _parallel_results(executor, n_jobs, chunks, rows, cfg, freqs, L_DUT,
+                                            L_CEA, additional_losses, dtype)
+            for start, S11 in results:
+                profiling.count('model_evaluations', S11.size)
+                idx_f, idx_DUT = rows(start)
+                if output is not None:
+                    output.reshape((nrows,) + shape[2:])[start:start + len(idx_f)] = S11
+                    output.flush()
+                    progress.mark(start)
+                yield idx_f, idx_DUT, S11
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if output is not None:
+            output.flush()
+            del output
+
+
+def _parallel_results(executor, n_jobs, chunks, rows, cfg, freqs, L_DUT, L_CEA, additional_losses, dtype):
+    """
+    Evaluate the chunks in worker processes, with at most 2*n_jobs chunks
+    pending, and yield (start, S11) as they finish.
+    """
+    chunks = iter(chunks)
+    pending = {}
+    while True:
+        for start in chunks:
+            future = executor.submit(_evaluate_rows, cfg, freqs, L_DUT, L_CEA, additional_losses,
+                                     *rows(start), dtype=dtype)
+            pending[future] = start
+            if len(pending) >= 2*n_jobs:
+                break
+        if not pending:
+            return
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            yield pending.pop(future), future.result()
+
+
+def run(cfg, freqs, L_DUT, L_CEA, additional_losses=None, filename=None,
+        chunk_elements=None, n_jobs=1, resume=True, dtype=complex):
+    """
+    Evaluate the S11 of the T-resonator on a (frequency x L_DUT x L_CEA x
+    additional losses) grid. See iterate() for the arguments.
+
+    Returns
+    -------
+    S11: complex array of shape (nfreq, nDUT, nCEA, nloss), memory-mapped
+        read-only from filename if given.
+    """
+    if filename is None:
+        shape = [np.size(values) for values in (freqs, L_DUT, L_CEA)] + \
+                [np.size(cfg.additional_losses if additional_losses is None else additional_losses)]
+        S11 = np.empty(shape, dtype=dtype)
+    for idx_f, idx_DUT, S11_chunk in iterate(cfg, freqs, L_DUT, L_CEA, additional_losses, filename,
+                                             chunk_elements, n_jobs, resume, dtype):
+        if filename is None:
+            S11[idx_f, idx_DUT] = S11_chunk
+    if filename is not None:
+        S11 = np.load(filename, mmap_mode='r')
+    return S11
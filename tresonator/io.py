@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Measurement files loaders (Rohde & Schwarz ASCII and Touchstone files)
+"""
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+# Name of the cache directory, created next to the measurement files
+CACHE_DIRNAME = '.tresonator_cache'
+
+# Number of hexadecimal digits of the cache keys
+_CACHE_KEY_LENGTH = 16
+
+# Frequency unit multipliers of the Touchstone option line
+_FREQ_UNITS = {'HZ': 1, 'KHZ': 1e3, 'MHZ': 1e6, 'GHZ': 1e9}
+
+
+def _to_complex(x, y, data_format):
+    """
+    Convert a pair of columns into complex values, for the RI (real, imaginary),
+    MA (magnitude, angle in degree) or DB (dB, angle in degree) formats.
+    """
+    data_format = data_format.upper()
+    if data_format == 'RI':
+        return x + 1j*y
+    elif data_format == 'MA':
+        return x*np.exp(1j*np.deg2rad(y))
+    elif data_format == 'DB':
+        return 10**(x/20)*np.exp(1j*np.deg2rad(y))
+    else:
+        raise ValueError('Unknown data format: {}'.format(data_format))
+
+
+def read_asc(filename):
+    """
+    Read a Rohde & Schwarz (ZVRE) ASCII trace file.
+
+    The header is made of lines of keys followed by lines of values, separated
+    by ';'. The data block starts after the line of columns names ('freq; ...').
+
+    Args
+    ----
+    filename: str
+        path of the .ASC file
+
+    Returns
+    -------
+    f: array of shape (nfreq,)
+        frequencies [Hz]
+    s: complex array of shape (nfreq, 1, 1)
+        measured parameter
+    z0: float
+        reference impedance [Ohm]
+    header: dict
+        header keys and values (start, stop, number of points, parameter, etc)
+    """
+    with open(filename) as fid:
+        lines = fid.readlines()
+
+    header = {}
+    keys = None
+    for idx, line in enumerate(lines):
+        fields = [field.strip() for field in line.split(';')]
+        if len(fields) < 2:
+            keys = None
+            continue
+        if fields[0].lower() == 'freq':
+            data_start = idx + 1
+            break
+        if keys is None:
+            keys = fields
+        else:
+            header.update(zip(keys, fields))
+            keys = None
+    else:
+        raise ValueError('No data found in {}'.format(filename))
+
+    data = np.loadtxt(lines[data_start:], delimiter=';', ndmin=2)
+    f = data[:, 0]
+    s = _to_complex(data[:, 1], data[:, 2], header.get('data-format', 'RI'))
+    z0 = float(header.get('impedance-ohm', 50))
+
+    if 'nof-points' in header and int(header['nof-points']) != len(f):
+        raise ValueError('Inconsistent number of points in {}'.format(filename))
+
+    return f, s.reshape(-1, 1, 1), z0, header
+
+
+def read_touchstone(filename):
+    """
+    Read a Touchstone (v1) .sNp file.
+
+    Args
+    ----
+    filename: str
+        path of the .sNp file
+
+    Returns
+    -------
+    f: array of shape (nfreq,)
+        frequencies [Hz]
+    s: complex array of shape (nfreq, nports, nports)
+        S-parameters
+    z0: float
+        reference impedance [Ohm]
+    """
+    nports = int(os.path.splitext(filename)[1][2:-1])
+    # default options
+    unit, parameter, data_format, z0 = 'GHZ', 'S', 'MA', 50.
+
+    values = []
+    with open(filename) as fid:
+        for line in fid:
+            line = line.split('!')[0].strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                options = line[1:].upper().split()
+                for idx, option in enumerate(options):
+                    if option in _FREQ_UNITS:
+                        unit = option
+                    elif option in ('RI', 'MA', 'DB'):
+                        data_format = option
+                    elif option == 'R':
+                        z0 = float(options[idx+1])
+                    elif option in ('S', 'Y', 'Z', 'G', 'H'):
+                        parameter = option
+                continue
+            values.append(line)
+
+    if parameter != 'S':
+        raise ValueError('Only S-parameters are supported, got {}'.format(parameter))
+
+    data = np.array(' '.join(values).split(), dtype=float)
+    data = data.reshape(-1, 1 + 2*nports**2)
+    f = data[:, 0]*_FREQ_UNITS[unit]
+    s = _to_complex(data[:, 1::2], data[:, 2::2], data_format)
+    s = s.reshape(-1, nports, nports)
+    if nports == 2:
+        # 2-port files are ordered S11, S21, S12, S22
+        s = s.transpose(0, 2, 1)
+
+    return f, s, z0
+
+
+def _cache_key(filename):
+    """
+    Key of a measurement file, from its path, size and modification time.
+    """
+    stat = os.stat(filename)
+    key = '{}:{}:{}'.format(os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+    return hashlib.sha1(key.encode()).hexdigest()[:_CACHE_KEY_LENGTH]
+
+
+def load(filename, cache=True, cache_dir=None):
+    """
+    Load a measurement file (.ASC or Touchstone .sNp) into NumPy arrays.
+
+    Parsed data are stored in a binary sidecar cache (.npy), which is
+    memory-mapped when the same file is loaded again. The cache entry is
+    keyed by the file path, size and modification time, so modified files
+    are parsed again. When the cache directory cannot be written (eg. a
+    read-only data directory), the file is loaded without the cache.
+
+    Args
+    ----
+    filename: str
+        path of the measurement file
+    cache: bool, optional
+        use the binary cache. Default is True.
+    cache_dir: str, optional
+        cache directory. Default is a '.tresonator_cache' directory
+        next to the measurement file.
+
+    Returns
+    -------
+    f: array of shape (nfreq,)
+        frequencies [Hz]
+    s: complex array of shape (nfreq, nports, nports)
+        S-parameters
+    z0: float
+        reference impedance [Ohm]
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.asc':
+        reader = lambda filename: read_asc(filename)[:3]
+    elif ext.startswith('.s') and ext.endswith('p'):
+        reader = read_touchstone
+    else:
+        raise ValueError('Unknown file type: {}'.format(filename))
+
+    if not cache:
+        return reader(filename)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_DIRNAME)
+    basename = os.path.basename(filename)
+    cache_file = os.path.join(cache_dir, '{}.{}'.format(basename, _cache_key(filename)))
+
+    if os.path.exists(cache_file + '.npy') and os.path.exists(cache_file + '.json'):
+        with open(cache_file + '.json') as fid:
+            meta = json.load(fid)
+        data = np.load(cache_file + '.npy', mmap_mode='r')
+        nports = meta['nports']
+        return data[:, 0].real, data[:, 1:].reshape(-1, nports, nports), meta['z0']
+
+    f, s, z0 = reader(filename)
+
+    # entries of this file only, not of the files whose name starts with its name
+    entry_pattern = re.compile(r'{}\.[0-9a-f]{{{}}}\.(npy|json)$'.format(re.escape(basename),
+                                                                      _CACHE_KEY_LENGTH))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # remove the outdated entries of this file
+        for entry in os.listdir(cache_dir):
+            if entry_pattern.match(entry):
+                os.remove(os.path.join(cache_dir, entry))
+        # frequencies are stored as the first column of the S-parameters
+        data = np.concatenate([f[:, np.newaxis], s.reshape(len(f), -1)], axis=1)
+        np.save(cache_file + '.npy', data)
+        with open(cache_file + '.json', 'w') as fid:
+            json.dump({'filename': os.path.abspath(filename), 'nports': s.shape[1], 'z0': z0}, fid)
+    except OSError:
+        pass
+
+    return f, s, z0
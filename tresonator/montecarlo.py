@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo tolerance analysis of the T-resonator
+
+Usage:
+
+    cfg = tresonator.Configuration(62.64e6, 20e3, L_DUT=0.035, L_CEA=0.027)
+    res = tresonator.montecarlo.run(cfg, freqs,
+                                    {'L_DUT': montecarlo.Normal(0.5e-3),
+                                     'D3.Dint': montecarlo.Normal(0.01, relative=True),
+                                     'C2.sigma': montecarlo.Uniform(0.2, relative=True),
+                                     'Z_short_DUT': montecarlo.Uniform((5e-3, 2e-2))},
+                                    n_samples=100000)
+
+The parameters names are those of Configuration.parameters(). The samples
+are evaluated for all the frequencies at once, by chunks of samples.
+"""
+import numpy as np
+from . coaxial import characteristic_impedance, propagation_constant
+from . transmission_line_utils import ZL_2_Zin, abcd_matrix
+from . import profiling
+
+# Default maximum number of (sample, frequency) points evaluated at once
+CHUNK_ELEMENTS = 2**18
+
+
+class Normal(object):
+    """
+    Normal distribution centered on the nominal value.
+
+    Args
+    ----
+    std: float
+        standard deviation
+    relative: bool, optional
+        if True, std is relative to the nominal value. Default is False.
+    """
+    def __init__(self, std, relative=False):
+        self.std = std
+        self.relative = relative
+
+    def __repr__(self):
+        return 'Normal(std={}, relative={})'.format(self.std, self.relative)
+
+    def sample(self, nominal, size, rng):
+        std = self.std*nominal if self.relative else self.std
+        return nominal + std*rng.standard_normal(size)
+
+
+class Uniform(object):
+    """
+    Uniform distribution.
+
+    Args
+    ----
+    width: float or (low, high) tuple
+        half-width of the distribution around the nominal value,
+        or bounds of the distribution
+    relative: bool, optional
+        if True, the half-width is relative to the nominal value.
+        Default is False.
+    """
+    def __init__(self, width, relative=False):
+        self.width = width
+        self.relative = relative
+
+    def __repr__(self):
+        return 'Uniform(width={}, relative={})'.format(self.width, self.relative)
+
+    def sample(self, nominal, size, rng):
+        if np.ndim(self.width):
+            low, high = self.width
+        else:
+            half_width = self.width*nominal if self.relative else self.width
+            low, high = nominal - half_width, nominal + half_width
+        return rng.uniform(low, high, size)
+
+
+class Choice(object):
+    """
+    Discrete distribution, for instance between materials conductivities.
+
+    Args
+    ----
+    values: list of float
+    p: list of float, optional
+        probabilities of the values. Default is equiprobable.
+    """
+    def __init__(self, values, p=None):
+        self.values = values
+        self.p = p
+
+    def __repr__(self):
+        return 'Choice(values={}, p={})'.format(self.values, self.p)
+
+    def sample(self, nominal, size, rng):
+        return rng.choice(self.values, size, p=self.p)
+
+
+def _branch_impedance(cfg, params, TL_indexes, var_name, Z_short, f):
+    """
+    Input impedance at T of a branch, for samples of the parameters
+    (arrays of shape (nsamples, 1)) and frequencies (array of shape (nfreq,)).
+    
+    Consecutive sections without sampled parameters are collapsed into a 
+    single ABCD chain matrix, evaluated for the frequencies only.
+    """
+    Z = Z_short
+    ABCD = None # chain matrix of the current group of fixed sections
+    for idx, TL_index in enumerate(TL_indexes):
+        name = cfg.SECTION_NAMES[TL_index]
+        names = [var_name if idx == 0 else name+'.L', 
+                 name+'.Dint', name+'.Dout', name+'.sigma', 'additional_losses']
+        L, Dint, Dout, sigma, additional_losses = [params[_name] for _name in names]
+        eps_r = cfg.TLs[TL_index].eps_r
+        Zc = characteristic_impedance(Dint, Dout, eps_r)
+        gamma = propagation_constant(f, Dint, Dout, eps_r, sigma, additional_losses)
+        if all(np.ndim(params[_name]) == 0 for _name in names):
+            _ABCD = abcd_matrix(L, Zc, gamma)
+            ABCD = _ABCD if ABCD is None else np.einsum('ij...,jk...->ik...', _ABCD, ABCD)
+        else:
+            if ABCD is not None:
+                Z = _bilinear(ABCD, Z)
+                ABCD = None
+            Z = ZL_2_Zin(L, Zc, gamma, Z)
+    if ABCD is not None:
+        Z = _bilinear(ABCD, Z)
+    return Z
+
+
+def _bilinear(ABCD, Z):
+    """
+    Input impedance of a chain matrix terminated by the impedance Z
+    """
+    (A, B), (C, D) = ABCD
+    return (A*Z + B)/(C*Z + D)
+
+
+def input_impedance(cfg, params, f):
+    """
+    Input impedance of the T-resonator for samples of the model parameters.
+
+    Args
+    ----
+    cfg: Configuration
+        nominal configuration
+    params: dict of name: value
+        parameters of the model (see Configuration.parameters()). Values are
+        floats or arrays of shape (nsamples, 1).
+    f: array of shape (nfreq,)
+        frequencies [Hz]
+
+    Returns
+    -------
+    Zin: complex array of shape (nsamples, nfreq)
+    """
+    Z_DUT = _branch_impedance(cfg, params, cfg._DUT_SECTIONS, 'L_DUT', params['Z_short_DUT'], f)
+    Z_CEA = _branch_impedance(cfg, params, cfg._CEA_SECTIONS, 'L_CEA', params['Z_short_CEA'], f)
+    # At T-junction. Impedance are associated in parallel.
+    Zin = (Z_DUT*Z_CEA)/(Z_DUT + Z_CEA)
+    profiling.count('model_evaluations', np.size(Zin))
+    return Zin
+
+
+def _check_samples(samples, nominal):
+    """
+    Raise a ValueError if samples describe non-physical lines.
+    """
+    for name, values in samples.items():
+        if np.any(values <= 0):
+            raise ValueError('{} non-physical samples (<= 0) of {}'.format(
+                              np.count_nonzero(values <= 0), name))
+    for name in samples:
+        if name.endswith('.Dint') or name.endswith('.Dout'):
+            section = name.split('.')[0]
+            Dint = samples.get(section+'.Dint', nominal[section+'.Dint'])
+            Dout = samples.get(section+'.Dout', nominal[section+'.Dout'])
+            if np.any(Dint >= Dout):
+                raise ValueError('{} non-physical samples (Dint >= Dout) of {}'.format(
+                                  np.count_nonzero(Dint >= Dout), section))
+
+
+def _match_frequency(f, S11_abs):
+    """
+    Index of the minimum of |S11| of each sample and frequency of the minimum,
+    refined by a parabolic interpolation of |S11|**2 on the neighbouring points.
+    """
+    idx = np.argmin(S11_abs, axis=1)
+    f_match = f[idx]
+    if len(f) < 3:
+        return idx, f_match
+    rows = np.arange(len(idx))
+    _idx = np.clip(idx, 1, len(f) - 2)
+    x0, x1, x2 = f[_idx-1], f[_idx], f[_idx+1]
+    y0, y1, y2 = [S11_abs[rows, _idx+d]**2 for d in (-1, 0, 1)]
+    num = (x1 - x0)**2*(y1 - y2) - (x1 - x2)**2*(y1 - y0)
+    den = (x1 - x0)*(y1 - y2) - (x1 - x2)*(y1 - y0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_vertex = x1 - 0.5*num/den
+    # minima at the edges of the frequency grid are not refined
+    valid = (idx == _idx) & (den != 0) & (f_vertex >= x0) & (f_vertex <= x2)
+    return idx, np.where(valid, f_vertex, f_match)
+
+
+def run(cfg, freqs, distributions, n_samples=1000, chunk_size=None, seed=None):
+    """
+    Monte Carlo analysis of the match of the T-resonator.
+
+    Args
+    ----
+    cfg: Configuration
+        nominal configuration
+    freqs: array of shape (nfreq,)
+        frequencies [Hz], increasing
+    distributions: dict of name: distribution
+        distributions of the varying parameters (Normal, Uniform, Choice or
+        any object with a sample(nominal, size, rng) method). The other
+        parameters are kept to their nominal values.
+    n_samples: int, optional
+        number of samples. Default is 1000.
+    chunk_size: int, optional
+        number of samples evaluated at once. Default is such that
+        chunk_size*nfreq <= CHUNK_ELEMENTS.
+    seed: int or numpy.random.Generator, optional
+        seed of the random number generator
+
+    Returns
+    -------
+    results: dict with
+        'samples': dict of the parameters samples, arrays of shape (n_samples,)
+        'f_match': array of shape (n_samples,), frequency of the minimum of |S11| [Hz]
+        'S11_min': complex array of shape (n_samples,), S11 at the minimum on the frequency grid
+        'Zin_match': complex array of shape (n_samples,), Zin at the minimum on the frequency grid
+    """
+    freqs = np.atleast_1d(np.asarray(freqs, dtype=float))
+    nominal = cfg.parameters()
+    unknown = set(distributions) - set(nominal)
+    if unknown:
+        raise ValueError('Unknown parameters: {}'.format(', '.join(sorted(unknown))))
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_ELEMENTS//len(freqs))
+
+    rng = np.random.default_rng(seed)
+    samples = {name: np.asarray(distribution.sample(nominal[name], n_samples, rng), dtype=float)
+               for name, distribution in distributions.items()}
+    _check_samples(samples, nominal)
+
+    f_match = np.empty(n_samples)
+    S11_min = np.empty(n_samples, dtype=complex)
+    Zin_match = np.empty(n_samples, dtype=complex)
+    with profiling.stage('montecarlo'):
+        for start in range(0, n_samples, chunk_size):
+            chunk = slice(start, min(start + chunk_size, n_samples))
+            params = dict(nominal)
+            params.update({name: values[chunk, np.newaxis] for name, values in samples.items()})
+            Zin = np.broadcast_to(input_impedance(cfg, params, freqs), (chunk.stop - chunk.start, len(freqs)))
+            S11 = (Zin - cfg.R)/(Zin + cfg.R)
+            idx, f_match[chunk] = _match_frequency(freqs, np.abs(S11))
+            rows = np.arange(len(idx))
+            S11_min[chunk] = S11[rows, idx]
+            Zin_match[chunk] = Zin[rows, idx]
+
+    return {'samples': samples,
+            'f_match': f_match,
+            'S11_min': S11_min,
+            'Zin_match': Zin_match}
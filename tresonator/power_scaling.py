@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Scaling of the T-resonator voltages and currents with the input power
+"""
+import copy
+import numpy as np
+from . transmission_line_utils import transfer_matrix
+from . import profiling
+
+
+class PowerScaling(object):
+    """
+    Voltages and currents of a T-resonator configuration for any input power.
+
+    For a given frequency, short lengths and losses, the voltages and
+    currents along the resonator are proportional to sqrt(P_in). The
+    profile is thus calculated once for 1 W, and then scaled to arrays of
+    input powers: results are arrays of shape P_in.shape + (npositions,).
+
+    It is usually obtained from Configuration.power_scaling(), which caches it.
+
+    Args:
+    -----
+    cfg: Configuration
+        T-resonator configuration, for a single frequency
+    dl: float, optional
+        spatial sampling step [m]. Default is 1 mm.
+    """
+    def __init__(self, cfg, dl=1e-3):
+        if np.ndim(cfg.f):
+            raise ValueError('PowerScaling requires a configuration with a single frequency')
+        self.f = cfg.f
+        self.dl = dl
+        # the profiles are calculated for 1 W, whatever the configuration
+        # input power (which can be zero)
+        cfg = copy.copy(cfg)
+        cfg.P_in = 1
+
+        with profiling.stage('power_scaling'):
+            L_CEA, L_DUT, V_CEA, V_DUT, I_CEA, I_DUT = cfg.voltage_current(dl)
+            # Positions from T of the profile samples
+            self.L_CEA, self.L_DUT = L_CEA, L_DUT
+            # Voltages [V/sqrt(W)] and currents [A/sqrt(W)] for 1 W
+            self.V_CEA, self.V_DUT = V_CEA, V_DUT
+            self.I_CEA, self.I_DUT = I_CEA, I_DUT
+
+            # Voltages at the probes for 1 W
+            Zin, Z_CEA, Z_DUT = cfg.input_impedance()
+            rho_in = (Zin - cfg.R)/(Zin + cfg.R)
+            V0 = np.sqrt(2*cfg.R)*(1 + rho_in)
+            self.V_probe_CEA = self._branch_voltage(cfg, V0, Z_CEA[-1], cfg._CEA_SECTIONS[::-1],
+                                                    cfg.L_Vprobe_CEA_fromT)
+            self.V_probe_DUT = self._branch_voltage(cfg, V0, Z_DUT[-1], cfg._DUT_SECTIONS[::-1],
+                                                    cfg.L_Vprobe_DUT_fromT)
+
+            # Maxima along the resonator for 1 W, not limited by the sampling
+            peaks = cfg.peak_voltage_current()
+            self.V_max, self.I_max = peaks['V_max'], peaks['I_max']
+            self.z_V_max, self.z_I_max = peaks['z_V_max'], peaks['z_I_max']
+            self.branch_V_max, self.branch_I_max = peaks['branch_V_max'], peaks['branch_I_max']
+
+        # magnitudes, computed once
+        self._abs = {name: np.abs(getattr(self, name))
+                     for name in ('V_CEA', 'V_DUT', 'I_CEA', 'I_DUT')}
+
+    def __repr__(self):
+        return 'T-resonator power scaling: f={} MHz, V_max={:.1f} V/sqrt(W), I_max={:.2f} A/sqrt(W)'.format( \
+                     self.f/1e6, self.V_max, self.I_max)
+
+    @staticmethod
+    def _branch_voltage(cfg, V0, Zbranch, TL_indexes, z):
+        """
+        Voltage at the position z from T of a branch,
+        for the voltage V0 at T. TL_indexes are ordered from T to short.
+        """
+        I0 = V0/Zbranch
+        L0 = 0
+        for TL_index in TL_indexes:
+            TL = cfg.TLs[TL_index]
+            if z <= L0 + TL.L:
+                V, _ = transfer_matrix(-(z - L0), V0, I0, TL.Zc, cfg.gammas[TL_index])
+                return V
+            V0, I0 = transfer_matrix(-TL.L, V0, I0, TL.Zc, cfg.gammas[TL_index])
+            L0 += TL.L
+        raise ValueError('Position {} m is beyond the branch length {} m'.format(z, L0))
+
+    @staticmethod
+    def _scale(P_in):
+        """
+        Scaling factor sqrt(P_in), with an additional axis for the positions.
+        """
+        P_in = np.asarray(P_in, dtype=float)
+        if np.any(P_in < 0):
+            raise ValueError('Input powers must be positive')
+        return np.sqrt(P_in)[..., np.newaxis]
+
+    def voltage_current(self, P_in):
+        """
+        Returns the voltage and current along the resonator for input powers.
+
+        Args
+        ----
+        P_in: float or array
+            input powers [W]
+
+        Returns
+        -------
+        L_CEA, L_DUT: positions from T [m], arrays of shape (npositions,)
+        V_CEA, V_DUT, I_CEA, I_DUT: complex arrays of shape P_in.shape + (npositions,)
+        """
+        scale = self._scale(P_in)
+        return self.L_CEA, self.L_DUT, scale*self.V_CEA, scale*self.V_DUT, \
+               scale*self.I_CEA, scale*self.I_DUT
+
+    def envelopes(self, P_in):
+        """
+        Returns the magnitudes of the voltage and current along the resonator
+        for input powers.
+
+        Args
+        ----
+        P_in: float or array
+            input powers [W]
+
+        Returns
+        -------
+        L_CEA, L_DUT: positions from T [m], arrays of shape (npositions,)
+        V_CEA, V_DUT, I_CEA, I_DUT: arrays of shape P_in.shape + (npositions,),
+            |V| [V] and |I| [A]
+        """
+        scale = self._scale(P_in)
+        return self.L_CEA, self.L_DUT, scale*self._abs['V_CEA'], scale*self._abs['V_DUT'], \
+               scale*self._abs['I_CEA'], scale*self._abs['I_DUT']
+
+    def probe_voltages(self, P_in):
+        """
+        Returns the voltages at the CEA and DUT voltage probes for input powers.
+
+        Args
+        ----
+        P_in: float or array
+            input powers [W]
+
+        Returns
+        -------
+        V_probe_CEA, V_probe_DUT: complex arrays of shape P_in.shape
+        """
+        scale = self._scale(P_in)[..., 0]
+        return scale*self.V_probe_CEA, scale*self.V_probe_DUT
+
+    def maxima(self, P_in):
+        """
+        Returns the maximum voltage and current along the resonator for
+        input powers (see Configuration.peak_voltage_current for the positions).
+
+        Args
+        ----
+        P_in: float or array
+            input powers [W]
+
+        Returns
+        -------
+        V_max, I_max: arrays of shape P_in.shape, max |V| [V] and max |I| [A]
+        """
+        scale = self._scale(P_in)[..., 0]
+        return scale*self.V_max, scale*self.I_max
+
+    def limit_powers(self, V_limit=None, I_limit=None, V_probe_limit=None):
+        """
+        Returns the input powers at which the voltage and current limits
+        are reached.
+
+        Args
+        ----
+        V_limit: float or array, optional
+            maximum voltage along the resonator [V]
+        I_limit: float or array, optional
+            maximum current along the resonator [A]
+        V_probe_limit: float or array, optional
+            maximum voltage at the probes [V]
+
+        Returns
+        -------
+        P_limits: dict of 'V', 'I' and 'V_probe_CEA', 'V_probe_DUT' input
+            powers [W] of the given limits (arrays of the shape of the limit),
+            and 'P_max', the maximum input power satisfying all of them
+            (inf without limit)
+        """
+        P_limits = {}
+        for name, limit, peak in (('V', V_limit, self.V_max),
+                                  ('I', I_limit, self.I_max),
+                                  ('V_probe_CEA', V_probe_limit, np.abs(self.V_probe_CEA)),
+                                  ('V_probe_DUT', V_probe_limit, np.abs(self.V_probe_DUT))):
+            if limit is not None:
+                P_limits[name] = (np.asarray(limit, dtype=float)/peak)**2
+        P_max = np.inf
+        for P in P_limits.values():
+            P_max = np.minimum(P_max, P)
+        P_limits['P_max'] = P_max
+        return P_limits
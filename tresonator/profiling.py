@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in instrumentation of the model evaluations and of the optimizers
+
+Usage:
+
+    with tresonator.profiling.profile() as stats:
+        cfg.optimize_short_lengths()
+    print(stats)
+
+The counters and stage timers are only collected inside a profile() context.
+Outside of it, the instrumentation hooks return immediately. Work done in
+worker processes (n_jobs > 1) is not collected.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# statistics being collected, None when profiling is disabled
+_stats = None
+
+
+def enabled():
+    """
+    Returns True if the statistics are being collected.
+    """
+    return _stats is not None
+
+
+def count(name, n=1):
+    """
+    Increment the counter name by n.
+    """
+    if _stats is None:
+        return
+    counts = _stats['counts']
+    counts[name] = counts.get(name, 0) + n
+
+
+class _Stage(object):
+    """
+    Accumulate the wall time spent in a stage
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if _stats is not None:
+            times = _stats['times']
+            times[self.name] = times.get(self.name, 0) + time.perf_counter() - self.t0
+            count(self.name + '_calls')
+        return False
+
+
+class _NullStage(object):
+    """
+    Stage used when profiling is disabled: does nothing
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """
+    Context manager accumulating the wall time of the stage name.
+    """
+    return _NULL_STAGE if _stats is None else _Stage(name)
+
+
+@contextmanager
+def profile(log=False, level=logging.INFO):
+    """
+    Collect the instrumentation statistics inside the context.
+
+    Args
+    ----
+    log: bool, optional
+        emit the statistics through logging when leaving the context.
+        Default is False.
+    level: int, optional
+        logging level of the statistics. Default is logging.INFO.
+
+    Yields
+    ------
+    stats: dict
+        {'counts': {name: count}, 'times': {stage: seconds}, 'elapsed': seconds}
+        filled when leaving the context.
+    """
+    global _stats
+    previous = _stats
+    stats = {'counts': {}, 'times': {}, 'elapsed': 0.}
+    _stats = stats
+    t0 = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats['elapsed'] = time.perf_counter() - t0
+        _stats = previous
+        # statistics of nested contexts are also accounted in the outer one
+        if previous is not None:
+            for key in ('counts', 'times'):
+                for name, value in stats[key].items():
+                    previous[key][name] = previous[key].get(name, 0) + value
+        if log:
+            logger.log(level, 'tresonator profile: %s', stats)
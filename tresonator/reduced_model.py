@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Reduced-order model of the T-resonator
+"""
+import numpy as np
+from . transmission_line_utils import ZL_2_Zin, ZL_2_Zin_derivatives, abcd_matrix
+from . import profiling
+
+
+class ReducedModel(object):
+    """
+    Reduced-order model of a T-resonator configuration.
+
+    For given frequencies and additional losses, the fixed sections of each
+    branch are collapsed into a single ABCD chain matrix. Evaluating the
+    resonator for new short lengths and short impedances then only requires
+    the two variable sections and a bilinear transform per branch.
+
+    The model can be reused for any number of evaluations. It is usually
+    obtained from Configuration.reduced_model().
+
+    Args:
+    -----
+    cfg: Configuration
+        T-resonator configuration (geometry, shorts, losses and feeder impedance)
+    f: float or array, optional
+        frequency [Hz]. Default is the configuration frequency.
+        Arrays are broadcasted against the short lengths.
+    additional_losses: float or array, optional
+        additional losses factor. Default is the configuration one.
+    """
+    def __init__(self, cfg, f=None, additional_losses=None):
+        self.f = np.asarray(cfg.f if f is None else f)
+        self.R = cfg.R
+        self.Z_short_DUT = cfg.Z_short_DUT
+        self.Z_short_CEA = cfg.Z_short_CEA
+        self.additional_losses = cfg.additional_losses if additional_losses is None else additional_losses
+
+        self._branches = {'DUT': self._reduce_branch(cfg, cfg._DUT_SECTIONS),
+                          'CEA': self._reduce_branch(cfg, cfg._CEA_SECTIONS)}
+
+    def __repr__(self):
+        return 'T-resonator reduced model: f={} MHz, additional_losses={}'.format( \
+                     self.f/1e6, self.additional_losses)
+
+    def _reduce_branch(self, cfg, TL_indexes):
+        """
+        Characteristic impedance and wavenumber of the variable section and
+        ABCD matrix of the fixed sections (from T to the variable section).
+        """
+        TL_var = cfg.TLs[TL_indexes[0]]
+        gamma_var = TL_var.gamma(self.f, self.additional_losses)
+
+        ABCD = None
+        for TL_index in TL_indexes[:0:-1]:
+            TL = cfg.TLs[TL_index]
+            _ABCD = abcd_matrix(TL.L, TL.Zc, TL.gamma(self.f, self.additional_losses))
+            ABCD = _ABCD if ABCD is None else np.einsum('ij...,jk...->ik...', ABCD, _ABCD)
+        if ABCD is None:
+            # no fixed section: identity matrix
+            one = np.ones_like(gamma_var)
+            ABCD = np.array([[one, 0*one], [0*one, one]])
+        return TL_var.Zc, gamma_var, ABCD
+
+    def branch_impedance(self, branch, L, Z_short=None):
+        """
+        Input impedance at T of a branch.
+
+        Args
+        ----
+        branch: 'DUT' or 'CEA'
+        L: float or array
+            short length of the branch [m]
+        Z_short: float or array, optional
+            short impedance [Ohm]. Default is the configuration one.
+
+        Returns
+        -------
+        Z: complex or complex array
+        """
+        Zc, gamma, ((A, B), (C, D)) = self._branches[branch]
+        if Z_short is None:
+            Z_short = getattr(self, 'Z_short_'+branch)
+        Z = ZL_2_Zin(L, Zc, gamma, Z_short)
+        return (A*Z + B)/(C*Z + D)
+
+    def branch_impedance_and_grad(self, branch, L, Z_short=None):
+        """
+        Input impedance at T of a branch and its derivatives with respect to
+        the short length and to the short impedance.
+
+        Returns
+        -------
+        Z: complex or complex array
+        dZ_dL: complex or complex array
+        dZ_dZshort: complex or complex array
+        """
+        Zc, gamma, ((A, B), (C, D)) = self._branches[branch]
+        if Z_short is None:
+            Z_short = getattr(self, 'Z_short_'+branch)
+        Z = ZL_2_Zin(L, Zc, gamma, Z_short)
+        dZ_dL, _, _, dZ_dZshort = ZL_2_Zin_derivatives(L, Zc, gamma, Z_short)
+        # derivative of the bilinear transform, with AD - BC = 1 for line sections
+        dZT_dZ = 1/(C*Z + D)**2
+        return (A*Z + B)/(C*Z + D), dZT_dZ*dZ_dL, dZT_dZ*dZ_dZshort
+
+    def input_impedance(self, L_DUT, L_CEA, Z_short_DUT=None, Z_short_CEA=None):
+        """
+        Input impedance of the T-resonator.
+
+        Args
+        ----
+        L_DUT, L_CEA: float or arrays of broadcastable shapes
+            short lengths [m]
+        Z_short_DUT, Z_short_CEA: float or arrays, optional
+            short impedances [Ohm]. Default are the configuration ones.
+
+        Returns
+        -------
+        Zin: complex or complex array
+        """
+        Z_DUT = self.branch_impedance('DUT', L_DUT, Z_short_DUT)
+        Z_CEA = self.branch_impedance('CEA', L_CEA, Z_short_CEA)
+        # At T-junction. Impedance are associated in parallel.
+        Zin = (Z_DUT*Z_CEA)/(Z_DUT + Z_CEA)
+        profiling.count('model_evaluations', np.size(Zin))
+        return Zin
+
+    def S11(self, L_DUT, L_CEA, Z_short_DUT=None, Z_short_CEA=None):
+        """
+        S11 of the T-resonator. See input_impedance for the arguments.
+        """
+        Zin = self.input_impedance(L_DUT, L_CEA, Z_short_DUT, Z_short_CEA)
+        return (Zin - self.R)/(Zin + self.R)
+
+    def S11dB(self, L_DUT, L_CEA, Z_short_DUT=None, Z_short_CEA=None):
+        return 20*np.log10(np.abs(self.S11(L_DUT, L_CEA, Z_short_DUT, Z_short_CEA)))
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Match frequency, bandwidth and loaded quality factor of the T-resonator
+
+The resonance is bracketed on a coarse frequency grid, then refined by
+safeguarded parabolic minimization (match frequency) and by Illinois
+regula falsi (bandwidth edges). All the configurations given by arrays of
+short lengths and additional losses are solved at once.
+"""
+import numpy as np
+from . reduced_model import ReducedModel
+from . import profiling
+
+# golden section ratio, used when the parabolic step is rejected
+_GOLDEN = 0.3819660112501051
+
+# Maximum number of distinct additional losses for which the frequency grid
+# is evaluated with reduced models
+_MAX_REDUCED_MODELS = 16
+
+
+def _S11(cfg, f, L_DUT, L_CEA, additional_losses):
+    """
+    S11 of the T-resonator, for arrays of frequencies, short lengths and
+    additional losses of broadcastable shapes.
+    """
+    gammas = cfg.topology.propagation_constants(f, additional_losses)
+    Z_DUT, Z_CEA = cfg.topology.input_impedances(gammas, L_DUT, L_CEA,
+                                                 cfg.Z_short_DUT, cfg.Z_short_CEA)
+    # At T-junction. Impedance are associated in parallel.
+    Zin = (Z_DUT[-1]*Z_CEA[-1])/(Z_DUT[-1] + Z_CEA[-1])
+    profiling.count('model_evaluations', np.size(Zin))
+    return (Zin - cfg.R)/(Zin + cfg.R)
+
+
+class _Resonance(object):
+    """
+    Resonance of T-resonator configurations: frequency grid evaluation and
+    match frequency, shared by the figures of merit.
+    """
+    def __init__(self, cfg, f_span=None, L_DUT=None, L_CEA=None, additional_losses=None,
+                 npoints=31, xtol=1.0, maxiter=100):
+        if f_span is None:
+            if np.ndim(cfg.f):
+                raise ValueError('f_span must be given for a configuration with several frequencies')
+            f_span = (0.97*cfg.f, 1.03*cfg.f)
+        self.cfg = cfg
+        self.xtol = xtol
+        self.maxiter = maxiter
+        params = [cfg.L_DUT if L_DUT is None else L_DUT,
+                  cfg.L_CEA if L_CEA is None else L_CEA,
+                  cfg.additional_losses if additional_losses is None else additional_losses]
+        self.L_DUT, self.L_CEA, self.additional_losses = np.broadcast_arrays(*[np.asarray(p, dtype=float) for p in params])
+        self.shape = self.L_DUT.shape
+
+        # coarse grid, shape (npoints,) + shape
+        self.f_grid = np.linspace(f_span[0], f_span[1], npoints).reshape((-1,) + (1,)*len(self.shape))
+        self.S11_grid = self._S11_grid()
+        self.f_match, self.S11_match = self._minimize()
+
+    def S11(self, f, active=None):
+        """
+        S11 of the configurations at the frequencies f (array of shape
+        shape), evaluated only where active if given (NaN elsewhere).
+        """
+        if active is None:
+            return _S11(self.cfg, f, self.L_DUT, self.L_CEA, self.additional_losses)
+        S11 = np.full(f.shape, np.nan, dtype=complex)
+        params = [np.broadcast_to(p, f.shape)[active] for p in (self.L_DUT, self.L_CEA, self.additional_losses)]
+        S11[active] = _S11(self.cfg, f[active], *params)
+        return S11
+
+    def _S11_grid(self):
+        """
+        S11 on the frequency grid, evaluated frequency by frequency. For a
+        few distinct additional losses, the fixed sections are collapsed in
+        reduced models, which are shared by all the short lengths.
+        """
+        losses = np.unique(self.additional_losses)
+        if len(losses) > _MAX_REDUCED_MODELS:
+            return np.stack([self.S11(np.broadcast_to(f, self.shape)) for f in self.f_grid])
+        S11_grid = np.empty((len(self.f_grid),) + self.shape, dtype=complex)
+        for loss in losses:
+            mask = self.additional_losses == loss
+            for idx, f in enumerate(self.f_grid.ravel()):
+                model = ReducedModel(self.cfg, f, loss)
+                S11_grid[idx, ...][mask] = model.S11(self.L_DUT[mask], self.L_CEA[mask])
+        return S11_grid
+
+    def _minimize(self):
+        """
+        Frequency of the minimum of |S11|, bracketed by the grid and refined by
+        parabolic interpolation of |S11|**2, with golden section steps when
+        the bracket does not shrink enough. NaN if the minimum is at the edge
+        of the grid.
+        """
+        g_grid = np.abs(self.S11_grid)**2
+        npoints = len(self.f_grid)
+        idx = np.argmin(g_grid, axis=0)
+        inside = (idx > 0) & (idx < npoints - 1)
+        _idx = np.clip(idx, 1, npoints - 2)[np.newaxis]
+        f = np.broadcast_to(self.f_grid, g_grid.shape)
+        a, x, b = [np.take_along_axis(f, _idx + d, axis=0)[0] for d in (-1, 0, 1)]
+        ga, gx, gb = [np.take_along_axis(g_grid, _idx + d, axis=0)[0] for d in (-1, 0, 1)]
+        S11x = np.take_along_axis(self.S11_grid, _idx, axis=0)[0]
+
+        golden = np.zeros(self.shape, dtype=bool)
+        for nb_iter in range(self.maxiter):
+            active = inside & (b - a > self.xtol)
+            if not np.any(active):
+                break
+            # vertex of the parabola through the bracket
+            num = (x - a)**2*(gx - gb) - (x - b)**2*(gx - ga)
+            den = (x - a)*(gx - gb) - (x - b)*(gx - ga)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                u = x - 0.5*num/den
+            golden |= ~np.isfinite(u) | (u <= a) | (u >= b)
+            u = np.where(golden, np.where(b - x > x - a, x + _GOLDEN*(b - x), x - _GOLDEN*(x - a)), u)
+            # no evaluation closer than xtol/2 from the current best point
+            du = u - x
+            u = x + np.where(du >= 0, 1, -1)*np.maximum(np.abs(du), self.xtol/2)
+            u = np.where(active, np.clip(u, a, b), x)
+
+            S11u = self.S11(u, active)
+            gu = np.abs(S11u)**2
+            better, worse, left = active & (gu < gx), active & ~(gu < gx), u < x
+            width = b - a
+            a, ga = np.where(better & ~left, (x, gx), np.where(worse & left, (u, gu), (a, ga)))
+            b, gb = np.where(better & left, (x, gx), np.where(worse & ~left, (u, gu), (b, gb)))
+            x, gx, S11x = np.where(better, u, x), np.where(better, gu, gx), np.where(better, S11u, S11x)
+            # golden section step next time if the bracket did not shrink by half
+            golden = ~golden & (b - a > 0.5*width)
+        profiling.count('match_frequency_iterations', nb_iter + 1)
+
+        return np.where(inside, x, np.nan)[()], np.where(inside, S11x, np.nan)[()]
+
+    def crossings(self, level):
+        """
+        Frequencies below and above the match frequency at which |S11|**2
+        crosses level (float or array of shape shape). NaN if the crossing is
+        not bracketed by the grid.
+        """
+        g_grid = np.abs(self.S11_grid)**2 - level
+        f = np.broadcast_to(self.f_grid, g_grid.shape)
+        npoints = len(self.f_grid)
+        f_match = np.where(np.isnan(self.f_match), -np.inf, self.f_match)
+        g_match = np.abs(self.S11_match)**2 - level
+        valid = g_match < 0
+
+        # grid points above the level, closest to the match frequency
+        above = (g_grid > 0) & (f < f_match)
+        idx_low = np.where(np.any(above, axis=0), npoints - 1 - np.argmax(above[::-1], axis=0), -1)
+        above = (g_grid > 0) & (f > f_match)
+        idx_high = np.where(np.any(above, axis=0), np.argmax(above, axis=0), -1)
+        valid = np.stack([valid & (idx_low >= 0), valid & (idx_high >= 0)])
+
+        # both sides are solved together, along a first axis
+        idx = np.stack([idx_low, idx_high]).clip(0)
+        f_out = np.stack([np.take_along_axis(f, idx[:1], axis=0)[0],
+                          np.take_along_axis(f, idx[1:], axis=0)[0]])
+        g_out = np.stack([np.take_along_axis(g_grid, idx[:1], axis=0)[0],
+                          np.take_along_axis(g_grid, idx[1:], axis=0)[0]])
+        f_in = np.broadcast_to(np.where(np.isfinite(f_match), f_match, 0), f_out.shape)
+        g_in = np.broadcast_to(g_match, f_out.shape)
+        f_cross = self._illinois(np.where(valid, f_out, f_in), np.where(valid, g_out, 1.),
+                                 f_in, np.where(valid, g_in, -1.), valid, level)
+        return np.where(valid, f_cross, np.nan)
+
+    def _illinois(self, a, ga, b, gb, active, level):
+        """
+        Root of |S11|**2 - level bracketed in [a, b] (ga > 0 > gb),
+        by the Illinois variant of the regula falsi.
+        """
+        c = b
+        side = np.zeros(a.shape, dtype=int)
+        for nb_iter in range(self.maxiter):
+            if not np.any(active):
+                break
+            c_prev = c
+            c = np.where(active, (a*gb - b*ga)/np.where(active, gb - ga, 1), c)
+            gc = np.abs(self.S11(c, active))**2 - level
+            same_b = active & (gc*gb > 0)
+            same_a = active & (gc*ga > 0)
+            # the retained end point value is halved when it is kept twice
+            ga = np.where(same_b & (side == -1), ga/2, ga)
+            gb = np.where(same_a & (side == +1), gb/2, gb)
+            b, gb = np.where(same_b, (c, gc), (b, gb))
+            a, ga = np.where(same_a, (c, gc), (a, ga))
+            side = np.where(same_b, -1, np.where(same_a, +1, side))
+            active = (same_a | same_b) & (np.abs(c - c_prev) > self.xtol)
+        return c
+
+
+def match_frequency(cfg, f_span=None, L_DUT=None, L_CEA=None, additional_losses=None,
+                    npoints=31, xtol=1.0, maxiter=100):
+    """
+    See Configuration.match_frequency
+    """
+    with profiling.stage('match_frequency'):
+        resonance = _Resonance(cfg, f_span, L_DUT, L_CEA, additional_losses, npoints, xtol, maxiter)
+    return resonance.f_match, resonance.S11_match
+
+
+def bandwidth(cfg, threshold_dB=-10, f_span=None, L_DUT=None, L_CEA=None, additional_losses=None,
+              npoints=31, xtol=1.0, maxiter=100):
+    """
+    See Configuration.bandwidth
+    """
+    with profiling.stage('bandwidth'):
+        resonance = _Resonance(cfg, f_span, L_DUT, L_CEA, additional_losses, npoints, xtol, maxiter)
+        f_low, f_high = resonance.crossings(10**(threshold_dB/10))
+    return f_high - f_low, f_low, f_high
+
+
+def loaded_Q(cfg, f_span=None, L_DUT=None, L_CEA=None, additional_losses=None,
+             npoints=31, xtol=1.0, maxiter=100):
+    """
+    See Configuration.loaded_Q
+    """
+    with profiling.stage('loaded_Q'):
+        resonance = _Resonance(cfg, f_span, L_DUT, L_CEA, additional_losses, npoints, xtol, maxiter)
+        # half of the absorbed power at the match frequency
+        f_low, f_high = resonance.crossings((1 + np.abs(resonance.S11_match)**2)/2)
+    return resonance.f_match/(f_high - f_low)
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Topology of the T-resonator: description of the line sections of each branch
+"""
+import os
+import numpy as np
+from . constants import *
+from . coaxial import Coax, characteristic_impedance, propagation_constant
+
+# Directory of the topology files shipped with the package
+TOPOLOGIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topologies')
+
+# Name of the default topology
+DEFAULT_TOPOLOGY = 'SSA50'
+
+# Conductivities [S/m] of the materials names used in the topology files
+MATERIALS = {'copper': conductivity_Cu,
+             'silver': conductivity_Ag,
+             'steel': conductivity_SS,
+             'stainless': conductivity_SS,
+             'aluminium': conductivity_Al,
+             'aluminum': conductivity_Al}
+
+# Topologies already loaded, by file path and modification time
+_loaded = {}
+
+
+def _to_meter(value):
+    """
+    Convert a length in mm (string) to meter, without rounding error
+    """
+    return float(value + 'e-3')
+
+
+def _to_conductivity(value):
+    """
+    Conductivity [S/m] from a material name or a value (string)
+    """
+    if value.lower() in MATERIALS:
+        return MATERIALS[value.lower()]
+    return float(value)
+
+
+class Topology(object):
+    """
+    Topology of a T-resonator: tables of the coaxial line sections of the
+    DUT and CEA branches and short impedances.
+
+    The sections are compiled into arrays (struct-of-arrays), indexed in the
+    order of the Configuration transmission lines: DUT sections from short
+    to T, then CEA sections from T to short. The input impedances of both
+    branches are evaluated by a single cascade kernel (input_impedances).
+
+    Args:
+    -----
+    DUT, CEA: list of dict
+        sections of the branch, from T to short. Each section is a dict with
+        keys 'L' (length [m]), 'Dint' and 'Dout' (inner and outer diameters [m]),
+        'sigma' (conductivity [S/m]) and optionally 'eps_r' (default 1) and
+        'variable' (default False). The variable length section of a branch
+        must be the last one (at the short). If no section is variable, the
+        last one is. Its length is the default one.
+    Z_short_DUT, Z_short_CEA: float, optional
+        short impedances [Ohm]. Default is 1e-2 Ohm.
+    name: str, optional
+    """
+    BRANCHES = ('DUT', 'CEA')
+
+    def __init__(self, DUT, CEA, Z_short_DUT=1e-2, Z_short_CEA=1e-2, name=''):
+        self.name = name
+        self.branches = {'DUT': [dict(section) for section in DUT],
+                         'CEA': [dict(section) for section in CEA]}
+        self.Z_short_DUT = Z_short_DUT
+        self.Z_short_CEA = Z_short_CEA
+
+        for branch, sections in self.branches.items():
+            if not sections:
+                raise ValueError('No section in the {} branch'.format(branch))
+            variables = [idx for idx, section in enumerate(sections) if section.get('variable')]
+            if variables and variables != [len(sections) - 1]:
+                raise ValueError('The variable section of the {} branch must be the one at the short'.format(branch))
+            sections[-1]['variable'] = True
+            for section in sections:
+                section.setdefault('eps_r', 1)
+                section.setdefault('variable', False)
+                if section['Dint'] <= 0 or section['Dout'] <= section['Dint'] or \
+                    section['sigma'] <= 0 or section['eps_r'] < 1 or \
+                    (not section['variable'] and not section['L'] > 0):
+                    raise ValueError('Invalid section in the {} branch: {}'.format(branch, section))
+
+        self._compile()
+
+    def __repr__(self):
+        return 'T-resonator topology {}: {} DUT sections, {} CEA sections'.format( \
+                    self.name, len(self.branches['DUT']), len(self.branches['CEA']))
+
+    def _compile(self):
+        """
+        Struct-of-arrays representation of the sections
+        """
+        n_DUT, n_CEA = len(self.branches['DUT']), len(self.branches['CEA'])
+        # DUT sections from short to T, then CEA sections from T to short
+        sections = self.branches['DUT'][::-1] + self.branches['CEA']
+        self.names = tuple(['D{}'.format(idx) for idx in reversed(range(n_DUT))] +
+                           ['C{}'.format(idx) for idx in range(n_CEA)])
+        self.L = np.array([section['L'] if section['L'] is not None else np.nan
+                           for section in sections], dtype=float)
+        self.Dint = np.array([section['Dint'] for section in sections], dtype=float)
+        self.Dout = np.array([section['Dout'] for section in sections], dtype=float)
+        self.sigma = np.array([section['sigma'] for section in sections], dtype=float)
+        self.eps_r = np.array([section['eps_r'] for section in sections], dtype=float)
+        self.Zc = characteristic_impedance(self.Dint, self.Dout, self.eps_r)
+
+        # Section indexes of each branch, from short to T.
+        # The first section is the variable length one.
+        self.sections = {'DUT': tuple(range(n_DUT)),
+                         'CEA': tuple(range(n_DUT + n_CEA - 1, n_DUT - 1, -1))}
+
+        # Section indexes of both branches, from short to T, padded with -1
+        n_max = max(n_DUT, n_CEA)
+        self._cascade = np.full((2, n_max), -1)
+        for idx, branch in enumerate(self.BRANCHES):
+            self._cascade[idx, :len(self.sections[branch])] = self.sections[branch]
+        # padding sections are of null length and unit characteristic impedance
+        self._L_padded = np.append(self.L, 0)[self._cascade]
+        self._Zc_padded = np.append(self.Zc, 1)[self._cascade]
+
+    @classmethod
+    def load(cls, filename=DEFAULT_TOPOLOGY):
+        """
+        Load a topology from a text file, or one of the topologies shipped
+        with the package by its name (for instance 'SSA50' or 'SSA84').
+
+        The file is a table with the columns:
+            kind Dint[mm] Dout[mm] length[mm] sigma R[Ohm]
+        where kind is 'Short', 'Line', 'Variable' or 'Tee'. The rows describe
+        the DUT branch from its short to the T-junction ('Tee'), then the CEA
+        branch from the T-junction to its short. The sigma column is a
+        material name ('Copper', 'Silver', 'Steel', 'Aluminium') or a
+        conductivity in S/m. Text after '#' is ignored.
+
+        Topologies are only parsed once and shared: they must not be modified.
+        Modified files are parsed again.
+
+        Returns
+        -------
+        topology: Topology
+        """
+        if not os.path.exists(filename) and \
+            os.path.exists(os.path.join(TOPOLOGIES_DIR, filename + '.txt')):
+            filename = os.path.join(TOPOLOGIES_DIR, filename + '.txt')
+        key = (os.path.abspath(filename), os.stat(filename).st_mtime_ns)
+        if key not in _loaded:
+            _loaded[key] = cls._parse(filename)
+        return _loaded[key]
+
+    @classmethod
+    def _parse(cls, filename):
+        rows = []
+        with open(filename) as fid:
+            for line in fid:
+                fields = line.split('#')[0].split()
+                if fields:
+                    if len(fields) != 6:
+                        raise ValueError('Invalid line in {}: {}'.format(filename, line))
+                    rows.append(fields)
+
+        kinds = [row[0].lower() for row in rows]
+        if kinds.count('tee') != 1 or kinds[0] != 'short' or kinds[-1] != 'short':
+            raise ValueError('{} must describe a short, the DUT branch, a tee, the CEA branch and a short'.format(filename))
+        idx_tee = kinds.index('tee')
+
+        def sections(rows):
+            return [{'L': _to_meter(length), 'Dint': _to_meter(Dint), 'Dout': _to_meter(Dout),
+                     'sigma': _to_conductivity(sigma), 'variable': kind.lower() == 'variable'}
+                    for kind, Dint, Dout, length, sigma, _ in rows]
+
+        return cls(DUT=sections(rows[1:idx_tee][::-1]), CEA=sections(rows[idx_tee+1:-1]),
+                   Z_short_DUT=float(rows[0][5]), Z_short_CEA=float(rows[-1][5]),
+                   name=os.path.splitext(os.path.basename(filename))[0])
+
+    def lengths(self, L_DUT, L_CEA):
+        """
+        Lengths of the sections [m], with the variable lengths L_DUT and L_CEA
+        (floats).
+        """
+        L = np.copy(self.L)
+        L[self.sections['DUT'][0]] = L_DUT
+        L[self.sections['CEA'][0]] = L_CEA
+        return L
+
+    def coaxes(self, L_DUT, L_CEA):
+        """
+        Coaxial transmission lines of the sections, with the variable lengths
+        L_DUT and L_CEA.
+
+        Returns
+        -------
+        TLs: list of Coax
+        """
+        return [Coax(L, Dint, Dout, eps_r, sigma) for L, Dint, Dout, eps_r, sigma in
+                zip(self.lengths(L_DUT, L_CEA), self.Dint, self.Dout, self.eps_r, self.sigma)]
+
+    def propagation_constants(self, f, additional_losses=1):
+        """
+        Propagation constants of all the sections at once.
+
+        Returns
+        -------
+        gammas: complex array of shape (nsections,) + f.shape
+        """
+        if np.any(np.asarray(f) <= 0): raise ValueError
+        shape = (-1,) + (1,)*np.ndim(f)
+        return propagation_constant(f, self.Dint.reshape(shape), self.Dout.reshape(shape),
+                                    self.eps_r.reshape(shape), self.sigma.reshape(shape),
+                                    additional_losses)
+
+    def input_impedances(self, gammas, L_DUT, L_CEA, Z_short_DUT=None, Z_short_CEA=None):
+        """
+        Input impedances at each section of both branches, from short to T.
+
+        Both branches are evaluated together, section after section:
+        branches with fewer sections are padded with sections of null length.
+
+        Args
+        ----
+        gammas: complex array of shape (nsections,) + shape
+            propagation constants of the sections (see propagation_constants)
+        L_DUT, L_CEA: float or arrays
+            variable lengths [m], broadcastable with shape
+        Z_short_DUT, Z_short_CEA: float or arrays, optional
+            short impedances [Ohm]. Default are the topology ones.
+
+        Returns
+        -------
+        Z_DUT: complex array of shape (nsections DUT,) + broadcasted shape
+        Z_CEA: complex array of shape (nsections CEA,) + broadcasted shape
+        """
+        gammas = np.asarray(gammas)
+        Z_short_DUT = self.Z_short_DUT if Z_short_DUT is None else Z_short_DUT
+        Z_short_CEA = self.Z_short_CEA if Z_short_CEA is None else Z_short_CEA
+        ndim = max(gammas.ndim - 1, np.ndim(L_DUT), np.ndim(L_CEA),
+                   np.ndim(Z_short_DUT), np.ndim(Z_short_CEA))
+
+        def per_branch(DUT, CEA):
+            # stack the branches along a first axis, aligned on the last axes
+            DUT, CEA = np.broadcast_arrays(DUT, CEA)
+            return np.stack([DUT, CEA]).reshape((2,) + (1,)*(ndim - DUT.ndim) + DUT.shape)
+
+        gammas = np.append(gammas, np.zeros((1,) + gammas.shape[1:]), axis=0)[self._cascade]
+        gammas = gammas.reshape(gammas.shape[:2] + (1,)*(ndim + 2 - gammas.ndim) + gammas.shape[2:])
+        L_padded = self._L_padded.reshape(self._L_padded.shape + (1,)*ndim)
+        Zc_padded = self._Zc_padded.reshape(self._Zc_padded.shape + (1,)*ndim)
+
+        # tanh(gamma*L) of all the sections at once
+        t = np.tanh(gammas[:, 1:]*L_padded[:, 1:])
+        t_var = np.tanh(gammas[:, 0]*per_branch(L_DUT, L_CEA))
+
+        Z = per_branch(Z_short_DUT, Z_short_CEA)
+        Zs = []
+        for idx in range(self._cascade.shape[1]):
+            Zc = Zc_padded[:, idx]
+            _t = t_var if idx == 0 else t[:, idx-1]
+            Z = Zc*(Z + Zc*_t)/(Zc + Z*_t)
+            Zs.append(Z)
+        Zs = np.stack(Zs, axis=1)
+        return Zs[0, :len(self.sections['DUT'])], Zs[1, :len(self.sections['CEA'])]
+
+    def circuit_media(self, freq, L_DUT, L_CEA, additional_losses=1):
+        """
+        skrf Coaxial media and lengths of the sections of each branch, from
+        T to short. The last section of each branch is the variable one.
+        The conductivities are multiplied by the additional losses.
+
+        Returns
+        -------
+        DUT: list of (name, media, length)
+        CEA: list of (name, media, length)
+        """
+        from skrf.media import Coaxial
+
+        L = self.lengths(L_DUT, L_CEA)
+        media = {}
+        for branch in self.BRANCHES:
+            media[branch] = [(self.names[idx],
+                              Coaxial(frequency=freq, Dint=self.Dint[idx], Dout=self.Dout[idx],
+                                      epsilon_r=self.eps_r[idx],
+                                      sigma=additional_losses*self.sigma[idx]),
+                              L[idx])
+                             for idx in self.sections[branch][::-1]]
+        return media['DUT'], media['CEA']
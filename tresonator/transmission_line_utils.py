@@ -17,18 +17,78 @@ def ZL_2_Zin(L,Z0,gamma,ZL):
     Z0: characteristic impedance of the transmission line
     gamma: complex wavenumber associated to the transmission line
     ZL: Load impedance
+    
+    L, Z0, gamma and ZL can be arrays of broadcastable shapes.
 
     Returns
     -------
     Zin: input impedance
     """
     
-    assert L > 0
-    assert Z0 > 0
+    assert np.all(L > 0)
+    assert np.all(Z0 > 0)
     
-    Zin = Z0*(ZL + Z0*np.tanh(gamma*L))/(Z0 + ZL*np.tanh(gamma*L))
+    t = np.tanh(gamma*L)
+    Zin = Z0*(ZL + Z0*t)/(Z0 + ZL*t)
     return Zin
 
+def ZL_2_Zin_derivatives(L,Z0,gamma,ZL):
+    """
+    Returns the partial derivatives of the input impedance seen through a lossy
+    transmission line (see ZL_2_Zin) with respect to its arguments.
+    
+    dZin_dL, dZin_dZ0, dZin_dgamma, dZin_dZL = ZL_2_Zin_derivatives(L,Z0,gamma,ZL)
+    
+    Args
+    ----
+    L : length [m] of the transmission line
+    Z0: characteristic impedance of the transmission line
+    gamma: complex wavenumber associated to the transmission line
+    ZL: Load impedance
+    
+    L, gamma and ZL can be arrays of broadcastable shapes.
+    
+    Returns
+    -------
+    dZin_dL: derivative with respect to the length
+    dZin_dZ0: derivative with respect to the characteristic impedance
+    dZin_dgamma: derivative with respect to the complex wavenumber
+    dZin_dZL: derivative with respect to the load impedance
+    """
+    t = np.tanh(gamma*L)
+    D = Z0 + ZL*t
+    # d tanh(x)/dx = 1 - tanh(x)**2
+    dt = 1 - t**2
+    
+    dZin_dt = Z0*(Z0**2 - ZL**2)/D**2
+    dZin_dL = dZin_dt*gamma*dt
+    dZin_dgamma = dZin_dt*L*dt
+    dZin_dZ0 = (ZL + Z0*t)/D - Z0*ZL*dt/D**2
+    dZin_dZL = Z0**2*dt/D**2
+    return dZin_dL, dZin_dZ0, dZin_dgamma, dZin_dZL
+
+def abcd_matrix(L,Z0,gamma):
+    """
+    Returns the ABCD (chain) matrix of a lossy transmission line of 
+    characteristic impedance Z0 and complex wavenumber gamma
+    
+    [V_in, I_in] = ABCD @ [V_out, I_out]
+    
+    Args
+    ----
+    L : length [m] of the transmission line
+    Z0: characteristic impedance of the transmission line
+    gamma: complex wavenumber associated to the transmission line
+    
+    Returns
+    -------
+    ABCD: complex array of shape (2, 2) + shape of gamma*L
+    """
+    cosh = np.cosh(gamma*L)
+    sinh = np.sinh(gamma*L)
+    return np.array([[cosh, Z0*sinh], 
+                     [sinh/Z0, cosh]])
+
 def transfer_matrix(L,V0,I0,Z0,gamma):
     """
     Returns the voltage and the current at a distance L from an
@@ -41,7 +101,7 @@ def transfer_matrix(L,V0,I0,Z0,gamma):
       
     Args
     -----
-    L  : transmission line length [m]
+    L  : transmission line length [m]. Can be an array of lengths.
     V0: initial voltage [V]
     I0: initial current [A]
     Z0 : characteristic impedance of the transmission line
@@ -49,18 +109,18 @@ def transfer_matrix(L,V0,I0,Z0,gamma):
     
     Returns
     --------
-    VL: voltage at length L
-    IL: current at length L
+    VL: voltage at length L (same shape than L)
+    IL: current at length L (same shape than L)
     """
-    if Z0 <= 0:
+    if np.any(np.asarray(Z0) <= 0):
         raise ValueError
-        
-    transfer_matrix = np.array([[np.cosh(gamma*L), Z0*np.sinh(gamma*L)], 
-                                [np.sinh(gamma*L)/Z0, np.cosh(gamma*L)]])
-    U = np.array([V0,I0])
-    A = transfer_matrix @ U           
-    VL = A[0]
-    IL = A[1]
+    
+    # Elements of the transfer matrix [[cosh, Z0*sinh], [sinh/Z0, cosh]]
+    # applied to [V0, I0], evaluated for all the lengths at once
+    cosh = np.cosh(gamma*L)
+    sinh = np.sinh(gamma*L)
+    VL = cosh*V0 + Z0*sinh*I0
+    IL = sinh/Z0*V0 + cosh*I0
     return VL, IL
 
 def V0f_2_VL(L, V0f, gamma, reflection_coefficient):
@@ -88,3 +148,64 @@ def V0f_2_VL(L, V0f, gamma, reflection_coefficient):
     VL = V0f*(np.exp(-gamma*L) + reflection_coefficient*np.exp(+gamma*L))
     return VL       
     
+
+def standing_wave_maximum(P, Q, gamma, L, n_iter=4):
+    """
+    Returns the maximum of |P*exp(gamma*z) + Q*exp(-gamma*z)| for z in [0, L],
+    and its position z, ie. the maximum of a voltage or current standing 
+    wave along a lossy transmission line section.
+    
+    The squared magnitude reads
+        |P|**2*exp(2*alpha*z) + |Q|**2*exp(-2*alpha*z) + 2*Re(P*conj(Q)*exp(2j*beta*z))
+    Its local maxima are found by a few Newton iterations starting from the
+    maxima of the cosine term. The section ends are also candidates.
+    
+    Args
+    ----
+    P, Q: complex amplitudes of the two waves
+    gamma: =alpha+j*beta propagation constant of the transmission line
+    L: transmission line length [m]
+    n_iter: number of Newton iterations. Default is 4.
+    
+    P, Q, gamma and L can be arrays of broadcastable shapes.
+    
+    Returns
+    -------
+    X_max: maximum of the magnitude
+    z_max: position of the maximum [m]
+    """
+    P, Q, gamma, L = np.broadcast_arrays(P, Q, gamma, L)
+    alpha, beta = gamma.real, gamma.imag
+    PQ = P*np.conj(Q)
+    phi = np.angle(PQ)
+    
+    def mag2(z):
+        return np.abs(P[..., np.newaxis]*np.exp(gamma[..., np.newaxis]*z) + 
+                      Q[..., np.newaxis]*np.exp(-gamma[..., np.newaxis]*z))**2
+    
+    # maxima of the cosine term: 2*beta*z + phi = 2*k*pi
+    k_min = np.floor(phi/(2*np.pi))
+    k_max = np.ceil((2*beta*L + phi)/(2*np.pi))
+    nk = int(np.max(k_max - k_min, initial=0)) + 1
+    k = k_min[..., np.newaxis] + np.arange(nk)
+    z = (2*np.pi*k - phi[..., np.newaxis])/(2*beta[..., np.newaxis])
+    
+    _alpha, _beta = alpha[..., np.newaxis], beta[..., np.newaxis]
+    a, b = np.abs(P[..., np.newaxis])**2, np.abs(Q[..., np.newaxis])**2
+    _L = L[..., np.newaxis]
+    z = np.clip(z, 0, _L)
+    for nb_iter in range(n_iter):
+        e_p, e_m = np.exp(2*_alpha*z), np.exp(-2*_alpha*z)
+        c = PQ[..., np.newaxis]*np.exp(2j*_beta*z)
+        dg = 2*_alpha*(a*e_p - b*e_m) - 4*_beta*c.imag
+        d2g = 4*_alpha**2*(a*e_p + b*e_m) - 8*_beta**2*c.real
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(d2g < 0, dg/d2g, 0)
+        z = np.clip(z - step, 0, _L)
+    
+    # section ends
+    z = np.concatenate([z, np.zeros_like(_L), _L], axis=-1)
+    g = mag2(z)
+    idx = np.argmax(g, axis=-1)[..., np.newaxis]
+    return np.sqrt(np.take_along_axis(g, idx, axis=-1)[..., 0]), \
+           np.take_along_axis(z, idx, axis=-1)[..., 0]
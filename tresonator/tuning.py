@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed tuning table of the T-resonator short lengths
+"""
+import bisect
+import datetime
+import itertools
+import json
+from collections import OrderedDict
+import numpy as np
+from . configuration import Configuration
+from . reduced_model import ReducedModel
+from . topology import Topology
+from . import profiling
+
+# Cost of assigning a solution to a branch without reference solution [m]
+_UNREFERENCED_COST = 1e3
+
+# Number of reduced models kept by a table for the lookups
+_MAX_MODELS = 64
+
+
+def _assign_branches(L_sols, L_ref):
+    """
+    Assign the solutions L_sols (nb_solutions, 2) to the branches, so that
+    they are the closest to the reference solutions L_ref (n_branches, 2),
+    which can be NaN. Without reference, solutions are kept in their order.
+
+    Returns
+    -------
+    L: array of shape (n_branches, 2), NaN for the branches without solution
+    """
+    n_branches = len(L_ref)
+    cost = np.linalg.norm(L_sols[:, np.newaxis] - L_ref[np.newaxis], axis=-1)
+    cost = np.where(np.isnan(cost), _UNREFERENCED_COST, cost)
+
+    L = np.full((n_branches, 2), np.nan)
+    if len(L_sols) <= n_branches:
+        # branch of each solution
+        branches = min(itertools.permutations(range(n_branches), len(L_sols)),
+                       key=lambda perm: sum(cost[idx, perm[idx]] for idx in range(len(L_sols))))
+        L[list(branches)] = L_sols
+    else:
+        # solution of each branch
+        solutions = min(itertools.permutations(range(len(L_sols)), n_branches),
+                        key=lambda perm: sum(cost[perm[idx], idx] for idx in range(n_branches)))
+        L[:] = L_sols[list(solutions)]
+    return L
+
+
+class TuningTable(object):
+    """
+    Tuning table of the T-resonator: matching short lengths (L_DUT, L_CEA)
+    of each solution branch, precomputed on a (frequency x additional losses)
+    grid.
+
+    The table is generated offline with TuningTable.generate(), saved
+    with save() and loaded with TuningTable.load(). Setpoints are then
+    obtained with lookup(), by bilinear interpolation of the table, with an
+    optional Newton refinement step on the model.
+
+    Args:
+    -----
+    freqs: array of shape (nfreq,)
+        frequencies of the grid [Hz], increasing
+    additional_losses: array of shape (nloss,)
+        additional losses factors of the grid, increasing
+    L: array of shape (nfreq, nloss, n_branches, 2)
+        short lengths (L_DUT, L_CEA) of each branch [m], NaN if no solution
+    S11: complex array of shape (nfreq, nloss, n_branches)
+        residual S11 of each branch
+    metadata: dict, optional
+        generation parameters (bounds, short impedances, etc)
+    topology: Topology or str, optional
+        resonator topology. Default is the one of the metadata, 
+        or the default topology.
+    """
+    def __init__(self, freqs, additional_losses, L, S11, metadata=None, topology=None):
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.additional_losses = np.asarray(additional_losses, dtype=float)
+        self.L = np.asarray(L, dtype=float)
+        self.S11 = np.asarray(S11, dtype=complex)
+        self.metadata = dict(metadata or {})
+        self.topology = self.metadata.get('topology') if topology is None else topology
+
+        if self.L.shape[:2] != (len(self.freqs), len(self.additional_losses)):
+            raise ValueError('Inconsistent shape of the tuning table')
+        for grid in (self.freqs, self.additional_losses):
+            if np.any(np.diff(grid) <= 0):
+                raise ValueError('The grid must be increasing')
+
+        # lookup state: grids as lists, configuration and recently used reduced models
+        self._grids = (self.freqs.tolist(), self.additional_losses.tolist())
+        self._cfg = None
+        self._models = OrderedDict()
+
+    def __repr__(self):
+        return 'T-resonator tuning table: f=[{}, {}] MHz ({} points), additional_losses=[{}, {}] ({} points), {} branches'.format( \
+                     self.freqs[0]/1e6, self.freqs[-1]/1e6, len(self.freqs),
+                     self.additional_losses[0], self.additional_losses[-1],
+                     len(self.additional_losses), self.n_branches)
+
+    @property
+    def n_branches(self):
+        return self.L.shape[2]
+
+    @classmethod
+    def generate(cls, freqs, additional_losses=[1], bounds=[(1e-3,200e-3),(1e-3,200e-3)],
+                 n_branches=2, Z_short_DUT=None, Z_short_CEA=None,
+                 npoints=201, tol=1e-12, maxiter=50, topology=None):
+        """
+        Generate the tuning table, by solving the matching short lengths at
+        each point of the (frequency x additional losses) grid
+        (see Configuration.solve_short_lengths).
+
+        The solutions are assigned to the branches by proximity with the
+        solutions of the previous frequency (or of the previous losses),
+        so that each branch is continuous over the grid.
+
+        Args
+        ----
+        freqs: array of shape (nfreq,)
+            frequencies [Hz], increasing
+        additional_losses: array of shape (nloss,), optional
+            additional losses factors, increasing. Default is [1].
+        bounds : list of 2-tuples, optional
+            Search bounds for L_DUT and L_CEA
+            [(L_DUT min, L_DUT max), (L_CEA min, L_CEA max)]
+        n_branches: int, optional
+            number of solution branches kept. Default is 2.
+        Z_short_DUT, Z_short_CEA: float, optional
+            short impedances [Ohm]. Default are the topology ones.
+        npoints, tol, maxiter: optional
+            parameters of the solver, see Configuration.solve_short_lengths
+        topology: Topology or str, optional
+            resonator topology (see Configuration). Default is the SSA50 one.
+
+        Returns
+        -------
+        table: TuningTable
+        """
+        freqs = np.atleast_1d(np.asarray(freqs, dtype=float))
+        additional_losses = np.atleast_1d(np.asarray(additional_losses, dtype=float))
+        L = np.full((len(freqs), len(additional_losses), n_branches, 2), np.nan)
+        S11 = np.full((len(freqs), len(additional_losses), n_branches), np.nan, dtype=complex)
+
+        with profiling.stage('tuning_table'):
+            for idx_loss, additional_loss in enumerate(additional_losses):
+                cfg = Configuration(freqs[0], 1, bounds[0][0], bounds[1][0],
+                                    Z_short_DUT, Z_short_CEA, additional_loss, topology)
+                for idx_f, f in enumerate(freqs):
+                    model = cfg.reduced_model(f)
+                    L_sols, _ = cfg._solve_short_lengths(model, bounds, npoints, tol, maxiter)
+                    # reference solutions: previous frequency, then previous losses
+                    L_ref = np.full((n_branches, 2), np.nan)
+                    if idx_loss > 0:
+                        L_ref = L[idx_f, idx_loss-1]
+                    if idx_f > 0:
+                        L_prev = L[idx_f-1, idx_loss]
+                        L_ref = np.where(np.isnan(L_prev), L_ref, L_prev)
+                    L[idx_f, idx_loss] = _assign_branches(L_sols, L_ref)
+                    for branch in range(n_branches):
+                        if not np.isnan(L[idx_f, idx_loss, branch, 0]):
+                            S11[idx_f, idx_loss, branch] = cfg._matching_S11(L[idx_f, idx_loss, branch], model)
+
+        metadata = {'bounds': [list(bound) for bound in bounds],
+                    'Z_short_DUT': cfg.Z_short_DUT,
+                    'Z_short_CEA': cfg.Z_short_CEA,
+                    'topology': cfg.topology.name,
+                    'npoints': npoints,
+                    'tol': tol,
+                    'created': datetime.datetime.now().isoformat()}
+        return cls(freqs, additional_losses, L, S11, metadata, cfg.topology)
+
+    def save(self, filename):
+        """
+        Save the tuning table into a compressed NumPy .npz file, with the
+        sections of its topology.
+        """
+        topology = self._configuration().topology
+        sections = {'DUT': topology.branches['DUT'], 'CEA': topology.branches['CEA'],
+                    'Z_short_DUT': topology.Z_short_DUT, 'Z_short_CEA': topology.Z_short_CEA,
+                    'name': topology.name}
+        np.savez_compressed(filename, freqs=self.freqs,
+                            additional_losses=self.additional_losses,
+                            L=self.L, S11=self.S11,
+                            metadata=np.array(json.dumps(self.metadata)),
+                            topology=np.array(json.dumps(sections, default=float)))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a tuning table saved with save(). The topology is rebuilt from
+        its saved sections (from its name for the tables saved without them).
+        """
+        with np.load(filename, allow_pickle=False) as data:
+            topology = Topology(**json.loads(str(data['topology']))) if 'topology' in data.files else None
+            return cls(data['freqs'], data['additional_losses'], data['L'],
+                       data['S11'], json.loads(str(data['metadata'])), topology)
+
+    def _configuration(self):
+        """
+        Configuration of the table (short impedances and topology), built once
+        """
+        if self._cfg is None:
+            (L_DUT_min, _), (L_CEA_min, _) = self.metadata.get('bounds', [(1e-3, 0), (1e-3, 0)])
+            self._cfg = Configuration(self.freqs[0], 1, L_DUT_min, L_CEA_min,
+                                      self.metadata.get('Z_short_DUT'),
+                                      self.metadata.get('Z_short_CEA'),
+                                      1, self.topology)
+        return self._cfg
+
+    def _reduced_model(self, f, additional_losses):
+        """
+        Reduced model of a frequency and additional losses. The last
+        _MAX_MODELS models are kept, for repeated lookups of the same setpoints.
+        """
+        key = (float(f), float(additional_losses))
+        model = self._models.pop(key, None)
+        if model is None:
+            model = ReducedModel(self._configuration(), *key)
+            if len(self._models) >= _MAX_MODELS:
+                self._models.popitem(last=False)
+        self._models[key] = model
+        return model
+
+    def interpolate(self, f, additional_losses=1):
+        """
+        Short lengths of each branch, by bilinear interpolation of the table.
+
+        Args
+        ----
+        f: float or array
+            frequency [Hz]
+        additional_losses: float or array, optional
+            additional losses factor, broadcastable with f. Default is 1.
+
+        Returns
+        -------
+        L: array of shape f.shape + (n_branches, 2)
+            short lengths (L_DUT, L_CEA) of each branch [m]. NaN when outside
+            of the table or when the branch has no solution nearby.
+        """
+        f, additional_losses = np.broadcast_arrays(np.asarray(f, dtype=float),
+                                                   np.asarray(additional_losses, dtype=float))
+        idx_f, w_f = self._grid_weights(self.freqs, f)
+        idx_loss, w_loss = self._grid_weights(self.additional_losses, additional_losses)
+
+        L = 0
+        for d_f, weight_f in ((0, 1 - w_f), (1, w_f)):
+            for d_loss, weight_loss in ((0, 1 - w_loss), (1, w_loss)):
+                weight = (weight_f*weight_loss)[..., np.newaxis, np.newaxis]
+                corner = self.L[np.minimum(idx_f + d_f, len(self.freqs) - 1),
+                                np.minimum(idx_loss + d_loss, len(self.additional_losses) - 1)]
+                # corners of null weight (on the grid nodes) are skipped
+                L = L + np.where(weight == 0, 0, weight*corner)
+        return L
+
+    @staticmethod
+    def _grid_weights(grid, x):
+        """
+        Index of the lower grid node and interpolation weight of the upper one.
+        The weight is NaN outside of the grid.
+        """
+        idx = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, max(len(grid) - 2, 0))
+        if len(grid) == 1:
+            weight = np.where(x == grid[0], 0., np.nan)
+        else:
+            weight = (x - grid[idx])/(grid[idx+1] - grid[idx])
+            weight = np.where((weight >= 0) & (weight <= 1), weight, np.nan)
+        return idx, weight
+
+    def _interpolate_point(self, f, additional_losses):
+        """
+        Scalar version of interpolate(), for a point inside the table.
+        """
+        L = np.zeros((self.n_branches, 2))
+        (idx_f, w_f), (idx_loss, w_loss) = [self._point_weights(grid, x) for grid, x in
+                                            zip(self._grids, (f, additional_losses))]
+        for d_f, weight_f in ((0, 1 - w_f), (1, w_f)):
+            for d_loss, weight_loss in ((0, 1 - w_loss), (1, w_loss)):
+                # corners of null weight (on the grid nodes) are skipped
+                if weight_f*weight_loss != 0:
+                    L += weight_f*weight_loss*self.L[idx_f + d_f, idx_loss + d_loss]
+        return L
+
+    @staticmethod
+    def _point_weights(grid, x):
+        """
+        Scalar version of _grid_weights(), for x inside the grid.
+        """
+        if len(grid) == 1:
+            return 0, 0.
+        idx = min(bisect.bisect_right(grid, x) - 1, len(grid) - 2)
+        return idx, (x - grid[idx])/(grid[idx+1] - grid[idx])
+
+    def lookup(self, f, additional_losses=1, refine=False, predict=True):
+        """
+        Short lengths setpoints and predicted S11 of each branch,
+        for a frequency and additional losses.
+
+        Without refinement nor prediction, the setpoints are only interpolated
+        from the table, in a few microseconds. The reduced models of the
+        refinement and of the prediction are kept for the next lookups of
+        the same frequency and additional losses.
+
+        Args
+        ----
+        f: float
+            frequency [Hz]
+        additional_losses: float, optional
+            additional losses factor. Default is 1.
+        refine: bool, optional
+            make a single Newton step on the model from the interpolated
+            lengths. Default is False.
+        predict: bool, optional
+            evaluate the S11 of the setpoints on the model. Default is True.
+
+        Returns
+        -------
+        L: array of shape (n_branches, 2)
+            short lengths (L_DUT, L_CEA) of each branch [m],
+            NaN if the branch has no solution nearby
+        S11: complex array of shape (n_branches,)
+            S11 of the model for these short lengths (NaN if the branch has
+            no solution nearby), None if predict is False
+        """
+        if not (self.freqs[0] <= f <= self.freqs[-1]) or \
+            not (self.additional_losses[0] <= additional_losses <= self.additional_losses[-1]):
+            raise ValueError('f={} Hz, additional_losses={} is outside of the tuning table'.format(
+                              f, additional_losses))
+        L = self._interpolate_point(f, additional_losses)
+        if not (refine or predict):
+            return L, None
+
+        cfg = self._configuration()
+        model = self._reduced_model(f, additional_losses)
+        bounds = self.metadata.get('bounds')
+        for branch in range(self.n_branches if refine else 0):
+            if not np.any(np.isnan(L[branch])):
+                F, dF_dL_DUT, dF_dL_CEA = cfg._matching_residual(L[branch], model)
+                J = np.array([[dF_dL_DUT.real, dF_dL_CEA.real],
+                              [dF_dL_DUT.imag, dF_dL_CEA.imag]])
+                try:
+                    L_new = L[branch] - np.linalg.solve(J, [F.real, F.imag])
+                except np.linalg.LinAlgError:
+                    L_new = L[branch]
+                # the step is rejected if it leaves the bounds
+                if bounds is None or \
+                    (np.all(L_new >= [bounds[0][0], bounds[1][0]]) and \
+                     np.all(L_new <= [bounds[0][1], bounds[1][1]])):
+                    L[branch] = L_new
+        if not predict:
+            return L, None
+        # all the branches with a solution at once
+        S11 = np.full(self.n_branches, np.nan, dtype=complex)
+        valid = ~np.isnan(L[:, 0])
+        S11[valid] = model.S11(L[valid, 0], L[valid, 1])
+        return L, S11
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Version of the tresonator package
+"""
+__version__ = '0.2.0'